@@ -2,80 +2,395 @@
 # just to force redeploy!
 from fasthtml.common import *
 import json
+import asyncio
 import networkx as nx
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 import time
 import os
+import sys
+import pickle
+import gzip
+import hashlib
+import base64
+import threading
 import traceback
+import re
+import math
+import unicodedata
+import mimetypes
+import functools
+import gc
+import hmac
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from concurrent.futures import ThreadPoolExecutor
+import apsw
+import numpy as np
+from collections import OrderedDict, Counter
+from urllib.parse import urlencode
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# ==============================================================================
+# STATIC ASSETS
+# ==============================================================================
+# Stylesheets and scripts live in assets/ and are served under content-hashed names
+# (`/assets/app.<hash>.js`) with immutable caching, so a deploy changes their URLs. Pages and
+# fragments carry markup only; app.js finds its components when htmx loads them and reads
+# their URLs from data-* attributes. `python app.py vendor` downloads the pinned libraries
+# into assets/vendor; a library not vendored yet is loaded from its CDN URL instead. Each
+# library carries the Subresource Integrity of its file ("sha256-<base64>"): the vendor
+# command refuses a download that does not match it, a vendored copy that does not match
+# is not served, and a CDN copy is loaded with an integrity attribute so the browser
+# refuses it too. A library without a pin yet gets one printed by the vendor command.
+ASSETS_DIR = os.environ.get('ETHICS_ASSETS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets"))
+ASSET_HASH_CHARS = 12
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# name -> (CDN URL, integrity pin or None)
+VENDOR_LIBS = {
+    "pico.min.css": ("https://cdn.jsdelivr.net/npm/@picocss/pico@2.0.6/css/pico.min.css", None),
+    "htmx.min.js": ("https://cdn.jsdelivr.net/npm/htmx.org@2.0.4/dist/htmx.min.js", None),
+    "fasthtml.js": ("https://cdn.jsdelivr.net/gh/answerdotai/fasthtml-js@1.0.12/fasthtml.js", None),
+    "cytoscape.min.js": ("https://unpkg.com/cytoscape@3.28.1/dist/cytoscape.min.js", None),
+    "popper.min.js": ("https://unpkg.com/@popperjs/core@2.11.8/dist/umd/popper.min.js", None),
+    "cytoscape-popper.js": ("https://unpkg.com/cytoscape-popper@2.0.0/cytoscape-popper.js", None),
+    "interact.min.js": ("https://unpkg.com/interactjs@1.10.27/dist/interact.min.js", None),
+}
+
+def integrity(body: bytes) -> str:
+    return "sha256-" + base64.b64encode(hashlib.sha256(body).digest()).decode()
+
+def scan_assets(assets_dir: str) -> Tuple[dict, dict]:
+    # Name under assets/ -> hashed URL, and hashed URL -> file.
+    urls, files = {}, {}
+    for root, _, names in os.walk(assets_dir):
+        for name in names:
+            if name.startswith('.'): continue
+            path = os.path.join(root, name)
+            stem, ext = os.path.splitext(os.path.relpath(path, assets_dir).replace(os.sep, '/'))
+            with open(path, 'rb') as f: body = f.read()
+            pin = VENDOR_LIBS.get(stem.removeprefix("vendor/") + ext, (None, None))[1] if stem.startswith("vendor/") else None
+            if pin and integrity(body) != pin:
+                print(f"ERROR: '{path}' does not match its pin, loading it from its CDN instead.")
+                continue
+            url = f"/assets/{stem}.{hashlib.sha256(body).hexdigest()[:ASSET_HASH_CHARS]}{ext}"
+            urls[stem + ext], files[url] = url, path
+    return urls, files
+
+ASSET_URLS, ASSET_FILES = scan_assets(ASSETS_DIR)
+
+# A library missing from assets/vendor is loaded from its CDN, which the server warns about
+# when it starts; with ETHICS_VENDORED_ONLY=1 it refuses to start instead.
+VENDORED_ONLY = os.environ.get('ETHICS_VENDORED_ONLY', '').lower() in ('1', 'true', 'yes')
+
+def check_vendored() -> None:
+    missing = [name for name in VENDOR_LIBS if f"vendor/{name}" not in ASSET_URLS]
+    if not missing: return
+    message = f"{', '.join(missing)} not in '{os.path.join(ASSETS_DIR, 'vendor')}'; run `python app.py vendor`"
+    if VENDORED_ONLY: raise RuntimeError(message)
+    unpinned = [name for name in missing if not VENDOR_LIBS[name][1]]
+    print(f"WARNING: {message}. Pages load them from their CDN" + (f", without an integrity check for {', '.join(unpinned)}." if unpinned else "."))
+
+def asset_url(name: str) -> str:
+    return ASSET_URLS.get(name) or VENDOR_LIBS[name.removeprefix("vendor/")][0]
+
+def vendor_integrity(name: str) -> dict:
+    # Attributes for a library loaded from its CDN rather than from assets/vendor.
+    if f"vendor/{name}" in ASSET_URLS: return {}
+    pin = VENDOR_LIBS[name][1]
+    return {"integrity": pin, "crossorigin": "anonymous"} if pin else {"crossorigin": "anonymous"}
+
+def vendor_command() -> int:
+    from urllib.request import urlopen
+    vendor_dir = os.path.join(ASSETS_DIR, "vendor")
+    os.makedirs(vendor_dir, exist_ok=True)
+    failed = 0
+    for name, (url, pin) in VENDOR_LIBS.items():
+        with urlopen(url, timeout=30) as response: body = response.read()
+        if pin and integrity(body) != pin:
+            print(f"ERROR: {url} has integrity {integrity(body)}, expected {pin}; not written.")
+            failed += 1
+            continue
+        with open(os.path.join(vendor_dir, name), 'wb') as f: f.write(body)
+        print(f"Wrote '{os.path.join(vendor_dir, name)}' ({len(body)} bytes) from {url}")
+        if not pin: print(f"WARNING: {name} is not pinned; after checking it, pin it in VENDOR_LIBS as {integrity(body)!r}")
+    return 1 if failed else 0
+
+# Passed to fast_app rather than added with @rt, so that it is registered before FastHTML's
+# catch-all static file route and matches hashed asset names first.
+async def serve_asset(req):
+    payload = ASSET_PAYLOADS.get(f"/assets/{req.path_params['name']}")
+    if payload is None: return Response("Not Found", status_code=404)
+    return payload_response(req, payload, ASSET_CACHE_CONTROL)
 
 # Initialize app
+# Scripts load in order and block parsing, so app.js can use the libraries as soon as it runs.
 app, rt = fast_app(
     secret_key=os.environ.get('SECRET_KEY'),
     #secret_key="total _bulshit",
+    default_hdrs=False, pico=False,
     hdrs=(
-        Script(src="https://unpkg.com/cytoscape@3.28.1/dist/cytoscape.min.js"),
-        Script(src="https://unpkg.com/@popperjs/core@2"),
-        Script(src="https://unpkg.com/cytoscape-popper@2.0.0/cytoscape-popper.js"),
-        Script(src="https://unpkg.com/interact.js/dist/interact.min.js"),
-    )
+        charset, viewport,
+        Link(rel="stylesheet", href=asset_url("vendor/pico.min.css"), **vendor_integrity("pico.min.css")),
+        Link(rel="stylesheet", href=asset_url("app.css")),
+        *(Script(src=asset_url(f"vendor/{name}"), **vendor_integrity(name)) for name in VENDOR_LIBS if name.endswith(".js")),
+        Script(src=asset_url("app.js")),
+    ),
+    routes=[Route("/assets/{name:path}", serve_asset)],
 )
+app.router.on_startup.append(check_vendored)
+
+# ==============================================================================
+# INSTRUMENTATION
+# ==============================================================================
+# Each request gets a phase clock: code inside `phase(name)` (or decorated with
+# `timed(name)`) adds its wall time to that phase, exclusive of nested phases, which pause
+# the phase they interrupt. The middleware sends the totals as a Server-Timing header and
+# folds them, with per-route request counts and latency histograms, into the Prometheus
+# metrics served at /metrics. Metrics are kept per worker process.
+class PhaseClock:
+    __slots__ = ('totals', 'stack', 'profiler')
+
+    def __init__(self): self.totals, self.stack, self.profiler = {}, [], None
+
+REQUEST_PHASES: ContextVar = ContextVar('request_phases', default=None)
+
+@contextmanager
+def phase(name: str):
+    clock = REQUEST_PHASES.get()
+    if clock is None:
+        yield
+        return
+    if clock.profiler is not None and not clock.stack: clock.profiler.start()
+    now = time.perf_counter()
+    if clock.stack:
+        parent = clock.stack[-1]
+        clock.totals[parent[0]] = clock.totals.get(parent[0], 0.0) + now - parent[1]
+    clock.stack.append([name, now])
+    try:
+        yield
+    finally:
+        now = time.perf_counter()
+        started = clock.stack.pop()[1]
+        clock.totals[name] = clock.totals.get(name, 0.0) + now - started
+        if clock.stack: clock.stack[-1][1] = now
+        elif clock.profiler is not None: clock.profiler.stop()
+
+def timed(name: str):
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name): return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# With ETHICS_PROFILE_TOKEN set, a request carrying an `X-Profile: <token>` header is profiled:
+# the profile is saved under ETHICS_PROFILE_DIR and named in the response's `X-Profile-File`
+# header, or with `X-Profile-Mode: inline` sent instead of the response. The token is only
+# read from a header, never from the URL, so it stays out of access logs and caches. The profile
+# is deterministic (sys.setprofile on the thread running each outermost phase, while it runs)
+# and written as folded stacks of self time in microseconds, the input of flamegraph.pl and
+# speedscope. Profiled requests bypass the response cache so the rendering is always seen.
+# Without the token, the middleware never looks at the request.
+PROFILE_TOKEN = os.environ.get('ETHICS_PROFILE_TOKEN')
+PROFILE_DIR = os.environ.get('ETHICS_PROFILE_DIR', 'profiles')
+
+class StackProfiler:
+    def __init__(self):
+        self.folded, self._stack = Counter(), []
+
+    def _hook(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == 'call' or event == 'c_call':
+            if event == 'call': name = f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_firstlineno})"
+            else: name = f"{getattr(arg, '__qualname__', None) or getattr(arg, '__name__', '?')} (builtin)"
+            # [folded stack, start, time in callees]
+            self._stack.append([f"{self._stack[-1][0]};{name}" if self._stack else name, now, 0.0])
+        elif self._stack:
+            # Returns from frames entered before start() arrive with an empty stack and are ignored.
+            path, started, callees = self._stack.pop()
+            self.folded[path] += now - started - callees
+            if self._stack: self._stack[-1][2] += now - started
+
+    def start(self) -> None:
+        self._stack = []
+        sys.setprofile(self._hook)
+
+    def stop(self) -> None:
+        sys.setprofile(None)
+
+    def render(self, root: str) -> str:
+        return "".join(f"{root};{path} {round(seconds * 1e6)}\n" for path, seconds in sorted(self.folded.items()) if seconds >= 5e-7)
+
+def profiling() -> bool:
+    clock = REQUEST_PHASES.get()
+    return clock is not None and clock.profiler is not None
+
+def profile_mode(scope) -> Optional[str]:
+    headers = dict(scope['headers'])
+    token = headers.get(b'x-profile')
+    if not token or not hmac.compare_digest(token, PROFILE_TOKEN.encode()): return None
+    return 'inline' if headers.get(b'x-profile-mode', b'').lower() == b'inline' else 'save'
+
+def save_profile(profile: str, path: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{re.sub(r'[^A-Za-z0-9_.-]+', '_', path).strip('_') or 'index'}.folded"
+    with open(os.path.join(PROFILE_DIR, name), 'w', encoding='utf-8') as f: f.write(profile)
+    return name
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Metrics:
+    # Only updated from the event loop thread, by the middleware.
+    def __init__(self):
+        self.requests = Counter()
+        self.latency = {}
+        self.phase_seconds = Counter()
+
+    def observe(self, route: str, method: str, status: int, seconds: float, phases: dict) -> None:
+        self.requests[(route, method, status)] += 1
+        buckets = self.latency.setdefault(route, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound: buckets[i] += 1
+        buckets[-2] += seconds
+        buckets[-1] += 1
+        for name, phase_seconds in phases.items(): self.phase_seconds[(route, name)] += phase_seconds
+
+    def render(self) -> str:
+        lines = ["# HELP ethics_requests_total Requests served, by route template, method and status.", "# TYPE ethics_requests_total counter"]
+        lines += [f'ethics_requests_total{{route="{r}",method="{m}",status="{s}"}} {n}' for (r, m, s), n in sorted(self.requests.items())]
+        lines += ["# HELP ethics_request_duration_seconds Request latency, by route template.", "# TYPE ethics_request_duration_seconds histogram"]
+        for route, buckets in sorted(self.latency.items()):
+            lines += [f'ethics_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {n}' for bound, n in zip(LATENCY_BUCKETS, buckets)]
+            lines += [f'ethics_request_duration_seconds_bucket{{route="{route}",le="+Inf"}} {buckets[-1]}',
+                      f'ethics_request_duration_seconds_sum{{route="{route}"}} {buckets[-2]:.6f}', f'ethics_request_duration_seconds_count{{route="{route}"}} {buckets[-1]}']
+        lines += ["# HELP ethics_request_phase_seconds_total Time spent in each request phase, by route template.", "# TYPE ethics_request_phase_seconds_total counter"]
+        lines += [f'ethics_request_phase_seconds_total{{route="{r}",phase="{p}"}} {t:.6f}' for (r, p), t in sorted(self.phase_seconds.items())]
+        lines += ["# HELP ethics_response_cache_hits_total Response cache hits.", "# TYPE ethics_response_cache_hits_total counter", f"ethics_response_cache_hits_total {RESPONSE_CACHE.hits}",
+                  "# HELP ethics_response_cache_misses_total Response cache misses.", "# TYPE ethics_response_cache_misses_total counter", f"ethics_response_cache_misses_total {RESPONSE_CACHE.misses}",
+                  "# HELP ethics_response_cache_entries Responses currently cached.", "# TYPE ethics_response_cache_entries gauge", f"ethics_response_cache_entries {len(RESPONSE_CACHE)}",
+                  "# HELP ethics_texts_cache_entries /api/texts responses currently cached.", "# TYPE ethics_texts_cache_entries gauge", f"ethics_texts_cache_entries {len(TEXTS_CACHE)}",
+                  "# HELP ethics_books_loaded Books currently held in memory.", "# TYPE ethics_books_loaded gauge", f"ethics_books_loaded {len(corpus().loaded_books())}",
+                  "# HELP ethics_render_pool_pending Renders running or queued in the render pool.", "# TYPE ethics_render_pool_pending gauge", f"ethics_render_pool_pending {RENDER_POOL.pending}",
+                  "# HELP ethics_render_pool_rejected_total Requests answered 503 because the render pool was full.", "# TYPE ethics_render_pool_rejected_total counter", f"ethics_render_pool_rejected_total {RENDER_POOL.rejected}"]
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+
+class TimingMiddleware:
+    def __init__(self, asgi_app):
+        self.asgi_app, self._routes = asgi_app, None
+
+    def route_of(self, scope) -> str:
+        # The router records the matched endpoint in the scope; map it back to its path template.
+        if self._routes is None: self._routes = {route.endpoint: route.path for route in app.routes if hasattr(route, 'endpoint')}
+        return self._routes.get(scope.get('endpoint'), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http': return await self.asgi_app(scope, receive, send)
+        clock, start, status = PhaseClock(), time.perf_counter(), [500]
+        mode = profile_mode(scope) if PROFILE_TOKEN else None
+        if mode: clock.profiler = StackProfiler()
+        token = REQUEST_PHASES.set(clock)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+                timings = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in clock.totals.items()]
+                timings.append(f"total;dur={(time.perf_counter() - start) * 1000:.2f}")
+                message['headers'] = list(message.get('headers', [])) + [(b'server-timing', ", ".join(timings).encode())]
+                if mode == 'save':
+                    name = save_profile(clock.profiler.render(f"{scope['method']} {scope['path']}"), scope['path'])
+                    message['headers'].append((b'x-profile-file', name.encode()))
+            if mode != 'inline': await send(message)
+
+        try:
+            await self.asgi_app(scope, receive, send_with_timing)
+        finally:
+            REQUEST_PHASES.reset(token)
+            METRICS.observe(self.route_of(scope), scope['method'], status[0], time.perf_counter() - start, clock.totals)
+        if mode == 'inline':
+            await Response(clock.profiler.render(f"{scope['method']} {scope['path']}"), media_type="text/plain; charset=utf-8", headers={"Cache-Control": "no-store"})(scope, receive, send)
+
+app.add_middleware(TimingMiddleware)
+
+@rt("/metrics")
+async def get():
+    return Response(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # ==============================================================================
 # DATA STRUCTURES (Unchanged)
 # ==============================================================================
+def resolve_text(texts: dict, lang: str) -> str:
+    if not isinstance(texts, dict): return "Invalid text data"
+    text = texts.get(lang)
+    if text: return text
+    if lang and 'english' in lang.lower():
+        for key, value in texts.items():
+            if 'english' in key.lower(): return value
+    return next(iter(texts.values()), "No text available")
+
+def resolve_demonstration(components: list, lang: str = None) -> Optional[str]:
+    if not components: return None
+    for comp in components:
+        if comp.get('type') == 'DEMONSTRATION':
+            texts = comp.get('texts', {})
+            if lang and lang in texts: return texts[lang]
+            return next(iter(texts.values()), None)
+    return None
+
 class NodeData:
-    def __init__(self, **kwargs):
-        self.type = kwargs.get('type', 'DEFAULT')
-        self.normalized_key = kwargs.get('normalized_key', '')
-        self.texts = kwargs.get('texts', {})
-        self.components = kwargs.get('components', [])
-        for k, v in kwargs.items():
-            if k not in ['type', 'normalized_key', 'texts', 'number', 'components']:
-                setattr(self, k, v)
+    # Built once per node at load and shared by every renderer. It holds references into
+    # the graph attributes rather than copies: texts resolve with one dict lookup, and the
+    # demonstration component is found once so its texts need no scan per request. The few
+    # distinct type strings are interned.
+    __slots__ = ('key', 'type', 'type_lower', 'color_class', 'number', 'texts', 'components', 'langs', 'default_lang', '_demonstration')
+
+    def __init__(self, key: str, attrs: dict):
+        node_type = attrs.get('type', 'DEFAULT')
+        texts, components = attrs.get('texts', {}), attrs.get('components', [])
+        langs = tuple(texts.keys()) if isinstance(texts, dict) else ()
+        demonstration = next((comp.get('texts', {}) for comp in components or () if comp.get('type') == 'DEMONSTRATION'), None)
+        set_slot = object.__setattr__
+        set_slot(self, 'key', sys.intern(key))
+        set_slot(self, 'type', sys.intern(node_type))
+        set_slot(self, 'type_lower', sys.intern(node_type.lower()))
+        set_slot(self, 'color_class', sys.intern(f"node-{node_type.lower().replace('axiome', 'axiom')}"))
+        set_slot(self, 'number', attrs.get('number'))
+        set_slot(self, 'texts', texts)
+        set_slot(self, 'components', components)
+        set_slot(self, 'langs', langs)
+        set_slot(self, 'default_lang', langs[0] if langs else 'french_text')
+        set_slot(self, '_demonstration', demonstration)
+
+    def __setattr__(self, name, value): raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return (_restore_node_data, (tuple(getattr(self, slot) for slot in self.__slots__),))
 
     def get_text(self, lang: str) -> str:
-        if not isinstance(self.texts, dict): return "Invalid text data"
-        text = self.texts.get(lang)
-        if text: return text
-        if lang and 'english' in lang.lower():
-            for key, value in self.texts.items():
-                if 'english' in key.lower(): return value
-        return next(iter(self.texts.values()), "No text available")
+        text = self.texts.get(lang) if self.langs else None
+        return text or resolve_text(self.texts, lang)
 
     def get_demonstration(self, lang: str = None) -> Optional[str]:
-        if not self.components: return None
-        for comp in self.components:
-            if comp.get('type') == 'DEMONSTRATION':
-                texts = comp.get('texts', {})
-                if lang and lang in texts: return texts[lang]
-                return next(iter(texts.values()), None)
-        return None
+        texts = self._demonstration
+        if texts is None: return None
+        if lang and lang in texts: return texts[lang]
+        return next(iter(texts.values()), None)
 
-# ==============================================================================
-# STYLES (Unchanged)
-# ==============================================================================
-graph_styles = Style("""
-    body, html { margin: 0; padding: 0; overflow: hidden; }
-    #cy { width: 100vw; height: 100vh; background-color: #f7f7f7; position: relative; }
-    .tooltip { position: absolute; display: none; background-color: #282c34; color: white; padding: 8px 12px; border-radius: 6px; font-size: 14px; pointer-events: none; z-index: 9999; box-shadow: 0 2px 4px rgba(0,0,0,0.2); max-width: 400px; word-wrap: break-word; }
-    .modal { display: none; position: fixed; z-index: 1000; background-color: rgba(0,0,0,0.4); width: 100%; height: 100%; top: 0; left: 0; }
-    .modal-content { position: absolute; background-color: #fefefe; padding: 0; border: 1px solid #888; width: 80%; height: 80vh; overflow: hidden; resize: both; min-width: 400px; min-height: 300px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); top: 50px; left: 50px; display: flex; flex-direction: column; }
-    .modal-header { display: flex; justify-content: space-between; align-items: center; padding: 10px 20px; border-bottom: 1px solid #ccc; cursor: move; background-color: #f1f1f1; }
-    .modal-body { flex-grow: 1; padding: 20px; overflow-y: auto; display: flex; flex-direction: column; min-height: 0; }
-    .close-button { color: #aaa; font-size: 28px; font-weight: bold; cursor: pointer; line-height: 20px; }
-    .close-button:hover { color: #000; }
-    .proof-tree { display: flex; flex-direction: column; align-items: center; gap: 20px; padding: 20px; margin-bottom: 30px; }
-    .proof-node { position: relative; cursor: pointer; display: flex; align-items: center; gap: 5px; }
-    .proof-dot { width: 16px; height: 16px; border-radius: 50%; display: inline-block; }
-    .proof-label { font-size: 12px; font-family: monospace; }
-    .premises-container { display: flex; gap: 30px; justify-content: center; align-items: flex-start; }
-    .tree-arrow { text-align: center; font-size: 20px; margin: -5px 0; color: #666; }
-    .tree-arrow::before { content: '▼'; }
-    .main-node-box { border: 2px solid #333; padding: 15px; margin: 10px; border-radius: 8px; background-color: #f9f9f9; cursor: pointer; position: relative; }
-    .tab-buttons { display: flex; gap: 10px; margin-bottom: 15px; flex-shrink: 0; }
-    .node-definition { background-color: #007bff; } .node-axiom { background-color: #dc3545; } .node-proposition { background-color: #28a745; } .node-theorem { background-color: #ffc107; }
-    .node-appendice { background-color: #17a2b8; } .node-corollaire { background-color: #e83e8c; } .node-scolie { background-color: #fd7e14; } .node-default { background-color: #6c757d; }
-""")
+def _restore_node_data(values: tuple) -> NodeData:
+    node = object.__new__(NodeData)
+    for slot, value in zip(NodeData.__slots__, values): object.__setattr__(node, slot, value)
+    return node
+
+def build_node_store(graph: nx.DiGraph) -> dict:
+    return {key: NodeData(key, attrs) for key, attrs in graph.nodes(data=True)}
 
 # ==============================================================================
 # JSON PREPROCESSING AND GRAPH OPS (Unchanged)
@@ -87,8 +402,14 @@ def fix_json_data(data: dict) -> dict:
             if "'english_text'" in comp.get("texts", {}): comp["texts"]["english_text"] = comp["texts"].pop("'english_text'")
     return data
 
-def create_graph_from_data(items: list, edges: list) -> nx.DiGraph:
+def create_graph_from_data(items: list, edges: list, trusted: bool = False) -> nx.DiGraph:
     G = nx.DiGraph()
+    if trusted:
+        # Canonical input (see `python app.py validate`): unique keys, known endpoints, folded edges.
+        # Endpoints are still checked, which is cheap, so an edge can never add a bare node.
+        G.add_nodes_from((item['normalized_key'], item) for item in items)
+        G.add_edges_from((e['source'], e['target'], {k: val for k, val in e.items() if k not in ('source', 'target')}) for e in edges if e['source'] in G and e['target'] in G)
+        return G
     for item in items:
         if 'normalized_key' in item: G.add_node(item['normalized_key'], **item)
     for edge in edges:
@@ -97,26 +418,173 @@ def create_graph_from_data(items: list, edges: list) -> nx.DiGraph:
             G.add_edge(u, v, **{k: val for k, val in edge.items() if k not in ['source', 'target']})
     return G
 
-def calculate_node_levels(graph: nx.DiGraph) -> dict:
-    try:
-        g_copy, levels, current_level = graph.copy(), {}, 0
-        while g_copy.nodes():
-            roots = [n for n, d in g_copy.in_degree() if d == 0]
-            if not roots: raise nx.NetworkXError("Graph contains cycles")
-            for node in roots: levels[node] = current_level
-            g_copy.remove_nodes_from(roots)
-            current_level += 1
-        return levels
-    except nx.NetworkXError: return {}
-
-def get_local_subgraph(graph: nx.DiGraph, node: str) -> nx.DiGraph:
-    if not graph.has_node(node): return nx.DiGraph()
-    return graph.subgraph(nx.ancestors(graph, node).union({node}))
-
-def serialize_graph_for_cytoscape(graph: nx.DiGraph, levels: dict) -> str:
+def calculate_node_levels(graph: nx.DiGraph, condensed: Optional[nx.DiGraph] = None) -> dict:
+    # Level = longest citation path from a root, in one topological pass over the SCC
+    # condensation: members of a citation cycle share a level instead of leaving the
+    # whole graph unleveled.
+    condensed = condensed if condensed is not None else nx.condensation(graph)
+    mapping, scc_levels = condensed.graph['mapping'], {}
+    for c in nx.topological_sort(condensed):
+        scc_levels[c] = max((scc_levels[p] + 1 for p in condensed.pred[c]), default=0)
+    return {n: scc_levels[mapping[n]] for n in graph}
+
+def group_levels(levels: dict) -> list:
+    level_nodes = [[] for _ in range(max(levels.values(), default=-1) + 1)]
+    for node, level in levels.items(): level_nodes[level].append(node)
+    return level_nodes
+
+class LRUCache:
+    def __init__(self, maxsize: int = 256):
+        self.maxsize, self.hits, self.misses = maxsize, 0, 0
+        self._data, self._lock = OrderedDict(), threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize: self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock: self._data.clear()
+
+    def __len__(self): return len(self._data)
+
+# Graphs up to this many nodes keep a dense transitive closure (one int bitset per node,
+# at most V bits each); larger graphs answer ancestor queries with a DFS over predecessor
+# ids, memoized in a bounded LRU, so memory stays O(V + E) whatever the corpus size.
+CLOSURE_DENSE_LIMIT = int(os.environ.get('CLOSURE_DENSE_LIMIT', 10000))
+CLOSURE_CACHE_SIZE = int(os.environ.get('CLOSURE_CACHE_SIZE', 1024))
+
+class AncestorIndex:
+    def __init__(self, graph: nx.DiGraph, dense_limit: int = CLOSURE_DENSE_LIMIT, condensed: Optional[nx.DiGraph] = None):
+        self.keys = list(graph.nodes())
+        self.ids = {k: i for i, k in enumerate(self.keys)}
+        self.preds = [tuple(self.ids[p] for p in graph.pred[k]) for k in self.keys]
+        self.dense = len(self.keys) <= dense_limit
+        self.bits = self._dense_closure(graph, condensed) if self.dense else None
+        self._cache = LRUCache(CLOSURE_CACHE_SIZE)
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if k != '_cache'}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache = LRUCache(CLOSURE_CACHE_SIZE)
+
+    def _dense_closure(self, graph: nx.DiGraph, condensed: Optional[nx.DiGraph] = None) -> list:
+        # Closure over the condensation so that cycles still get (shared) ancestor sets.
+        condensed = condensed if condensed is not None else nx.condensation(graph)
+        members = condensed.graph['mapping']
+        scc_bits, scc_closure, bits = {}, {}, [0] * len(self.keys)
+        for c in condensed.nodes():
+            scc_bits[c] = sum(1 << self.ids[k] for k in condensed.nodes[c]['members'])
+        for c in nx.topological_sort(condensed):
+            closure = 0
+            for p in condensed.pred[c]: closure |= scc_closure[p] | scc_bits[p]
+            scc_closure[c] = closure
+        for k, i in self.ids.items():
+            c = members[k]
+            bits[i] = (scc_closure[c] | scc_bits[c]) & ~(1 << i)
+        return bits
+
+    def _ancestor_ids(self, i: int) -> list:
+        if self.dense:
+            digits = bin(self.bits[i])[:1:-1]
+            out, j = [], digits.find('1')
+            while j != -1:
+                out.append(j)
+                j = digits.find('1', j + 1)
+            return out
+        cached = self._cache.get(i)
+        if cached is not None: return cached
+        seen, stack = {i}, list(self.preds[i])
+        while stack:
+            j = stack.pop()
+            if j in seen: continue
+            seen.add(j)
+            stack.extend(self.preds[j])
+        seen.discard(i)
+        # A node on a cycle reaches itself through one of its predecessors.
+        if any(i in self.preds[j] for j in seen): seen.add(i)
+        out = sorted(seen)
+        self._cache.put(i, out)
+        return out
+
+    def ancestors(self, key: str) -> list:
+        if key not in self.ids: return []
+        i = self.ids[key]
+        return [self.keys[j] for j in self._ancestor_ids(i) if j != i]
+
+    def subgraph(self, key: str) -> 'LocalSubgraph':
+        if key not in self.ids: return LocalSubgraph([], [])
+        i = self.ids[key]
+        member_ids = self._ancestor_ids(i)
+        if i not in member_ids: member_ids = sorted(member_ids + [i])
+        # Every predecessor of a member is itself a member, so the induced edges are
+        # exactly the in-edges of the members; no filtering against the member set needed.
+        edges = [(self.keys[p], self.keys[j]) for j in member_ids for p in self.preds[j]]
+        return LocalSubgraph([self.keys[j] for j in member_ids], edges)
+
+class LocalSubgraph:
+    # The slice of the nx.DiGraph API the renderers use, over precomputed node and edge lists.
+    __slots__ = ('_nodes', '_edges', '_pred')
+
+    def __init__(self, nodes: list, edges: list):
+        self._nodes, self._edges, self._pred = nodes, edges, {n: [] for n in nodes}
+        for u, v in edges: self._pred[v].append(u)
+
+    def nodes(self) -> list: return self._nodes
+    def edges(self) -> list: return self._edges
+    def predecessors(self, node: str): return iter(self._pred[node])
+    def number_of_nodes(self) -> int: return len(self._nodes)
+    def reversed(self) -> 'LocalSubgraph': return LocalSubgraph(self._nodes, [(v, u) for u, v in self._edges])
+    def __contains__(self, node) -> bool: return node in self._pred
+    def __len__(self) -> int: return len(self._nodes)
+
+# Shortest citation chains, keyed by graph version: a BFS back from the target over
+# premises, confined to the source's descendants (read from the reverse reachability
+# index), so it never wanders into the parts of the graph that cannot lead to the source.
+PATH_CACHE = LRUCache(CLOSURE_CACHE_SIZE)
+
+def citation_path(version: str, source: str, target: str, descendants: Callable, premises: Callable) -> Optional[list]:
+    # descendants(key) -> set of keys; premises(keys) -> {key: [premise, ...]} in edge order.
+    cache_key = (version, source, target)
+    path = PATH_CACHE.get(cache_key)
+    if path is None:
+        path = shortest_citation_path(source, target, descendants, premises) or []
+        PATH_CACHE.put(cache_key, path)
+    return path or None
+
+def shortest_citation_path(source: str, target: str, descendants: Callable, premises: Callable) -> Optional[list]:
+    if source == target: return [source]
+    reach = descendants(source)
+    if target not in reach: return None
+    parent, frontier = {target: None}, [target]
+    while frontier:
+        layer, keys, frontier = premises(frontier), frontier, []
+        for key in keys:
+            for premise in layer.get(key, ()):
+                if premise in parent or (premise != source and premise not in reach): continue
+                parent[premise] = key
+                if premise == source:
+                    path = [source]
+                    while parent[path[-1]] is not None: path.append(parent[path[-1]])
+                    return path
+                frontier.append(premise)
+    return None
+
+def serialize_graph_for_cytoscape(graph: nx.DiGraph, level_nodes: list) -> str:
     elements = []
-    nodes_by_level = {level: [n for n, l in levels.items() if l == level] for level in set(levels.values())}
-    for level, nodes in nodes_by_level.items():
+    for level, nodes in enumerate(level_nodes):
         for i, key in enumerate(nodes):
             attrs = graph.nodes[key]
             x = (i - (len(nodes) - 1) / 2) * 200
@@ -127,207 +595,410 @@ def serialize_graph_for_cytoscape(graph: nx.DiGraph, levels: dict) -> str:
             })
     for u, v in graph.edges():
         elements.append({"data": {"id": f"{u}->{v}", "source": u, "target": v}})
-    return json.dumps(elements, indent=2)
-
-# ==============================================================================
-# JAVASCRIPT COMPONENTS (Unchanged)
-# ==============================================================================
-def cytoscape_init_script(container_id: str, elements_json: str) -> Script:
-    return Script(f"""
-    window.addEventListener('load', function() {{
-        const container = document.getElementById('{container_id}');
-        if (!container || typeof cytoscape === 'undefined') return;
-        const elements = {elements_json};
-        const tooltipDiv = document.createElement('div');
-        tooltipDiv.className = 'tooltip';
-        document.body.appendChild(tooltipDiv);
-        let popperRef;
-        if (typeof cytoscapePopper !== 'undefined' && !cytoscape.prototype.popper) {{
-            cytoscape.use(cytoscapePopper);
-        }}
-        const cy = cytoscape({{
-            container: container, elements: elements, layout: {{ name: 'preset', padding: 50 }},
-            style: [
-                {{ selector: 'node', style: {{
-                    'background-color': function(ele) {{
-                        const t = ele.data('type').toLowerCase();
-                        if (t === 'definition') return '#007bff'; if (t === 'axiome' || t === 'axiom') return '#dc3545';
-                        if (t === 'proposition') return '#28a745'; if (t === 'theorem') return '#ffc107';
-                        if (t === 'appendice') return '#17a2b8'; if (t === 'corollaire') return '#e83e8c';
-                        if (t === 'scolie') return '#fd7e14'; return '#6c757d';
-                    }}, 'width': '12px', 'height': '12px'
-                }} }},
-                {{ selector: 'edge', style: {{ 'width': 1.5, 'line-color': '#ccc', 'target-arrow-color': '#ccc', 'target-arrow-shape': 'triangle', 'curve-style': 'bezier' }} }}
-            ],
-            minZoom: 0.2, maxZoom: 3
-        }});
-        cy.on('mouseover', 'node', function(evt) {{
-            popperRef = evt.target.popper({{
-                content: function() {{
-                    tooltipDiv.innerHTML = evt.target.data('label');
-                    tooltipDiv.style.display = 'block';
-                    return tooltipDiv;
-                }}
-            }});
-        }});
-        cy.on('mouseout', 'node', function() {{
-            if (popperRef) popperRef.destroy();
-            tooltipDiv.style.display = 'none';
-        }});
-        cy.on('tap', 'node', function(evt) {{
-            htmx.ajax('GET', `/local_view/${{evt.target.id()}}`, {{ target: document.body, swap: 'beforeend' }});
-        }});
-        window.addEventListener('resize', function() {{ cy.resize(); cy.fit(null, 50); }});
-    }});
-    """)
-
-def modal_interaction_script(modal_id: str) -> Script:
-    return Script(f"""
-    (function() {{
-        function initModal() {{
-            if (typeof interact === 'undefined') {{ setTimeout(initModal, 100); return; }}
-            const modal = document.getElementById('{modal_id}');
-            if (!modal) return;
-            const modalContent = modal.querySelector('.modal-content');
-            const header = modal.querySelector('.modal-header');
-            const openModals = document.querySelectorAll('.modal[style*="display: block"]').length;
-            const offset = (openModals > 1 ? openModals - 1 : 0) * 30;
-            modalContent.style.top = (50 + offset) + 'px';
-            modalContent.style.left = (50 + offset) + 'px';
-            modal.style.display = 'block';
-            interact(modalContent).draggable({{
-                allowFrom: header,
-                listeners: {{
-                    move: function(event) {{
-                        const target = event.target;
-                        const x = (parseFloat(target.getAttribute('data-x')) || 0) + event.dx;
-                        const y = (parseFloat(target.getAttribute('data-y')) || 0) + event.dy;
-                        target.style.transform = 'translate(' + x + 'px, ' + y + 'px)';
-                        target.setAttribute('data-x', x);
-                        target.setAttribute('data-y', y);
-                    }}
-                }}
-            }});
-            interact(modalContent).resizable({{
-                edges: {{ left: true, right: true, bottom: true, top: false }},
-                listeners: {{
-                    move: function(event) {{
-                        let target = event.target;
-                        let x = (parseFloat(target.getAttribute('data-x')) || 0);
-                        let y = (parseFloat(target.getAttribute('data-y')) || 0);
-                        target.style.width = event.rect.width + 'px';
-                        target.style.height = event.rect.height + 'px';
-                        x += event.deltaRect.left;
-                        y += event.deltaRect.top;
-                        target.style.transform = 'translate(' + x + 'px, ' + y + 'px)';
-                        target.setAttribute('data-x', x);
-                        target.setAttribute('data-y', y);
-                        const cyContainer = event.target.querySelector('[id^="local-cy-"]');
-                        if (cyContainer && cyContainer._cy) {{
-                            cyContainer._cy.resize();
-                        }}
-                    }}
-                }}
-            }});
-        }}
-        initModal();
-    }})();
-    """)
-
-def proof_tree_hover_script(container_id: str) -> Script:
-    return Script(f"""
-    (function() {{
-        const js_container_id = '{container_id}';
-        const tooltipId = 'tooltip-' + js_container_id;
-        let tooltip = document.getElementById(tooltipId);
-        if (!tooltip) {{
-            tooltip = document.createElement('div');
-            tooltip.className = 'tooltip';
-            tooltip.id = tooltipId;
-            document.body.appendChild(tooltip);
-        }}
-        const container = document.getElementById(js_container_id);
-        if (!container) return;
-        function showTip(content) {{ tooltip.innerHTML = content; tooltip.style.display = 'block'; }};
-        function hideTip() {{ tooltip.style.display = 'none'; }};
-        function moveTip(e) {{ tooltip.style.left = (e.pageX + 10) + 'px'; tooltip.style.top = (e.pageY - 30) + 'px'; }};
-        container.addEventListener('mouseover', function(e) {{
-            const proofNode = e.target.closest('.proof-node');
-            const mainBox = e.target.closest('.main-node-box');
-            if (proofNode) {{ showTip(proofNode.getAttribute('data-text'));
-            }} else if (mainBox) {{
-                const demo = mainBox.getAttribute('data-demonstration');
-                if (demo && demo !== 'No Demonstration') {{ showTip('<strong>Demonstration:</strong><br>' + demo); }}
-            }}
-        }});
-        container.addEventListener('mouseout', hideTip);
-        container.addEventListener('mousemove', moveTip);
-        const checkModal = setInterval(function() {{
-            if (!document.getElementById(js_container_id)) {{
-                tooltip.remove();
-                clearInterval(checkModal);
-            }}
-        }}, 1000);
-    }})();
-    """)
+    return json.dumps(elements, separators=(',', ':'))
+
+# Level of detail: past MAIN_VIEW_LOD_THRESHOLD own nodes, the main view starts from an
+# overview of clusters (a book's nodes grouped by band of consecutive levels holding about
+# LOD_CLUSTER_MAX nodes, then by type, at most LOD_CLUSTER_MAX per cluster, with edges
+# aggregated between clusters) and the client expands a cluster on demand from /api/cluster,
+# keeping at most LOD_CLIENT_NODES members.
+MAIN_VIEW_LOD_THRESHOLD = int(os.environ.get('MAIN_VIEW_LOD_THRESHOLD', 2000))
+LOD_CLUSTER_MAX = int(os.environ.get('LOD_CLUSTER_MAX', 400))
+# Heaviest aggregated edges kept into each cluster of the overview; the others appear once an endpoint is expanded.
+LOD_CLUSTER_EDGES = int(os.environ.get('LOD_CLUSTER_EDGES', 8))
+LOD_CLIENT_NODES = int(os.environ.get('LOD_CLIENT_NODES', 3000))
+# Room for an expanded cluster's grid of members around the cluster's overview position.
+LOD_SPACING = 40 * math.isqrt(LOD_CLUSTER_MAX) + 200
+
+def cluster_nodes(keys: list, levels: dict, types: dict) -> dict:
+    # Cluster id -> member keys, in `keys` order; ids sort by band then type.
+    band_of, band, size = {}, 0, 0
+    for level, n in sorted(Counter(levels[k] for k in keys).items()):
+        if size and size + n > LOD_CLUSTER_MAX: band, size = band + 1, 0
+        band_of[level], size = band, size + n
+    groups = {}
+    for k in keys: groups.setdefault((band_of[levels[k]], types[k].lower()), []).append(k)
+    return {f"cluster-{band}-{re.sub(r'[^a-z0-9]+', '_', node_type)}-{i // LOD_CLUSTER_MAX}": members[i:i + LOD_CLUSTER_MAX]
+            for (band, node_type), members in sorted(groups.items()) for i in range(0, len(members), LOD_CLUSTER_MAX)}
+
+def cluster_overview(clusters: dict, levels: dict, types: dict, edges) -> str:
+    # `edges`: (u, v) pairs between clustered nodes, aggregated into weighted cluster edges.
+    cluster_of = {k: cid for cid, members in clusters.items() for k in members}
+    bands = {}
+    for cid in clusters: bands.setdefault(int(cid.split('-')[1]), []).append(cid)
+    elements = []
+    for band, cids in bands.items():
+        for i, cid in enumerate(cids):
+            members = clusters[cid]
+            low, high = min(levels[k] for k in members), max(levels[k] for k in members)
+            node_type = types[members[0]]
+            label = f"{node_type.title()} {low}–{high}" if low != high else f"{node_type.title()} {low}"
+            elements.append({"data": {"id": cid, "label": f"{label} ({len(members)})", "type": node_type.lower(), "cluster": True, "count": len(members)},
+                             "position": {"x": (i - (len(cids) - 1) / 2) * LOD_SPACING, "y": band * LOD_SPACING}})
+    weights = Counter((cluster_of[u], cluster_of[v]) for u, v in edges if cluster_of[u] != cluster_of[v])
+    incoming = {}
+    for (a, b), n in sorted(weights.items(), key=lambda item: (-item[1], item[0])): incoming.setdefault(b, []).append((a, n))
+    elements.extend({"data": {"id": f"{a}->{b}", "source": a, "target": b, "weight": n}}
+                    for b in clusters if b in incoming for a, n in sorted(incoming[b][:LOD_CLUSTER_EDGES]))
+    return json.dumps(elements, separators=(',', ':'))
+
+def cluster_elements(members: list, types: dict, edges: list, cluster_of: Callable) -> list:
+    # A cluster's members, and every edge touching one of them with both endpoints' clusters.
+    elements = [{"data": {"id": k, "label": k, "type": types[k].lower()}} for k in members]
+    elements.extend({"data": {"id": f"{u}->{v}", "source": u, "target": v, "source_cluster": cluster_of(u), "target_cluster": cluster_of(v)}} for u, v in sorted(edges))
+    return elements
+
+# ==============================================================================
+# SEARCH INDEX
+# ==============================================================================
+# Inverted index over every statement and component text, one document per (text, lang).
+# Words are lowercased and diacritic-folded; Latin also folds j/v and strips the -que
+# enclitic and common inflection endings (never below LATIN_MIN_STEM letters, so that
+# Deum cannot meet de), French and English strip plural endings. Latin prepositions and
+# conjunctions are not indexed. Postings are keyed "<lang>:<stem>" so each language keeps
+# its own stemming, and hits are ranked by how many query words they match, then by BM25.
+# Each document also keeps the stems of all its words, space-separated and in order,
+# so snippets find the matching words without stemming the text again.
+SEARCH_WORD_RE = re.compile(r"\w+")
+SEARCH_K1, SEARCH_B = 1.2, 0.75
+# Statements weigh more than their demonstrations, scholia, corollaries and explanations.
+SEARCH_STATEMENT_WEIGHT = 2.0
+SEARCH_SNIPPET_CHARS = 200
+LATIN_QUE_WORDS = frozenset({"atque", "neque", "itaque", "quoque", "usque", "quisque", "quaeque", "quodque", "quique", "utique", "denique", "undique", "ubique", "plerumque", "quicumque", "quacumque", "quocumque"})
+# Forms of esse would otherwise collide with the reflexive sui/suus family.
+LATIN_UNSTEMMED = frozenset({"sum", "es", "est", "sumus", "estis", "sunt", "esse", "esset", "essent", "sit", "sint"})
+LATIN_SUFFIXES = ("ibus", "orum", "arum", "ntur", "ius", "tur", "nt", "am", "em", "um", "us", "is", "os", "as", "es", "ae", "m", "a", "e", "i", "o", "u")
+LATIN_MIN_STEM = 3
+LATIN_STOPWORDS = frozenset({"a", "ab", "ac", "ad", "aut", "atque", "cum", "de", "e", "enim", "et", "etiam", "ex", "in", "nam", "nec", "neque", "non",
+                             "per", "pro", "quam", "sed", "seu", "si", "siue", "sub", "ut", "uel"})
+# Nouns too short to stem by their endings, folded onto their nominative.
+LATIN_SHORT_NOUNS = {form: noun for noun, forms in (("deus", ("deus", "dei", "deo", "deum", "dii", "di", "deorum", "deis", "deos")),
+                                                    ("res", ("res", "rei", "rem", "re", "rerum", "rebus"))) for form in forms}
+
+def fold(text: str) -> str:
+    text = unicodedata.normalize('NFKD', text.lower()).replace('æ', 'ae').replace('œ', 'oe')
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def stem(word: str, lang: str) -> str:
+    if 'latin' in lang:
+        word = word.replace('j', 'i').replace('v', 'u')
+        # Stopwords stem to "", which is never indexed nor searched.
+        if word in LATIN_STOPWORDS: return ""
+        if word in LATIN_UNSTEMMED: return word
+        if word in LATIN_SHORT_NOUNS: return LATIN_SHORT_NOUNS[word]
+        if word.endswith('que') and len(word) > 5 and word not in LATIN_QUE_WORDS: word = word[:-3]
+        for suffix in LATIN_SUFFIXES:
+            if word.endswith(suffix): return word[:-len(suffix)] if len(word) - len(suffix) >= LATIN_MIN_STEM else word
+        return word
+    if 'english' in lang:
+        if word.endswith('ies') and len(word) > 4: return word[:-3] + 'y'
+        if word.endswith('s') and not word.endswith('ss') and len(word) > 3: return word[:-1]
+        return word
+    if word[-1:] in ('s', 'x') and len(word) > 3: return word[:-1]
+    return word
+
+def search_terms(text: str, lang: str, stems: dict = None) -> list:
+    # One stem per word of `text`, in order; `stems` memoizes them across documents.
+    stems = {} if stems is None else stems
+    terms = []
+    for word in SEARCH_WORD_RE.findall(text):
+        term = stems.get(word)
+        if term is None: term = stems[word] = stem(fold(word), lang)
+        terms.append(term)
+    return terms
+
+def node_documents(node: NodeData):
+    # (component type or None for the statement, component index, lang, text)
+    for lang, text in (node.texts.items() if isinstance(node.texts, dict) else ()):
+        if text: yield None, None, lang, text
+    for i, component in enumerate(node.components):
+        for lang, text in component.get('texts', {}).items():
+            if text: yield component.get('type'), i, lang, text
+
+def document_text(node: NodeData, field: Optional[str], component: Optional[int], lang: str) -> str:
+    return node.texts[lang] if field is None else node.components[component]['texts'][lang]
+
+def search_snippet(text: str, terms: str, stems: set, width: int = SEARCH_SNIPPET_CHARS) -> Tuple[str, list]:
+    spans = [m.span() for m, term in zip(SEARCH_WORD_RE.finditer(text), terms.split(" ")) if term in stems]
+    start = max(0, spans[0][0] - width // 4) if spans else 0
+    if start: start = text.rfind(' ', 0, start) + 1
+    end = text.find(' ', start + width)
+    end = len(text) if end == -1 else end
+    prefix = "…" if start else ""
+    highlights = [(a - start + len(prefix), b - start + len(prefix)) for a, b in spans if a >= start and b <= end]
+    return prefix + text[start:end] + ("…" if end < len(text) else ""), highlights
+
+class SearchIndex:
+    def __init__(self, nodes: dict, keys):
+        self.docs, self.terms, postings, total, stems = [], [], {}, 0, {}
+        for key in keys:
+            for field, component, lang, text in node_documents(nodes[key]):
+                terms = search_terms(text, lang, stems.setdefault(lang, {}))
+                doc_id = len(self.docs)
+                self.docs.append((key, field, component, lang))
+                self.terms.append(" ".join(terms))
+                counts = Counter(term for term in terms if term)
+                length = sum(counts.values())
+                total += length
+                for term, tf in counts.items(): postings.setdefault(f"{lang}:{term}", []).append((doc_id, tf, length))
+        self.postings = {term: tuple(p) for term, p in postings.items()}
+        self.doc_count = len(self.docs)
+        self.avg_length = total / self.doc_count if self.doc_count else 0.0
+        self.langs = tuple(dict.fromkeys(doc[3] for doc in self.docs))
+
+    # Storage hooks, answered from tables by the SQLite store.
+    def postings_for(self, term: str, book: str = None) -> tuple: return self.postings.get(term, ())
+    def docs_for(self, doc_ids: list) -> dict: return {i: self.docs[i] for i in doc_ids}
+    def terms_for(self, doc_ids: list) -> dict: return {i: self.terms[i] for i in doc_ids}
+
+    def search(self, query: str, nodes, lang: str = None, limit: int = 20, book: str = None) -> list:
+        words = list(dict.fromkeys(SEARCH_WORD_RE.findall(fold(query))))
+        doc_scores = {}
+        for doc_lang in ([lang] if lang else self.langs):
+            for word in words:
+                term = stem(word, doc_lang)
+                postings = self.postings_for(f"{doc_lang}:{term}", book) if term else ()
+                if not postings: continue
+                idf = math.log(1 + (self.doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf, length in postings:
+                    norm = tf * (SEARCH_K1 + 1) / (tf + SEARCH_K1 * (1 - SEARCH_B + SEARCH_B * length / (self.avg_length or 1)))
+                    entry = doc_scores.setdefault(doc_id, [0.0, set()])
+                    entry[0] += idf * norm
+                    entry[1].add(word)
+        node_scores, docs = {}, self.docs_for(list(doc_scores))
+        for doc_id, (score, matched) in doc_scores.items():
+            key, field, component, doc_lang = docs[doc_id]
+            if field is None: score *= SEARCH_STATEMENT_WEIGHT
+            entry = node_scores.setdefault(key, [0.0, set(), -1.0, None])
+            entry[0] += score
+            entry[1] |= matched
+            if score > entry[2]: entry[2], entry[3] = score, (doc_id, field, component, doc_lang)
+        ranked = sorted(node_scores.items(), key=lambda item: (-len(item[1][1]), -item[1][0], item[0]))[:limit]
+        hits, terms = [], self.terms_for([best[0] for _, (_, _, _, best) in ranked])
+        for key, (score, matched, _, (doc_id, field, component, doc_lang)) in ranked:
+            node = nodes[key]
+            snippet, highlights = search_snippet(document_text(node, field, component, doc_lang), terms[doc_id], {stem(w, doc_lang) for w in words} - {""})
+            hits.append({"key": key, "type": node.type, "number": node.number, "field": field, "lang": doc_lang, "matched": len(matched),
+                         "score": round(score, 4), "snippet": snippet, "highlights": highlights})
+        return hits
+
+# ==============================================================================
+# GRAPH ANALYTICS
+# ==============================================================================
+# Per-node metrics, computed once when a book's graph is built (and stored with it, in its
+# snapshot or the SQLite store), never per request:
+#   pagerank     importance along citations: each node passes its rank on to its premises
+#   betweenness  share of the shortest citation chains passing through the node, normalized
+#                as networkx does; estimated from ANALYTICS_SAMPLES sources on graphs larger
+#                than ANALYTICS_EXACT_LIMIT nodes
+#   depth        longest chain of premises under the node (its level)
+#   premises     number of transitive premises
+#   fan_in       direct premises; fan_out: direct consequences
+# Everything runs on numpy edge arrays, level by level, so the Python loops are over
+# BFS layers and batches rather than nodes and edges.
+ANALYTICS_METRICS = ("pagerank", "betweenness", "depth", "premises", "fan_in", "fan_out")
+ANALYTICS_EXACT_LIMIT = int(os.environ.get('ANALYTICS_EXACT_LIMIT', 2000))
+ANALYTICS_SAMPLES = int(os.environ.get('ANALYTICS_SAMPLES', 256))
+# Working arrays (sources x nodes, or components x bitset words) hold about this many cells.
+ANALYTICS_BATCH_CELLS = 1 << 21
+PAGERANK_DAMPING = 0.85
+
+def pagerank(src: np.ndarray, dst: np.ndarray, n: int, damping: float = PAGERANK_DAMPING, tol: float = 1e-10, max_iter: int = 200) -> np.ndarray:
+    # Rank flows from each node to its premises, as from a paper to the works it cites;
+    # nodes citing nothing spread theirs evenly.
+    out = np.bincount(dst, minlength=n).astype(float)
+    dangling = out == 0
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        share = np.divide(rank, out, out=np.zeros(n), where=~dangling)
+        new = damping * np.bincount(src, weights=share[dst], minlength=n) + (1 - damping + damping * rank[dangling].sum()) / n
+        if np.abs(new - rank).sum() < n * tol: return new
+        rank = new
+    return rank
+
+def betweenness(src: np.ndarray, dst: np.ndarray, n: int, sources: np.ndarray) -> np.ndarray:
+    # Brandes' accumulation from each source, for a batch of sources at once: the state of
+    # source j for node v sits at j * n + v, and each BFS layer is a handful of array ops.
+    order = np.argsort(src, kind='stable')
+    nbrs, indptr = dst[order], np.concatenate(([0], np.cumsum(np.bincount(src, minlength=n))))
+    total = np.zeros(n)
+    batch = max(1, min(len(sources), ANALYTICS_BATCH_CELLS // n))
+    for i in range(0, len(sources), batch):
+        chunk = sources[i:i + batch]
+        roots = np.arange(len(chunk), dtype=np.int64) * n + chunk
+        dist, sigma = np.full(len(chunk) * n, -1, dtype=np.int32), np.zeros(len(chunk) * n)
+        dist[roots], sigma[roots] = 0, 1.0
+        frontier, layers, depth = roots, [], 0
+        while frontier.size:
+            node = frontier % n
+            counts = indptr[node + 1] - indptr[node]
+            if not counts.any(): break
+            tails = np.repeat(frontier, counts)
+            edge = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(indptr[node], counts)
+            heads = tails - np.repeat(node, counts) + nbrs[edge]
+            dist[heads[dist[heads] == -1]] = depth + 1
+            on_path = dist[heads] == depth + 1
+            tails, heads = tails[on_path], heads[on_path]
+            np.add.at(sigma, heads, sigma[tails])
+            layers.append((tails, heads))
+            frontier, depth = np.unique(heads), depth + 1
+        delta = np.zeros(len(chunk) * n)
+        for tails, heads in reversed(layers):
+            np.add.at(delta, tails, sigma[tails] / sigma[heads] * (1 + delta[heads]))
+        delta[roots] = 0
+        total += delta.reshape(len(chunk), n).sum(axis=0)
+    return total
+
+def premise_counts(graph: nx.DiGraph, ids: dict, levels: dict, condensed: nx.DiGraph) -> np.ndarray:
+    # Ancestor bitsets over the condensation (so cycle members count each other), built
+    # level by level for one slice of bit columns at a time, then popcounted.
+    n, m = len(ids), condensed.number_of_nodes()
+    if not n: return np.zeros(0, dtype=np.int64)
+    member_of = np.fromiter((condensed.graph['mapping'][k] for k in ids), dtype=np.int64, count=n)
+    scc_level = np.zeros(m, dtype=np.int64)
+    scc_level[member_of] = np.fromiter((levels[k] for k in ids), dtype=np.int64, count=n)
+    edges = np.array(list(condensed.edges()), dtype=np.int64).reshape(-1, 2)
+    edges = edges[np.lexsort((edges[:, 1], scc_level[edges[:, 1]]))]
+    groups = np.split(edges, np.flatnonzero(np.diff(scc_level[edges[:, 1]])) + 1) if len(edges) else []
+    words = max(1, min(-(-n // 64), ANALYTICS_BATCH_CELLS // m))
+    counts = np.zeros(m, dtype=np.int64)
+    for first in range(0, n, words * 64):
+        cols = np.arange(first, min(n, first + words * 64))
+        closure = np.zeros((m, words), dtype=np.uint64)
+        np.bitwise_or.at(closure, (member_of[cols], (cols - first) // 64), np.left_shift(np.uint64(1), ((cols - first) % 64).astype(np.uint64)))
+        # Only the descendants of this slice's nodes get bits: skip edges out of the others.
+        active = np.zeros(m, dtype=bool)
+        active[member_of[cols]] = True
+        for group in groups:
+            group = group[active[group[:, 0]]]
+            if not len(group): continue
+            starts = np.flatnonzero(np.r_[True, group[1:, 1] != group[:-1, 1]])
+            targets = group[starts, 1]
+            closure[targets] |= np.bitwise_or.reduceat(closure[group[:, 0]], starts, axis=0)
+            active[targets] = True
+        counts += np.bitwise_count(closure).sum(axis=1, dtype=np.int64)
+    return counts[member_of] - 1
+
+def compute_analytics(graph: nx.DiGraph, levels: dict, condensed: Optional[nx.DiGraph] = None) -> dict:
+    # Metric name -> array aligned with graph.nodes().
+    condensed = condensed if condensed is not None else nx.condensation(graph)
+    ids = {k: i for i, k in enumerate(graph.nodes())}
+    n = len(ids)
+    src = np.fromiter((ids[u] for u, _ in graph.edges()), dtype=np.int64, count=graph.number_of_edges())
+    dst = np.fromiter((ids[v] for _, v in graph.edges()), dtype=np.int64, count=graph.number_of_edges())
+    if n <= ANALYTICS_EXACT_LIMIT: sources, scale = np.arange(n), 1.0
+    else: sources, scale = np.sort(np.random.default_rng(0).choice(n, ANALYTICS_SAMPLES, replace=False)), n / ANALYTICS_SAMPLES
+    if n > 2: scale /= (n - 1) * (n - 2)
+    return {
+        "pagerank": pagerank(src, dst, n) if n else np.zeros(0),
+        "betweenness": betweenness(src, dst, n, sources) * scale if n else np.zeros(0),
+        "depth": np.fromiter((levels[k] for k in ids), dtype=np.int64, count=n),
+        "premises": premise_counts(graph, ids, levels, condensed),
+        "fan_in": np.bincount(dst, minlength=n),
+        "fan_out": np.bincount(src, minlength=n),
+    }
+
+def metric_value(value) -> float:
+    # Six significant digits for floats keeps payloads small; counts stay integers.
+    return int(value) if isinstance(value, (int, np.integer)) else float(f"{value:.6g}")
 
 # ==============================================================================
 # COMPONENTS
 # ==============================================================================
-def create_modal(modal_id: str, node_key: str, content, selected_lang: str = None) -> Div:
-    node_data = NodeData(**T_GRAPH.nodes[node_key])
-    available_langs = list(node_data.texts.keys())
-    selected_lang = selected_lang or (available_langs[0] if available_langs else 'french_text')
-    def format_lang_name(k): return k.replace('_text', '').replace('_', ' ').title()
-    lang_selector = ""
-    if len(available_langs) > 1:
-        lang_options = [Option(format_lang_name(k), value=k, selected=(k == selected_lang)) for k in available_langs]
-        lang_selector = Select(*lang_options, hx_get=f"/update_modal_language/{node_key}", hx_target=f"#{modal_id} .modal-content", hx_swap="outerHTML", hx_trigger="change", name="lang", style="margin-left: auto;")
-    close_button = Span("×", cls="close-button", onclick="this.closest('.modal').remove()")
-    modal_content = Div(
-        Div(Strong(f"Local Graph: {node_key}"), lang_selector, close_button, cls="modal-header"),
-        Div(content, cls="modal-body"),
-        cls="modal-content", data_current_lang=selected_lang
-    )
-    return Div(modal_content, modal_interaction_script(modal_id), id=modal_id, cls="modal")
+def create_modal(data: 'GraphData', modal_id: str, node_key: str, content, selected_lang: str = None, title: str = None, language_url: str = None) -> Div:
+    node_data = data.nodes[node_key]
+    selected_lang = selected_lang or node_data.default_lang
+    return Div(create_modal_content(data, node_key, content, selected_lang, title, language_url), id=modal_id, cls="modal")
 
-def create_modal_content(node_key: str, content, selected_lang: str) -> Div:
-    node_data = NodeData(**T_GRAPH.nodes[node_key])
-    available_langs = list(node_data.texts.keys())
+def create_modal_content(data: 'GraphData', node_key: str, content, selected_lang: str, title: str = None, language_url: str = None) -> Div:
+    node_data = data.nodes[node_key]
+    available_langs = node_data.langs
     def format_lang_name(k): return k.replace('_text', '').replace('_', ' ').title()
     lang_selector = ""
     if len(available_langs) > 1:
         lang_options = [Option(format_lang_name(k), value=k, selected=(k == selected_lang)) for k in available_langs]
-        lang_selector = Select(*lang_options, hx_get=f"/update_modal_language/{node_key}", hx_target="closest .modal-content", hx_swap="outerHTML", hx_trigger="change", name="lang", style="margin-left: auto;")
+        language_url = language_url or f"/update_modal_language/{node_key}"
+        if STATIC_URLS:
+            # A static host cannot read `?lang=`, so each option carries its own URL.
+            lang_options = [Option(format_lang_name(k), value=k, selected=(k == selected_lang), data_url=view_url(language_url, lang=k)) for k in available_langs]
+            lang_selector = Select(*lang_options, onchange="htmx.ajax('GET', this.selectedOptions[0].dataset.url, {target: this.closest('.modal-content'), swap: 'outerHTML'})", name="lang", style="margin-left: auto;")
+        else:
+            lang_selector = Select(*lang_options, hx_get=language_url, hx_target="closest .modal-content", hx_swap="outerHTML", hx_trigger="change", name="lang", style="margin-left: auto;")
     close_button = Span("×", cls="close-button", onclick="this.closest('.modal').remove()")
-    # This function is called by the language updater, so it needs to return the full new modal-content
+    # Also returned on its own by the language updater, which swaps the whole modal-content.
     return Div(
-        Div(Strong(f"Local Graph: {node_key}"), lang_selector, close_button, cls="modal-header"),
+        Div(Strong(title or f"Local Graph: {node_key}"), lang_selector, close_button, cls="modal-header"),
         Div(content, cls="modal-body"),
         cls="modal-content", data_current_lang=selected_lang
     )
 
-def create_tab_buttons(node_key: str, content_id: str, lang: str, active_tab: str = "visual") -> Div:
+METRIC_LABELS = {"pagerank": "PageRank", "betweenness": "Betweenness", "depth": "Proof depth", "premises": "Premises (transitive)", "fan_in": "Fan-in", "fan_out": "Fan-out"}
+
+def metric_controls() -> Div:
+    def select(select_id: str, default: str): return Select(Option(default, value=""), *[Option(METRIC_LABELS[m], value=m) for m in ANALYTICS_METRICS], id=select_id)
+    return Div(Label("Size", select("metric-size", "Uniform")), Label("Color", select("metric-color", "Type")), cls="metric-controls")
+
+def fragment_id(view: str, node_key: str, lang: str = None) -> str:
+    return "-".join(p for p in (view, node_key.replace('.', '-'), lang) if p)
+
+def create_tab_buttons(node_key: str, lang: str, active_tab: str = "visual", base: str = "/local_view", *extra) -> Div:
+    # `node_key` is the path segment the view's routes take after `base` (a key, or source/target for paths).
     return Div(
-        Button("Visual", cls=f"tab-button {'active' if active_tab == 'visual' else ''}", hx_get=f"/local_view/visual/{node_key}?lang={lang}", hx_target=f"#{content_id}", hx_swap="innerHTML"),
-        Button("Textual", cls=f"tab-button {'active' if active_tab == 'textual' else ''}", hx_get=f"/local_view/textual/{node_key}?lang={lang}", hx_target=f"#{content_id}", hx_swap="innerHTML"),
+        Button("Visual", cls=f"tab-button {'active' if active_tab == 'visual' else ''}", hx_get=view_url(f"{base}/visual/{node_key}", lang=lang), hx_target="next .local-content", hx_swap="innerHTML"),
+        Button("Textual", cls=f"tab-button {'active' if active_tab == 'textual' else ''}", hx_get=view_url(f"{base}/textual/{node_key}", lang=lang), hx_target="next .local-content", hx_swap="innerHTML"),
+        *extra,
         cls="tab-buttons"
     )
 
-def render_proof_tree_node(subgraph: nx.DiGraph, node_key: str, selected_lang: str) -> Div:
-    predecessors = list(subgraph.predecessors(node_key))
-    node_data = NodeData(**T_GRAPH.nodes[node_key])
-    color_class = f"node-{node_data.type.lower().replace('axiome', 'axiom')}"
-    tree_content = []
-    if predecessors:
-        premise_divs = [render_proof_tree_node(subgraph, p, selected_lang) for p in predecessors]
-        tree_content.extend([Div(*premise_divs, cls="premises-container"), Div(cls="tree-arrow")])
-    proof_node = Div(Span(cls=f"proof-dot {color_class}"), Span(node_key, cls="proof-label"), cls="proof-node", data_text=node_data.get_text(selected_lang))
-    tree_content.append(proof_node)
-    return Div(*tree_content, style="display: flex; flex-direction: column; align-items: center;")
-
-def render_main_node_box(node_key: str, selected_lang: str) -> Div:
-    node_data = NodeData(**T_GRAPH.nodes[node_key])
+def open_view_button(label: str, url: str) -> Button:
+    # Opens another view of the node as a new modal.
+    return Button(label, hx_get=url, hx_target="body", hx_swap="beforeend", style="margin-left: auto;")
+
+def proof_tree_leaf(data: 'GraphData', node_key: str, selected_lang: str, children: list = None, **kwargs) -> Div:
+    node_data = data.nodes[node_key]
+    tree_content = [Div(*children, cls="premises-container"), Div(cls="tree-arrow")] if children else []
+    tree_content.append(Div(Span(cls=f"proof-dot {node_data.color_class}"), Span(node_key, cls="proof-label"), cls="proof-node", data_proof_key=node_key, data_text=node_data.get_text(selected_lang)))
+    return Div(*tree_content, style="display: flex; flex-direction: column; align-items: center;", **kwargs)
+
+def proof_tree_reference(data: 'GraphData', node_key: str) -> Div:
+    # A premise already drawn elsewhere in the tree: no text, the hover script borrows the original's.
+    node_data = data.nodes[node_key]
+    return Div(Span(cls=f"proof-dot {node_data.color_class}", style="opacity: 0.4;"), Span(f"↑ {node_key}", cls="proof-label"), cls="proof-node proof-ref", data_ref=node_key, title=f"See {node_key} above")
+
+def proof_tree_stub(data: 'GraphData', node_key: str, selected_lang: str, max_depth: int, tree_url: str = "/local_view/proof_tree") -> Div:
+    return Div(
+        Div(Span("▸", cls="proof-label"), cls="premises-container", title="Expand",
+            hx_get=view_url(f"{tree_url}/{node_key}", lang=selected_lang, depth=max_depth),
+            hx_target="closest .proof-subtree", hx_swap="outerHTML", hx_trigger="click", style="cursor: pointer;"),
+        Div(cls="tree-arrow"),
+        proof_tree_leaf(data, node_key, selected_lang),
+        cls="proof-subtree", style="display: flex; flex-direction: column; align-items: center;")
+
+def render_proof_tree(data: 'GraphData', subgraph: LocalSubgraph, node_key: str, selected_lang: str, max_depth: Optional[int] = None, tree_url: str = "/local_view/proof_tree") -> Div:
+    # The ancestry is a DAG, not a tree: every node is drawn once (at its first, leftmost
+    # occurrence) and later occurrences become back-references, so the output is
+    # O(V + E) in the ancestor subgraph. Iterative to survive arbitrarily deep proofs.
+    rendered = {node_key}
+    stack = [(node_key, 0, iter(subgraph.predecessors(node_key)), [])]
+    while True:
+        key, depth, premises, children = stack[-1]
+        premise = next(premises, None)
+        if premise is None:
+            stack.pop()
+            subtree = proof_tree_leaf(data, key, selected_lang, children, cls="proof-subtree")
+            if not stack: return subtree
+            stack[-1][3].append(subtree)
+        elif premise in rendered:
+            children.append(proof_tree_reference(data, premise))
+        else:
+            rendered.add(premise)
+            if max_depth is not None and depth + 1 >= max_depth and next(iter(subgraph.predecessors(premise)), None) is not None:
+                children.append(proof_tree_stub(data, premise, selected_lang, max_depth, tree_url))
+            else:
+                stack.append((premise, depth + 1, iter(subgraph.predecessors(premise)), []))
+
+def render_main_node_box(data: 'GraphData', node_key: str, selected_lang: str) -> Div:
+    node_data = data.nodes[node_key]
     main_text = node_data.get_text(selected_lang)
     # FIX: Corrected NameError by using `selected_lang` instead of `lang`.
     demonstration_text = node_data.get_demonstration(selected_lang)
@@ -344,168 +1015,1690 @@ def render_main_node_box(node_key: str, selected_lang: str) -> Div:
         data_demonstration=demonstration_tooltip
     )
 
+# Optional default depth limit for the textual proof tree; deeper premises are left as
+# click-to-expand stubs. Unset renders the whole ancestry (which is linear in its size).
+PROOF_TREE_MAX_DEPTH = int(os.environ['PROOF_TREE_MAX_DEPTH']) if os.environ.get('PROOF_TREE_MAX_DEPTH') else None
+
+# ==============================================================================
+# RESPONSE CACHING
+# ==============================================================================
+# Rendered bodies are cached per graph version (the source hash is part of every key),
+# so swapping in new graph data invalidates them without any explicit bookkeeping.
+RESPONSE_CACHE = LRUCache(int(os.environ.get('RESPONSE_CACHE_SIZE', 512)))
+# /api/texts batches are near-unique per client (whatever a user hovered), so they get a
+# cache of their own rather than evicting pages and modals from RESPONSE_CACHE.
+TEXTS_CACHE = LRUCache(int(os.environ.get('TEXTS_CACHE_SIZE', 128)))
+MAIN_PAGE_CACHE_CONTROL = "public, no-cache"
+FRAGMENT_CACHE_CONTROL = "public, no-cache"
+# Fragments are compressed on the request path of a cache miss, so they trade some ratio for speed.
+FRAGMENT_BROTLI_QUALITY = 5
+
+def clear_response_caches() -> None:
+    RESPONSE_CACHE.clear()
+    TEXTS_CACHE.clear()
+
+class CachedPayload:
+    # A response body stored once in every content-coding we can serve.
+    __slots__ = ('body', 'media_type', 'etag', 'encoded')
+
+    @timed("compress")
+    def __init__(self, body: bytes, media_type: str = "text/html; charset=utf-8", brotli_quality: int = 11):
+        self.body, self.media_type = body, media_type
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.encoded = {'gzip': gzip.compress(body, compresslevel=9 if brotli_quality > 9 else 6, mtime=0)}
+        if brotli is not None: self.encoded['br'] = brotli.compress(body, quality=brotli_quality)
+
+def accepted_encodings(req) -> set:
+    accepted = set()
+    for part in req.headers.get('accept-encoding', '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'): accepted.add(coding.strip().lower())
+    return accepted
+
+def payload_response(req, payload: CachedPayload, cache_control: str) -> Response:
+    accepted = accepted_encodings(req)
+    encoding = next((e for e in ('br', 'gzip') if e in accepted and e in payload.encoded), None)
+    # Strong ETags must differ per representation, so the coding is part of the tag.
+    etag = f'"{payload.etag}-{encoding}"' if encoding else f'"{payload.etag}"'
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept-Encoding'}
+    if_none_match = [t.strip().removeprefix('W/') for t in req.headers.get('if-none-match', '').split(',')]
+    if etag in if_none_match or '*' in if_none_match: return Response(status_code=304, headers=headers)
+    if encoding: headers['Content-Encoding'] = encoding
+    return Response(payload.encoded[encoding] if encoding else payload.body, media_type=payload.media_type, headers=headers)
+
+# Handlers are async: cache hits and lookups in loaded books are answered on the event loop,
+# so they never wait behind a render. Cache misses, book loads, citation paths and search run
+# in a pool of RENDER_THREADS threads (default 4); once RENDER_QUEUE_LIMIT more (default 64)
+# are waiting, further requests get a 503 with Retry-After rather than an unbounded wait.
+# Concurrent misses for the same cached response share one render. Time spent waiting for
+# a thread is reported as the `queue` phase.
+RENDER_THREADS = int(os.environ.get('RENDER_THREADS', 4))
+RENDER_QUEUE_LIMIT = int(os.environ.get('RENDER_QUEUE_LIMIT', 64))
+RENDER_RETRY_AFTER = 1
+
+class RenderPoolFull(Exception): pass
+
+class RenderPool:
+    # Jobs are counted from submission until their thread is done with them, even when the
+    # request that submitted one is gone, so the counters and the table of shared renders
+    # are updated from the render threads too, under a lock. Threads start on first use, so
+    # a pool created before the prefork server forks is still empty.
+    def __init__(self, threads: int, queue_limit: int):
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="render")
+        self.limit, self.pending, self.rejected = threads + queue_limit, 0, 0
+        self.inflight, self._lock = {}, threading.Lock()
+
+    def _done(self, key, future) -> None:
+        with self._lock:
+            self.pending -= 1
+            if self.inflight.get(key) is future: del self.inflight[key]
+
+    async def run(self, fn: Callable, *args, key=None):
+        # Requests running with the same `key` while its job is queued or running wait for that
+        # job instead of submitting their own; a shared job is not cancelled with the request
+        # that submitted it.
+        with self._lock:
+            future = self.inflight.get(key) if key is not None else None
+            if future is None:
+                if self.pending >= self.limit:
+                    self.rejected += 1
+                    raise RenderPoolFull()
+                submitted = time.perf_counter()
+                def call():
+                    clock = REQUEST_PHASES.get()
+                    if clock is not None: clock.totals['queue'] = clock.totals.get('queue', 0.0) + time.perf_counter() - submitted
+                    return fn(*args)
+                future = self.executor.submit(copy_context().run, call)
+                self.pending += 1
+                if key is not None: self.inflight[key] = future
+                callback = functools.partial(self._done, key)
+            else: callback = None
+        # Outside the lock: a job already done runs its callback right away.
+        if callback is not None: future.add_done_callback(callback)
+        result = asyncio.wrap_future(future)
+        return await (result if key is None else asyncio.shield(result))
+
+RENDER_POOL = RenderPool(RENDER_THREADS, RENDER_QUEUE_LIMIT)
+
+async def render_pool_full(req, exc) -> Response:
+    return Response("Server busy, retry shortly.", status_code=503, media_type="text/plain; charset=utf-8",
+                    headers={"Retry-After": str(RENDER_RETRY_AFTER), "Cache-Control": "no-store"})
+
+app.add_exception_handler(RenderPoolFull, render_pool_full)
+
+async def loaded(fn: Callable, *args, keys: tuple = ()):
+    # A book already in memory is looked up on the event loop; loading one goes to the pool.
+    # `keys` are the nodes the handler then reads on the event loop: unless the book has them
+    # all in memory (SQLite stores cache recent ones), the lookup goes to the pool and loads them.
+    try:
+        data = fn(*args, load=False)
+        if data.nodes_cached(keys): return data
+    except NotLoaded: pass
+    def load():
+        data = fn(*args)
+        data.load_nodes(keys)
+        return data
+    return await RENDER_POOL.run(load)
+
+def render_page(req, title: str, *components) -> bytes:
+    # The full document FastHTML would build for a non-htmx request, minus the per-host canonical link.
+    page_title, main = Titled(title, *components)
+    return to_xml(respond(req, [page_title], (main,))).encode('utf-8')
+
+def render_main_page(req, data: 'GraphData') -> CachedPayload:
+    # Search needs the server, so static exports leave its form out.
+    graph_url = api_url(data, "/api/graph", book=data.book_id)
+    # The preload starts fetching the graph while the scripts are still loading.
+    with phase("render"): body = render_page(req, data.title, Link(rel="preload", href=graph_url, crossorigin="anonymous", **{"as": "fetch"}),
+                                             "" if STATIC_URLS else search_form(), metric_controls(),
+                                             Div(id="cy", cls="main-view", data_graph_url=graph_url, data_analytics_url=api_url(data, "/api/analytics", book=data.book_id),
+                                                 data_node_url=view_url("/local_view/{node}")))
+    return CachedPayload(body)
+
+async def main_page_payload(req, data: 'GraphData') -> CachedPayload:
+    key = (data.source_hash, "/", data.book_id)
+    payload = None if profiling() else RESPONSE_CACHE.get(key)
+    if payload is None:
+        payload = await RENDER_POOL.run(render_main_page, req, data, key=None if profiling() else key)
+        RESPONSE_CACHE.put(key, payload)
+    return payload
+
 # ==============================================================================
 # ROUTES & RENDERING
 # ==============================================================================
-# FIX: Restored the missing `elements_json` definition.
-@rt("/")
-def get():
+async def main_page(req, data: 'GraphData'):
     try:
-        if not T_GRAPH or T_GRAPH.number_of_nodes() == 0:
+        if data.number_of_nodes() == 0:
             return Titled("Graph Visualization - No Data", Div(P("No graph data loaded.")))
-        elements_json = serialize_graph_for_cytoscape(T_GRAPH, NODE_LEVELS)
-        return Titled("Livre I", graph_styles, Div(id="cy"), cytoscape_init_script("cy", elements_json))
+        return payload_response(req, await main_page_payload(req, data), MAIN_PAGE_CACHE_CONTROL)
+    except RenderPoolFull: raise
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"--- SERVER ERROR IN / ROUTE ---\n{error_details}\n-----------------------------")
         return Titled("Server Error", H2("An error occurred on the server"), P("The following error was caught:"), Pre(Code(error_details), style="background-color: #eee; padding: 10px; border-radius: 5px;"), style="padding: 20px;")
 
+@rt("/")
+async def get(req):
+    return await main_page(req, await loaded(corpus().book))
+
+@rt("/book/{book_id}")
+async def get(req, book_id: str):
+    if book_id not in corpus().books: return Titled("Not Found", P(f"Book {book_id} not found"))
+    return await main_page(req, await loaded(corpus().book, book_id))
+
+def asset_payload(path: str) -> CachedPayload:
+    with open(path, 'rb') as f: body = f.read()
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return CachedPayload(body, f"{media_type}; charset=utf-8" if media_type.startswith("text/") or media_type.endswith("javascript") else media_type)
+
+# The assets are fixed for the life of the process, so they are all read and compressed at
+# import (in the prefork parent, before it forks) and served without touching the render pool.
+ASSET_PAYLOADS = {url: asset_payload(path) for url, path in ASSET_FILES.items()}
+
+def default_lang(data: 'GraphData', node_key: str) -> str:
+    return data.nodes[node_key].default_lang
+
+def node_not_found(node_key: str) -> Div:
+    return Div(f"Node {node_key} not found", style="color: red;")
+
+def render_fragment(render: Callable) -> CachedPayload:
+    with phase("render"): body = to_xml(render()).encode('utf-8')
+    return CachedPayload(body, brotli_quality=FRAGMENT_BROTLI_QUALITY)
+
+async def cached_fragment(req, data: 'GraphData', key: tuple, render: Callable) -> Response:
+    # `key` must capture everything the fragment depends on besides the graph version.
+    full_key = (data.source_hash,) + key
+    payload = None if profiling() else RESPONSE_CACHE.get(full_key)
+    if payload is None:
+        payload = await RENDER_POOL.run(render_fragment, render, key=None if profiling() else full_key)
+        RESPONSE_CACHE.put(full_key, payload)
+    return payload_response(req, payload, FRAGMENT_CACHE_CONTROL)
+
 # FIX: Restructured the returned Div to create a stable flex container for swapped content.
-@rt("/local_view/{node_key}")
-def get(node_key: str, lang: str = None):
-    if node_key not in T_GRAPH: return Div(f"Node {node_key} not found", style="color: red;")
-    node_data = NodeData(**T_GRAPH.nodes[node_key])
-    lang = lang or next(iter(node_data.texts.keys()), 'french_text')
-    subgraph = get_local_subgraph(T_GRAPH, node_key)
-    modal_id = f"modal-{node_key.replace('.', '-')}-{int(time.time() * 1000)}"
-    content_id = f"local-content-{node_key.replace('.', '-')}-{int(time.time() * 1000)}"
-    
-    visual_content = render_local_visual(subgraph, node_key, lang)
-    
-    swappable_container = Div(visual_content, id=content_id, style="flex-grow: 1; min-height: 0;")
-    
-    content_wrapper = Div(
-        create_tab_buttons(node_key, content_id, lang, "visual"),
+def view_body(tabs: Div, content, content_id: str) -> Div:
+    swappable_container = Div(content, id=content_id, cls="local-content", style="flex-grow: 1; min-height: 0;")
+    return Div(
+        tabs,
         swappable_container,
         style="display: flex; flex-direction: column; height: 100%;"
     )
-    return create_modal(modal_id, node_key, content_wrapper, lang)
+
+def local_view_body(data: 'GraphData', node_key: str, lang: str) -> Div:
+    tabs = create_tab_buttons(node_key, lang, "visual", "/local_view", open_view_button("Impact", view_url(f"/impact/{node_key}", lang=lang)))
+    return view_body(tabs, render_local_visual(data, data.local_subgraph(node_key), node_key, lang), fragment_id("local-content", node_key, lang))
+
+@rt("/local_view/{node_key}")
+async def get(req, node_key: str, lang: str = None):
+    data = await loaded(corpus().for_node, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
+    lang = lang or default_lang(data, node_key)
+    return await cached_fragment(req, data, ("modal", node_key, lang), lambda: create_modal(data, fragment_id("modal", node_key), node_key, local_view_body(data, node_key, lang), lang))
 
 @rt("/local_view/visual/{node_key}")
-def get(node_key: str, lang: str = None):
-    node_data = NodeData(**T_GRAPH.nodes[node_key])
-    lang = lang or next(iter(node_data.texts.keys()), 'french_text')
-    return render_local_visual(get_local_subgraph(T_GRAPH, node_key), node_key, lang)
+async def get(req, node_key: str, lang: str = None):
+    data = await loaded(corpus().for_node, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
+    lang = lang or default_lang(data, node_key)
+    return await cached_fragment(req, data, ("visual", node_key, lang), lambda: render_local_visual(data, data.local_subgraph(node_key), node_key, lang))
 
 @rt("/local_view/textual/{node_key}")
-def get(node_key: str, lang: str = None):
+async def get(req, node_key: str, lang: str = None, depth: int = None):
     try:
-        if node_key not in T_GRAPH: return Div(f"Node {node_key} not found", style="color: red;")
-        node_data = NodeData(**T_GRAPH.nodes[node_key])
-        lang = lang or next(iter(node_data.texts.keys()), 'french_text')
-        return render_local_textual(get_local_subgraph(T_GRAPH, node_key), node_key, lang)
+        data = await loaded(corpus().for_node, node_key, keys=(node_key,))
+        if node_key not in data: return node_not_found(node_key)
+        lang, depth = lang or default_lang(data, node_key), depth or PROOF_TREE_MAX_DEPTH
+        return await cached_fragment(req, data, ("textual", node_key, lang, depth), lambda: render_local_textual(data, data.local_subgraph(node_key), node_key, lang, depth))
+    except RenderPoolFull: raise
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"--- SERVER ERROR IN /local_view/textual/{node_key} ---\n{error_details}\n--------------------------------------------------")
         return Div(H4("Error rendering textual view"), Pre(Code(error_details)), style="color: red; background: #fee; padding: 10px; border: 1px solid red;")
 
+# Expands a stub left by a depth-limited proof tree into the next `depth` levels of its premises.
+@rt("/local_view/proof_tree/{node_key}")
+async def get(req, node_key: str, lang: str = None, depth: int = None):
+    data = await loaded(corpus().for_node, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
+    lang, depth = lang or default_lang(data, node_key), depth or PROOF_TREE_MAX_DEPTH
+    return await cached_fragment(req, data, ("proof_tree", node_key, lang, depth), lambda: render_proof_tree(data, data.local_subgraph(node_key), node_key, lang, depth))
+
 @rt("/update_modal_language/{node_key}")
-def get(node_key: str, lang: str):
-    subgraph = get_local_subgraph(T_GRAPH, node_key)
-    content_id = f"local-content-{node_key.replace('.', '-')}-{int(time.time() * 1000)}"
-    swappable_container = Div(render_local_visual(subgraph, node_key, lang), id=content_id, style="flex-grow: 1; min-height: 0;")
-    content_wrapper = Div(
-        create_tab_buttons(node_key, content_id, lang, "visual"),
-        swappable_container,
-        style="display: flex; flex-direction: column; height: 100%;"
-    )
+async def get(req, node_key: str, lang: str):
+    data = await loaded(corpus().for_node, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
     # The language updater needs to return the full modal-content, not the wrapper
-    return create_modal_content(node_key, content_wrapper, lang)
+    return await cached_fragment(req, data, ("modal_content", node_key, lang), lambda: create_modal_content(data, node_key, local_view_body(data, node_key, lang), lang))
+
+# The impact view is the local view turned around: the node and everything that rests on
+# it, across every book citing its own. Its proof tree grows downwards, one branch per
+# consequence, with the same depth limit and stubs.
+def render_impact_visual(data: 'GraphData', node_key: str, lang: str) -> Div:
+    return render_local_visual(data, data.impact_subgraph(node_key), node_key, lang, f"/api/impact/{node_key}", "impact")
+
+def render_impact_textual(data: 'GraphData', node_key: str, lang: str, depth: Optional[int]) -> Div:
+    return render_local_textual(data, data.impact_subgraph(node_key).reversed(), node_key, lang, depth, "Consequences", "/impact/tree", "proof-tree impact-tree")
+
+def impact_view_body(data: 'GraphData', node_key: str, lang: str) -> Div:
+    tabs = create_tab_buttons(node_key, lang, "visual", "/impact", open_view_button("Premises", view_url(f"/local_view/{node_key}", lang=lang)))
+    return view_body(tabs, render_impact_visual(data, node_key, lang), fragment_id("impact-content", node_key, lang))
+
+def impact_title(node_key: str) -> str:
+    return f"Impact: {node_key}"
+
+@rt("/impact/{node_key}")
+async def get(req, node_key: str, lang: str = None):
+    data = await loaded(corpus().for_impact, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
+    lang = lang or default_lang(data, node_key)
+    return await cached_fragment(req, data, ("impact_modal", node_key, lang), lambda: create_modal(data, fragment_id("impact-modal", node_key), node_key, impact_view_body(data, node_key, lang), lang,
+                                                                                            impact_title(node_key), f"/impact/update_modal_language/{node_key}"))
+
+@rt("/impact/visual/{node_key}")
+async def get(req, node_key: str, lang: str = None):
+    data = await loaded(corpus().for_impact, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
+    lang = lang or default_lang(data, node_key)
+    return await cached_fragment(req, data, ("impact_visual", node_key, lang), lambda: render_impact_visual(data, node_key, lang))
+
+@rt("/impact/textual/{node_key}")
+async def get(req, node_key: str, lang: str = None, depth: int = None):
+    data = await loaded(corpus().for_impact, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
+    lang, depth = lang or default_lang(data, node_key), depth or PROOF_TREE_MAX_DEPTH
+    return await cached_fragment(req, data, ("impact_textual", node_key, lang, depth), lambda: render_impact_textual(data, node_key, lang, depth))
+
+@rt("/impact/tree/{node_key}")
+async def get(req, node_key: str, lang: str = None, depth: int = None):
+    data = await loaded(corpus().for_impact, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
+    lang, depth = lang or default_lang(data, node_key), depth or PROOF_TREE_MAX_DEPTH
+    return await cached_fragment(req, data, ("impact_tree", node_key, lang, depth), lambda: render_proof_tree(data, data.impact_subgraph(node_key).reversed(), node_key, lang, depth, "/impact/tree"))
+
+@rt("/impact/update_modal_language/{node_key}")
+async def get(req, node_key: str, lang: str):
+    data = await loaded(corpus().for_impact, node_key, keys=(node_key,))
+    if node_key not in data: return node_not_found(node_key)
+    return await cached_fragment(req, data, ("impact_modal_content", node_key, lang), lambda: create_modal_content(data, node_key, impact_view_body(data, node_key, lang), lang,
+                                                                                                           impact_title(node_key), f"/impact/update_modal_language/{node_key}"))
+
+# The shortest chain of citations leading from `source` to `target`, drawn with the local
+# view's renderers. Either node may come first: when `source` does not lead to `target`,
+# the chain from `target` to `source` is shown instead.
+def find_citation_path(source: str, target: str) -> Tuple['GraphData', Optional[list]]:
+    for premise, conclusion in ((source, target), (target, source)):
+        # The conclusion's book includes every book its premises come from.
+        data = corpus().for_node(conclusion)
+        if premise in data and conclusion in data:
+            path = data.citation_path(premise, conclusion)
+            if path: return data, path
+    return corpus().for_node(target), None
+
+def path_subgraph(path: list) -> LocalSubgraph:
+    return LocalSubgraph(path, list(zip(path, path[1:])))
+
+def no_citation_path(source: str, target: str) -> Div:
+    return Div(f"No citation path between {source} and {target}", style="color: red;")
+
+def render_path_visual(data: 'GraphData', path: list, lang: str) -> Div:
+    return render_local_visual(data, path_subgraph(path), path[-1], lang, f"/api/path/{path[0]}/{path[-1]}")
+
+def path_view_body(data: 'GraphData', source: str, target: str, path: list, lang: str) -> Div:
+    tabs = create_tab_buttons(f"{source}/{target}", lang, "visual", "/path")
+    return view_body(tabs, render_path_visual(data, path, lang), fragment_id("path-content", f"{source}--{target}", lang))
+
+def path_title(path: list) -> str:
+    return f"Citation path: {' → '.join(path)}" if len(path) <= 6 else f"Citation path: {path[0]} → … → {path[-1]} ({len(path) - 1} steps)"
+
+@rt("/path/{source}/{target}")
+async def get(req, source: str, target: str, lang: str = None):
+    data, path = await RENDER_POOL.run(find_citation_path, source, target)
+    if path is None: return no_citation_path(source, target)
+    lang = lang or default_lang(data, path[-1])
+    return await cached_fragment(req, data, ("path_modal", source, target, lang), lambda: create_modal(data, fragment_id("path-modal", f"{source}--{target}"), path[-1], path_view_body(data, source, target, path, lang), lang,
+                                                                                               path_title(path), f"/path/update_modal_language/{source}/{target}"))
+
+@rt("/path/visual/{source}/{target}")
+async def get(req, source: str, target: str, lang: str = None):
+    data, path = await RENDER_POOL.run(find_citation_path, source, target)
+    if path is None: return no_citation_path(source, target)
+    lang = lang or default_lang(data, path[-1])
+    return await cached_fragment(req, data, ("path_visual", source, target, lang), lambda: render_path_visual(data, path, lang))
+
+@rt("/path/textual/{source}/{target}")
+async def get(req, source: str, target: str, lang: str = None):
+    data, path = await RENDER_POOL.run(find_citation_path, source, target)
+    if path is None: return no_citation_path(source, target)
+    lang = lang or default_lang(data, path[-1])
+    return await cached_fragment(req, data, ("path_textual", source, target, lang), lambda: render_local_textual(data, path_subgraph(path), path[-1], lang, None, "Citation Path"))
+
+@rt("/path/update_modal_language/{source}/{target}")
+async def get(req, source: str, target: str, lang: str):
+    data, path = await RENDER_POOL.run(find_citation_path, source, target)
+    if path is None: return no_citation_path(source, target)
+    return await cached_fragment(req, data, ("path_modal_content", source, target, lang), lambda: create_modal_content(data, path[-1], path_view_body(data, source, target, path, lang), lang,
+                                                                                                               path_title(path), f"/path/update_modal_language/{source}/{target}"))
+
+# ==============================================================================
+# JSON DATA API
+# ==============================================================================
+# Every payload carries the version of the graph it was built from. URLs the HTML embeds
+# are pinned to that version with `?v=`, which makes them immutable; unpinned requests
+# revalidate with the ETag instead. The version also covers this file, so a deploy that
+# changes what a payload holds never answers a URL pinned by the previous code.
+API_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+API_CACHE_CONTROL = "public, no-cache"
+
+def data_version(source_hash: str) -> str:
+    return hashlib.sha256(f"{source_hash}:{CODE_VERSION}".encode()).hexdigest()[:16] if source_hash else ""
+
+# Set while rendering a static export (see STATIC EXPORT): parameters become path segments,
+# views end in `/` (served as index.html) and JSON in `.json`, under the content-hashed name
+# recorded in STATIC_ASSETS when there is one.
+STATIC_URLS = False
+STATIC_ASSETS = {}
+
+def view_url(path: str, **params) -> str:
+    values = {k: v for k, v in params.items() if v is not None}
+    if STATIC_URLS: return "/".join([path.rstrip('/'), *map(str, values.values())]) + "/"
+    return f"{path}?{urlencode(values)}" if values else path
+
+def static_api_url(path: str, **params) -> str:
+    return "/".join([path, *(str(v) for v in params.values() if v not in (None, ""))]) + ".json"
+
+def api_url(data: 'GraphData', path: str, **params) -> str:
+    if STATIC_URLS:
+        url = static_api_url(path, **params)
+        return STATIC_ASSETS.get(url, url)
+    return f"{path}?{urlencode({k: v for k, v in {**params, 'v': data.version}.items() if v is not None})}"
+
+def api_not_found(message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=404)
+
+def build_json(data: 'GraphData', build: Callable) -> Optional[CachedPayload]:
+    with phase("serialize"):
+        body = build()
+        if body is None: return None
+        if not isinstance(body, bytes): body = json.dumps({"version": data.version, **body}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return CachedPayload(body, media_type="application/json", brotli_quality=FRAGMENT_BROTLI_QUALITY)
+
+async def cached_json(req, data: 'GraphData', key: tuple, build: Callable, not_found: str = None, cache: LRUCache = RESPONSE_CACHE) -> Response:
+    # `build` may return None for a resource that turns out not to exist: a 404 with `not_found`.
+    full_key = (data.source_hash, "api") + key
+    payload = None if profiling() else cache.get(full_key)
+    if payload is None:
+        payload = await RENDER_POOL.run(build_json, data, build, key=None if profiling() else full_key)
+        if payload is None: return api_not_found(not_found)
+        cache.put(full_key, payload)
+    pinned = req.query_params.get('v') == data.version
+    return payload_response(req, payload, API_IMMUTABLE_CACHE_CONTROL if pinned else API_CACHE_CONTROL)
+
+@timed("nodes")
+def node_payload(data: 'GraphData', node_key: str, lang: str = None) -> dict:
+    node_data = data.nodes[node_key]
+    payload = {"key": node_key, "book": corpus().book_of(node_key), "type": node_data.type, "number": node_data.number, "langs": list(node_data.langs),
+               "level": data.level(node_key), "premises": data.predecessors(node_key), "consequences": data.successors(node_key), "metrics": data.node_metrics(node_key)}
+    if lang:
+        payload.update(lang=lang, text=node_data.get_text(lang), demonstration=node_data.get_demonstration(lang),
+                       components=[{"type": c.get("type"), "text": c.get("texts", {}).get(lang)} for c in node_data.components])
+    else:
+        payload.update(texts=node_data.texts, components=[{"type": c.get("type"), "texts": c.get("texts", {})} for c in node_data.components])
+    return payload
+
+@rt("/api/graph")
+async def get(req, book: str = None):
+    if book is not None and book not in corpus().books: return api_not_found(f"Book {book} not found")
+    data = await loaded(corpus().book, book)
+    # main_elements_json is already serialized, so splice it in rather than re-encoding it.
+    if data.lod():
+        # Large books start from the cluster overview; members come from /api/cluster on demand.
+        lod = json.dumps({"budget": LOD_CLIENT_NODES, "cluster_url": api_url(data, "/api/cluster/{cluster}", book=data.book_id)}, separators=(',', ':'))
+        return await cached_json(req, data, ("graph", data.book_id, "lod"), lambda: f'{{"version":"{data.version}","book":"{data.book_id}","lod":{lod},"elements":{data.overview_json}}}'.encode('utf-8'))
+    return await cached_json(req, data, ("graph", data.book_id), lambda: f'{{"version":"{data.version}","book":"{data.book_id}","elements":{data.main_elements_json}}}'.encode('utf-8'))
+
+# A cluster of the level-of-detail main view: its members and every edge touching them, each
+# edge with both endpoints' clusters so the client can attach it to a collapsed cluster.
+@rt("/api/cluster/{cluster_id}")
+async def get(req, cluster_id: str, book: str = None):
+    if book is not None and book not in corpus().books: return api_not_found(f"Book {book} not found")
+    data = await loaded(corpus().book, book)
+    def build():
+        elements = data.cluster_elements(cluster_id)
+        return None if elements is None else {"cluster": cluster_id, "elements": elements}
+    return await cached_json(req, data, ("cluster", data.book_id, cluster_id), build, f"Cluster {cluster_id} not found")
+
+# The precomputed metrics of a book's own nodes (see GRAPH ANALYTICS), as columns in `metrics` order.
+@rt("/api/analytics")
+async def get(req, book: str = None):
+    if book is not None and book not in corpus().books: return api_not_found(f"Book {book} not found")
+    data = await loaded(corpus().book, book)
+    return await cached_json(req, data, ("analytics", data.book_id), lambda: {"book": data.book_id, "metrics": list(ANALYTICS_METRICS), "nodes": data.book_metrics()})
+
+@rt("/api/subgraph/{node_key}")
+async def get(req, node_key: str):
+    data = await loaded(corpus().for_node, node_key, keys=(node_key,))
+    if node_key not in data: return api_not_found(f"Node {node_key} not found")
+    return await cached_json(req, data, ("subgraph", node_key), lambda: {"node": node_key, "elements": local_visual_elements(data, data.local_subgraph(node_key), node_key)})
+
+@rt("/api/impact/{node_key}")
+async def get(req, node_key: str):
+    data = await loaded(corpus().for_impact, node_key, keys=(node_key,))
+    if node_key not in data: return api_not_found(f"Node {node_key} not found")
+    return await cached_json(req, data, ("impact", node_key), lambda: {"node": node_key, "elements": local_visual_elements(data, data.impact_subgraph(node_key), node_key)})
+
+@rt("/api/path/{source}/{target}")
+async def get(req, source: str, target: str):
+    data, path = await RENDER_POOL.run(find_citation_path, source, target)
+    if path is None: return api_not_found(f"No citation path between {source} and {target}")
+    return await cached_json(req, data, ("path", source, target), lambda: {"source": source, "target": target, "path": path,
+                                                                     "elements": local_visual_elements(data, path_subgraph(path), path[-1])})
+
+# Batched text lookup: `keys` is a comma-separated list of node keys, each optionally
+# suffixed with `@<lang>` to override `lang`; `demonstrations` lists the keys whose
+# demonstration should be included as well. All keys are looked up in the graph of
+# `book` (the modal's book, whose graph includes the books it cites), defaulting to
+# the book of the first key; `scope=impact` uses the book's impact graph, which also
+# includes the books citing it.
+API_TEXTS_MAX_KEYS = 500
+
+def parse_text_requests(data: 'GraphData', keys: str, lang: str = None) -> list:
+    pairs = []
+    for item in filter(None, (k.strip() for k in keys.split(','))):
+        key, _, item_lang = item.partition('@')
+        pairs.append((key, item_lang or lang or default_lang(data, key)))
+    return pairs
+
+@timed("nodes")
+def texts_payload(data: 'GraphData', pairs: list, demonstration_keys: set) -> dict:
+    texts = {}
+    for key, lang in pairs:
+        node_data = data.nodes[key]
+        entry = {"text": node_data.get_text(lang)}
+        if key in demonstration_keys: entry["demonstration"] = node_data.get_demonstration(lang)
+        texts.setdefault(key, {})[lang] = entry
+    return {"texts": texts}
+
+def texts_data(book: Optional[str], scope: Optional[str], first: Optional[str], load: bool = True) -> 'GraphData':
+    books = corpus()
+    if scope == "impact": return books.book(book, books.citing_books(book, load), load) if book else books.for_impact(first, load) if first else books.book(load=load)
+    return books.book(book, load=load) if book else books.for_node(first, load) if first else books.book(load=load)
+
+@rt("/api/texts")
+async def get(req, keys: str = "", lang: str = None, demonstrations: str = "", book: str = None, scope: str = None):
+    requested = [k.partition('@')[0].strip() for k in keys.split(',') if k.strip()]
+    if len(requested) > API_TEXTS_MAX_KEYS: return JSONResponse({"error": f"At most {API_TEXTS_MAX_KEYS} keys per request"}, status_code=400)
+    if book is not None and book not in corpus().books: return api_not_found(f"Book {book} not found")
+    data = await loaded(texts_data, book, scope, requested[0] if requested else None, keys=tuple(requested))
+    missing = [k for k in requested if k not in data]
+    if missing: return api_not_found(f"Nodes not found: {', '.join(missing)}")
+    pairs = sorted(set(parse_text_requests(data, keys, lang)))
+    demonstration_keys = {k.strip() for k in demonstrations.split(',') if k.strip()}
+    return await cached_json(req, data, ("texts", tuple(pairs), tuple(sorted(demonstration_keys))), lambda: texts_payload(data, pairs, demonstration_keys), cache=TEXTS_CACHE)
+
+@rt("/api/node/{node_key}")
+async def get(req, node_key: str, lang: str = None):
+    data = await loaded(corpus().for_node, node_key, keys=(node_key,))
+    if node_key not in data: return api_not_found(f"Node {node_key} not found")
+    return await cached_json(req, data, ("node", node_key, lang), lambda: node_payload(data, node_key, lang))
+
+# ==============================================================================
+# SEARCH
+# ==============================================================================
+SEARCH_LIMIT = int(os.environ.get('SEARCH_LIMIT', 20))
+SEARCH_MAX_LIMIT = 100
+SEARCH_LANGS = (("french_text", "Français"), ("english_text", "English"), ("latin_text", "Latina"))
+
+def search_form(q: str = "", lang: str = None) -> Form:
+    return Form(Input(type="search", name="q", value=q, placeholder="Search the Ethics"),
+                Select(Option("All languages", value=""), *[Option(label, value=value, selected=value == lang) for value, label in SEARCH_LANGS], name="lang"),
+                Button("Search"), action="/search", method="get", cls="search-form")
+
+def highlighted(text: str, highlights: list) -> list:
+    parts, pos = [], 0
+    for start, end in highlights:
+        parts.extend([text[pos:start], Mark(text[start:end])])
+        pos = end
+    parts.append(text[pos:])
+    return parts
+
+def search_result(hit: dict) -> Li:
+    # Opens the node's local view as a modal on this page, in the language that matched.
+    return Li(A(hit["key"], hx_get=f"/local_view/{hit['key']}?lang={hit['lang']}", hx_target="body", hx_swap="beforeend"),
+              Span(hit["field"] or hit["type"], cls="search-field"), P(*highlighted(hit["snippet"], hit["highlights"])), cls="search-hit")
+
+@rt("/search")
+async def get(q: str = "", lang: str = None, book: str = None):
+    hits = await RENDER_POOL.run(corpus().search, q, lang or None, book if book in corpus().books else None, SEARCH_LIMIT) if q.strip() else []
+    results = Ul(*map(search_result, hits), cls="search-results") if hits else P("No results." if q.strip() else "")
+    return Title("Search"), Div(H1("Search"), search_form(q, lang), results, cls="search-page")
+
+@rt("/api/search")
+async def get(q: str = "", lang: str = None, book: str = None, limit: int = SEARCH_LIMIT):
+    if book is not None and book not in corpus().books: return api_not_found(f"Book {book} not found")
+    hits = await RENDER_POOL.run(corpus().search, q, lang or None, book, max(1, min(limit, SEARCH_MAX_LIMIT))) if q.strip() else []
+    return JSONResponse({"query": q, "lang": lang, "hits": [dict(hit, url=f"/local_view/{hit['key']}?lang={hit['lang']}") for hit in hits]})
 
 # ==============================================================================
 # VISUAL & TEXTUAL RENDERING
 # ==============================================================================
-def render_local_visual(subgraph: nx.DiGraph, node_key: str, lang: str) -> Div:
-    container_id = f"local-cy-{node_key.replace('.', '-')}-{int(time.time() * 1000)}"
+# Structure only: tooltip and demonstration texts are fetched in batches from /api/texts
+# the first time the user hovers a node, so the modal payload no longer scales with text size.
+def local_visual_elements(data: 'GraphData', subgraph: LocalSubgraph, node_key: str) -> list:
     elements = []
     for n in subgraph.nodes():
-        node_data = NodeData(**T_GRAPH.nodes[n])
-        elements.append({"data": { "id": n, "label": n, "type": node_data.type.lower(), "full_text": node_data.get_text(lang), "demonstration": node_data.get_demonstration(lang) if n == node_key else None, "is_center": n == node_key }})
+        node_data = data.nodes[n]
+        elements.append({"data": { "id": n, "label": n, "type": node_data.type_lower, "is_center": n == node_key }})
     for u, v in subgraph.edges():
         elements.append({"data": {"id": f"{u}->{v}", "source": u, "target": v}})
-    elements_json = json.dumps(elements)
-
-    init_script = Script(f"""
-        (function() {{
-            requestAnimationFrame(function() {{
-                const container = document.getElementById('{container_id}');
-                if (!container || container._cy || typeof cytoscape === 'undefined') return;
-                const cy = cytoscape({{
-                    container: container,
-                    elements: {elements_json},
-                    layout: {{ name: 'breadthfirst', directed: true, padding: 30, grid: true, roots: ['{node_key}'] }},
-                    style: [
-                        {{ selector: 'node', style: {{
-                            'label': 'data("label")', 'text-opacity': 1, 'font-size': '10px', 'text-valign': 'center', 'text-halign': 'center', 'color': '#333',
-                            'text-outline-width': 2, 'text-outline-color': '#fff',
-                            'background-color': function(ele) {{
-                                const t = ele.data('type').toLowerCase();
-                                if (t === 'definition') return '#007bff'; if (t === 'axiome' || t === 'axiom') return '#dc3545';
-                                if (t === 'proposition') return '#28a745'; if (t === 'theorem') return '#ffc107';
-                                if (t === 'appendice') return '#17a2b8'; if (t === 'corollaire') return '#e83e8c';
-                                if (t === 'scolie') return '#fd7e14'; return '#6c757d';
-                            }},
-                            'width': '40px', 'height': '40px',
-                            'border-width': function(ele) {{ return ele.data('is_center') ? 3 : 2; }},
-                            'border-color': function(ele) {{ return ele.data('is_center') ? '#000' : '#333'; }}
-                        }} }},
-                        {{ selector: 'edge', style: {{ 'width': 1.5, 'line-color': '#ccc', 'target-arrow-color': '#ccc', 'target-arrow-shape': 'triangle', 'curve-style': 'bezier' }} }}
-                    ],
-                    minZoom: 0.2, maxZoom: 3
-                }});
-                container._cy = cy;
-                const tooltipDiv = document.createElement('div');
-                tooltipDiv.className = 'tooltip';
-                document.body.appendChild(tooltipDiv);
-                let popperRef;
-                cy.on('mouseover', 'node', function(evt) {{
-                    const node = evt.target;
-                    let text = node.data('is_center') && node.data('demonstration') ? '<strong>Demonstration:</strong><br>' + node.data('demonstration') : node.data('full_text');
-                    popperRef = node.popper({{ content: function() {{ tooltipDiv.innerHTML = text; tooltipDiv.style.display = 'block'; return tooltipDiv; }} }});
-                }});
-                cy.on('mouseout', 'node', function() {{ if(popperRef) popperRef.destroy(); tooltipDiv.style.display = 'none'; }});
-                cy.on('tap', 'node', function(evt) {{ htmx.ajax('GET', `/local_view/${{evt.target.id()}}?lang={lang}`, {{ target: document.body, swap: 'beforeend' }}); }});
-            }});
-        }})();
-    """)
-    
-    cytoscape_container = Div(id=container_id, style="height: 100%; width: 100%;")
-    return Div(cytoscape_container, init_script, style="height: 100%; width: 100%;")
-
-def render_local_textual(subgraph: nx.DiGraph, node_key: str, selected_lang: str) -> Div:
-    container_id = f"textual-container-{node_key.replace('.', '-')}-{int(time.time() * 1000)}"
+    return elements
+
+def render_local_visual(data: 'GraphData', subgraph: LocalSubgraph, node_key: str, lang: str, elements_path: str = None, scope: str = None) -> Div:
+    # `elements_path` serves the subgraph's elements (the node's ancestry by default); `scope`
+    # tells /api/texts which graph of the book holds its nodes.
+    elements_url = api_url(data, elements_path or f"/api/subgraph/{node_key}")
+    texts_url = api_url(data, "/api/texts", lang=lang, book=data.book_id, scope=scope)
+    cytoscape_container = Div(id=fragment_id("local-cy", node_key, lang), cls="local-cy", style="height: 100%; width: 100%;",
+                              data_elements_url=elements_url, data_texts_url=texts_url, data_node=node_key, data_lang=lang,
+                              data_node_url=view_url("/local_view/{node}", lang=lang))
+    return Div(cytoscape_container, style="height: 100%; width: 100%;")
+
+def render_local_textual(data: 'GraphData', subgraph: LocalSubgraph, node_key: str, selected_lang: str, max_depth: Optional[int] = None,
+                         heading: str = "Proof Structure", tree_url: str = "/local_view/proof_tree", tree_cls: str = "proof-tree") -> Div:
     return Div(
-        H3("Proof Structure"),
-        Div(render_proof_tree_node(subgraph, node_key, selected_lang), cls="proof-tree"),
+        H3(heading),
+        Div(render_proof_tree(data, subgraph, node_key, selected_lang, max_depth, tree_url), cls=tree_cls),
         Hr(style="margin: 20px 0;"),
-        render_main_node_box(node_key, selected_lang),
-        proof_tree_hover_script(container_id),
-        id=container_id,
+        render_main_node_box(data, node_key, selected_lang),
+        id=fragment_id("textual-container", node_key, selected_lang), cls="textual-view",
         style="height: 100%; overflow-y: auto;"
     )
 
 # ==============================================================================
-# DATA LOADING (Unchanged)
+# DATA LOADING & SNAPSHOTS
+# ==============================================================================
+# A corpus is a directory of per-book graph files named after the key prefix of the
+# book's nodes (corpus/I.json holds I_Def_1, I_Prop_1, ...), plus an optional
+# index.json giving the books' order and titles. A node's book is therefore known from
+# its key alone, and a book is only read the first time one of its nodes is requested.
+# A book's GraphData also contains every book it cites (cross-book edges live in the
+# citing book's file), so ancestry, levels and renders work across books unchanged.
+# ETHICS_DATA_FILE serves a single graph file as a one-book corpus instead.
+CORPUS_DIR = os.environ.get('ETHICS_CORPUS_DIR', 'corpus')
+DATA_FILE = os.environ.get('ETHICS_DATA_FILE')
+# Maximum number of books kept in memory; the least recently used one is dropped beyond it.
+CORPUS_MAX_BOOKS = int(os.environ.get('CORPUS_MAX_BOOKS', 5))
+
+# A book's snapshot sits next to its file (corpus/I.snapshot), built by `python app.py
+# snapshot`. It is two consecutive pickles: a small header (format version and the
+# sha256 of every source file it was built from) and the GraphData payload, so a stale
+# or incompatible snapshot is rejected before the payload is ever unpickled.
+SNAPSHOT_VERSION = 11
+
+class GraphData:
+    def __init__(self, graph: nx.DiGraph, sources: dict = None, book_id: str = "", title: str = "", own_keys: set = None):
+        self.graph = graph
+        self.sources = sources or {}
+        self.source_hash = sources_hash(self.sources)
+        self.book_id, self.title = book_id, title
+        self.own_keys = frozenset(graph.nodes() if own_keys is None else own_keys)
+        self.nodes = build_node_store(graph)
+        condensed = nx.condensation(graph)
+        self.levels = calculate_node_levels(graph, condensed)
+        self.level_nodes = group_levels(self.levels)
+        self.ancestor_index = AncestorIndex(graph, condensed=condensed)
+        # The same index over the reversed graph answers "what rests on this node".
+        self.descendant_index = AncestorIndex(graph.reverse(copy=False), condensed=condensed.reverse(copy=False))
+        self.analytics = compute_analytics(graph, self.levels, condensed)
+        self.main_elements_json = main_view_elements(graph, self.level_nodes, self.own_keys)
+        self.clusters, self.overview_json = main_view_clusters(graph, self.levels, self.own_keys)
+        self.cluster_of = {k: cid for cid, members in self.clusters.items() for k in members}
+        self.search_index = SearchIndex(self.nodes, [k for k in graph.nodes() if k in self.own_keys])
+
+    # Computed rather than stored, so a snapshot follows the code that loads it.
+    @property
+    def version(self) -> str: return data_version(self.source_hash)
+
+    def __contains__(self, node_key) -> bool: return node_key in self.graph
+    def number_of_nodes(self) -> int: return self.graph.number_of_nodes()
+    # Every node is in memory (see SqliteGraphData).
+    def nodes_cached(self, keys) -> bool: return True
+    def load_nodes(self, keys) -> None: pass
+    def book_nodes(self) -> list: return [k for k in self.graph if k in self.own_keys]
+    def level(self, node_key: str) -> Optional[int]: return self.levels.get(node_key)
+    def predecessors(self, node_key: str) -> list: return list(self.graph.predecessors(node_key))
+    def successors(self, node_key: str) -> list: return list(self.graph.successors(node_key))
+
+    @timed("subgraph")
+    def local_subgraph(self, node: str) -> 'LocalSubgraph':
+        return self.ancestor_index.subgraph(node)
+
+    @timed("subgraph")
+    def impact_subgraph(self, node: str) -> 'LocalSubgraph':
+        # The node and everything citing it, directly or not, with edges in citation order.
+        return self.descendant_index.subgraph(node).reversed()
+
+    @timed("subgraph")
+    def citation_path(self, source: str, target: str) -> Optional[list]:
+        return citation_path(self.source_hash, source, target, lambda key: set(self.descendant_index.ancestors(key)),
+                             lambda keys: {k: list(self.graph.pred[k]) for k in keys})
+
+    def search(self, query: str, lang: str = None, limit: int = 20) -> list:
+        return self.search_index.search(query, self.nodes, lang, limit)
+
+    def lod(self) -> bool: return len(self.cluster_of) > MAIN_VIEW_LOD_THRESHOLD
+
+    def cluster_elements(self, cluster_id: str) -> Optional[list]:
+        members = self.clusters.get(cluster_id)
+        if members is None: return None
+        edges = {(u, k) for k in members for u in self.graph.pred[k] if u in self.cluster_of} | {(k, v) for k in members for v in self.graph.succ[k] if v in self.cluster_of}
+        return cluster_elements(members, {k: self.nodes[k].type for k in members}, list(edges), self.cluster_of.get)
+
+    def node_metrics(self, node_key: str) -> dict:
+        i = self.ancestor_index.ids[node_key]
+        return {name: metric_value(self.analytics[name][i]) for name in ANALYTICS_METRICS}
+
+    def book_metrics(self) -> dict:
+        # The book's own nodes -> metric values in ANALYTICS_METRICS order.
+        ids = self.ancestor_index.ids
+        columns = [self.analytics[name] for name in ANALYTICS_METRICS]
+        return {k: [metric_value(column[ids[k]]) for column in columns] for k in self.graph if k in self.own_keys}
+
+def sources_hash(sources: dict) -> str:
+    return hashlib.sha256("".join(f"{p}:{h};" for p, h in sorted(sources.items())).encode()).hexdigest() if sources else ""
+
+def main_view_elements(graph: nx.DiGraph, level_nodes: list, keys) -> str:
+    # The main view shows a book's own propositions; cited books appear in local views.
+    own_levels = [nodes for nodes in ([n for n in level if n in keys] for level in level_nodes) if nodes]
+    return serialize_graph_for_cytoscape(graph.subgraph(keys), own_levels)
+
+def main_view_clusters(graph: nx.DiGraph, levels: dict, keys) -> Tuple[dict, str]:
+    own = [k for k in graph if k in keys]
+    types = {k: graph.nodes[k].get('type', 'DEFAULT') for k in own}
+    clusters = cluster_nodes(own, levels, types)
+    return clusters, cluster_overview(clusters, levels, types, ((u, v) for u, v in graph.edges() if u in keys and v in keys))
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as f: return hashlib.sha256(f.read()).hexdigest()
+
+# Part of every data version (see JSON DATA API) and of the static export's manifest.
+CODE_VERSION = file_hash(os.path.abspath(__file__))
+
+def canonical_hashes(directory: str) -> dict:
+    # The CANONICAL_MANIFEST `python app.py validate --canonical` keeps next to the files it wrote.
+    manifest = os.path.join(directory, CANONICAL_MANIFEST)
+    if not os.path.exists(manifest): return {}
+    with open(manifest, encoding='utf-8') as f: return {name: digest for digest, _, name in (line.rstrip('\n').partition('  ') for line in f) if name}
+
+def read_graph_file(path: str) -> Tuple[dict, str]:
+    # Normalized in memory only: data files are never written back, so they can live on a
+    # read-only filesystem and be shared by several workers. A file keeps its "canonical"
+    # flag (and skips the checks) only if validate recorded this very content.
+    with open(path, 'rb') as f: raw = f.read()
+    data, digest = json.loads(raw), hashlib.sha256(raw).hexdigest()
+    if data.get("canonical") and canonical_hashes(os.path.dirname(path)).get(os.path.basename(path)) == digest: return data, digest
+    data.pop("canonical", None)
+    return fix_json_data(data), digest
+
+def sources_current(sources: dict) -> bool:
+    return bool(sources) and all(os.path.exists(p) and file_hash(p) == h for p, h in sources.items())
+
+class NotLoaded(LookupError): pass
+
+class Corpus:
+    # With load=False, lookups only answer from books already in memory and raise NotLoaded
+    # otherwise, so request handlers can do them on the event loop.
+    def __init__(self, books: list, max_books: int = CORPUS_MAX_BOOKS):
+        # books: [{"id", "title", "file"}], in display order; the first one is served at /.
+        self.books = {b["id"]: b for b in books}
+        self.default_book = books[0]["id"] if books else None
+        self.max_books = max_books
+        self._loaded, self._lock = OrderedDict(), threading.Lock()
+        self._cited, self._search = None, {}
+
+    @classmethod
+    def from_directory(cls, corpus_dir: str) -> 'Corpus':
+        index_file = os.path.join(corpus_dir, "index.json")
+        index = {}
+        if os.path.exists(index_file):
+            with open(index_file, 'r', encoding='utf-8') as f: index = json.load(f)
+        files = {os.path.splitext(name)[0]: os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir) if name.endswith(".json") and name != "index.json"}
+        titles = {b["id"]: b.get("title") for b in index.get("books", [])}
+        order = [b for b in titles if b in files] + sorted(b for b in files if b not in titles)
+        return cls([{"id": b, "title": titles.get(b) or f"Livre {b}", "file": files[b]} for b in order])
+
+    @classmethod
+    def from_file(cls, data_file: str) -> 'Corpus':
+        return cls([{"id": "", "title": "Graph Visualization", "file": data_file}])
+
+    def book_of(self, node_key: str, load: bool = True) -> Optional[str]:
+        # The global key index: a key's prefix names its book; single-file corpora own every key.
+        if len(self.books) == 1: return self.default_book
+        prefix = node_key.split('_', 1)[0]
+        return prefix if prefix in self.books else None
+
+    def book(self, book_id: str = None, citing: tuple = (), load: bool = True) -> GraphData:
+        # With `citing`, the book's graph is extended with those books (and what they cite).
+        book_id = book_id if book_id is not None else self.default_book
+        slot = (book_id,) + citing if citing else book_id
+        with self._lock:
+            if slot in self._loaded:
+                self._loaded.move_to_end(slot)
+                return self._loaded[slot]
+        if not load: raise NotLoaded(slot)
+        try:
+            with phase("load"): graph_data = self.load_book(book_id, citing)
+        except Exception as e:
+            # Served as an empty graph but never cached, so the next request tries again.
+            print(f"ERROR loading data: {e}")
+            return GraphData(nx.DiGraph(), book_id=book_id or "", title="Graph Visualization")
+        with self._lock:
+            self._loaded[slot] = graph_data
+            self._loaded.move_to_end(slot)
+            while len(self._loaded) > self.max_books: self._loaded.popitem(last=False)
+            if slot == book_id: self._search.pop(book_id, None)
+        return graph_data
+
+    def for_node(self, node_key: str, load: bool = True) -> GraphData:
+        return self.book(self.book_of(node_key, load) or self.default_book, load=load)
+
+    def citing_books(self, book_id: str, load: bool = True) -> tuple:
+        # Books citing `book_id`, directly or through other books, in corpus order. Cross-book
+        # edges live in the citing book's file, so the first call reads every book's edges.
+        if self._cited is None:
+            if not load: raise NotLoaded(book_id)
+            cited = {}
+            for current, book in self.books.items():
+                data, _ = read_graph_file(book["file"]) if os.path.exists(book["file"]) else ({}, None)
+                cited[current] = {self.book_of(k) for e in data.get("edges", []) for k in (e.get("source"), e.get("target")) if k} - {None, current}
+            self._cited = cited
+        citing, pending = set(), [book_id]
+        while pending:
+            current = pending.pop()
+            for other, cites in self._cited.items():
+                if current in cites and other not in citing and other != book_id:
+                    citing.add(other)
+                    pending.append(other)
+        return tuple(b for b in self.books if b in citing)
+
+    def for_impact(self, node_key: str, load: bool = True) -> GraphData:
+        # The node's book extended with every book that may rest on it.
+        book_id = self.book_of(node_key, load) or self.default_book
+        return self.book(book_id, self.citing_books(book_id, load), load)
+
+    def book_search(self, book_id: str) -> Tuple[SearchIndex, dict]:
+        # A book's search index and the nodes its hits quote. A book in memory answers from its
+        # own; any other is indexed from its file alone (no graph, closure or analytics) and kept
+        # outside the book cache until the book itself is loaded, so searching never loads or
+        # evicts books.
+        with self._lock:
+            if book_id in self._loaded: return self._loaded[book_id].search_index, self._loaded[book_id].nodes
+            found = self._search.get(book_id)
+        if found is None:
+            path = self.books[book_id]["file"]
+            data, _ = read_graph_file(path) if os.path.exists(path) else ({}, None)
+            nodes = {v["normalized_key"]: NodeData(v["normalized_key"], v) for v in data.get("vertices", []) if "normalized_key" in v}
+            found = SearchIndex(nodes, nodes), nodes
+            with self._lock: self._search[book_id] = found
+        return found
+
+    @timed("search")
+    def search(self, query: str, lang: str = None, book_id: str = None, limit: int = 20) -> list:
+        hits = []
+        for current in ([book_id] if book_id else self.books):
+            index, nodes = self.book_search(current)
+            hits.extend(dict(hit, book=current) for hit in index.search(query, nodes, lang, limit))
+        return sorted(hits, key=lambda hit: (-hit["matched"], -hit["score"], hit["key"]))[:limit]
+
+    def loaded_books(self) -> list:
+        return list(self._loaded)
+
+    def warm_from(self, previous: 'Corpus') -> None:
+        # Load the books `previous` had in memory, reusing those whose source files did not change.
+        # A book that fails to load raises, so the reload fails and `previous` stays in service.
+        for book_id in previous.loaded_books():
+            if book_id not in self.books: continue
+            graph_data = previous._loaded.get(book_id)
+            sources = getattr(graph_data, 'sources', None)
+            if not (sources_current(sources) and self.books[book_id]["file"] in sources):
+                with phase("load"): graph_data = self.load_book(book_id)
+            with self._lock: self._loaded[book_id] = graph_data
+
+    def snapshot_file(self, book_id: str) -> str:
+        return os.path.splitext(self.books[book_id]["file"])[0] + ".snapshot"
+
+    def read_book(self, book_id: str, citing: tuple = ()) -> Tuple[nx.DiGraph, dict, set]:
+        # Read the book (and `citing`), then every book reachable through their cross-book edges:
+        # their graph, their source hashes and the book's own keys.
+        book_files, sources, pending = {}, {}, [book_id, *citing]
+        while pending:
+            current = pending.pop()
+            if current in book_files: continue
+            path = self.books[current]["file"]
+            book_files[current], sources[path] = read_graph_file(path)
+            for edge in book_files[current].get("edges", []):
+                for key in (edge.get("source"), edge.get("target")):
+                    cited = self.book_of(key) if key else None
+                    if cited is not None and cited not in book_files: pending.append(cited)
+        vertices = [v for data in book_files.values() for v in data.get("vertices", [])]
+        edges = [e for data in book_files.values() for e in data.get("edges", [])]
+        own_keys = {v["normalized_key"] for v in book_files[book_id].get("vertices", []) if "normalized_key" in v}
+        trusted = all(data.get("canonical") for data in book_files.values())
+        return create_graph_from_data(vertices, edges, trusted), sources, own_keys
+
+    def build_book(self, book_id: str, citing: tuple = ()) -> GraphData:
+        graph, sources, own_keys = self.read_book(book_id, citing)
+        return GraphData(graph, sources, book_id, self.books[book_id]["title"], own_keys)
+
+    def load_book(self, book_id: str, citing: tuple = ()) -> GraphData:
+        path = self.books.get(book_id, {}).get("file")
+        if path is None or not os.path.exists(path): raise FileNotFoundError(f"File '{path}' not found.")
+        graph_data = (None if citing else read_snapshot(self.snapshot_file(book_id))) or self.build_book(book_id, citing)
+        print(f"Successfully loaded book {book_id or path}{' with ' + ', '.join(citing) if citing else ''}: {graph_data.graph.number_of_nodes()} nodes, {graph_data.graph.number_of_edges()} edges")
+        return graph_data
+
+def write_snapshot(graph_data: GraphData, snapshot_file: str) -> None:
+    tmp_file = f"{snapshot_file}.tmp"
+    with open(tmp_file, 'wb') as f:
+        pickle.dump({"version": SNAPSHOT_VERSION, "sources": graph_data.sources}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(graph_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, snapshot_file)
+
+def read_snapshot(snapshot_file: str) -> Optional[GraphData]:
+    if not os.path.exists(snapshot_file): return None
+    try:
+        with open(snapshot_file, 'rb') as f:
+            header = pickle.load(f)
+            sources = header.get("sources") or {}
+            if header.get("version") != SNAPSHOT_VERSION or not sources_current(sources):
+                print(f"Snapshot '{snapshot_file}' is stale, rebuilding from source.")
+                return None
+            return pickle.load(f)
+    except Exception as e:
+        print(f"ERROR reading snapshot '{snapshot_file}': {e}")
+        return None
+
+def load_json_corpus() -> Corpus:
+    if DATA_FILE: return Corpus.from_file(DATA_FILE)
+    if not os.path.isdir(CORPUS_DIR):
+        print(f"ERROR: Corpus directory '{CORPUS_DIR}' not found.")
+        return Corpus([])
+    return Corpus.from_directory(CORPUS_DIR)
+
+def load_corpus() -> Corpus:
+    if DB_FILE:
+        if os.path.exists(DB_FILE): return SqliteCorpus(DB_FILE)
+        print(f"ERROR: Database '{DB_FILE}' not found, serving the JSON corpus.")
+    return load_json_corpus()
+
+# Only the directory listing happens at first use; books are read on demand, so a cold
+# start does not grow with the number of books.
+_CORPUS: Optional[Corpus] = None
+
+def corpus() -> Corpus:
+    global _CORPUS
+    if _CORPUS is None: _CORPUS = load_corpus()
+    return _CORPUS
+
+# ==============================================================================
+# SQLITE STORE
 # ==============================================================================
-DATA_FILE = "graph.json"
-T_GRAPH, NODE_LEVELS = nx.DiGraph(), {}
-if not os.path.exists(DATA_FILE):
-    print(f"ERROR: File '{DATA_FILE}' not found.")
-else:
+# Optional on-disk backend: `python app.py sqlite` compiles the JSON corpus into one
+# SQLite file and ETHICS_DB=<file> serves from it. Handlers then query indexed tables
+# (ancestors through a recursive CTE over the edges) instead of holding each book's graph
+# in memory, so workers share the dataset through the OS page cache and only keep the
+# nodes they recently rendered. Levels and the main views are computed once at build.
+DB_FILE = os.environ.get('ETHICS_DB')
+SQLITE_NODE_CACHE_SIZE = int(os.environ.get('SQLITE_NODE_CACHE_SIZE', 2048))
+SQLITE_STORE_VERSION = 6
+# SQLite's default host parameter limit is well above this; it bounds each IN (...) list.
+SQLITE_BATCH = 500
+
+SQLITE_SCHEMA = """
+CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE books (id TEXT PRIMARY KEY, title TEXT, position INTEGER, main_elements TEXT, overview TEXT);
+CREATE TABLE vertices (key TEXT PRIMARY KEY, book TEXT, type TEXT, number TEXT, level INTEGER, position INTEGER, cluster TEXT);
+CREATE INDEX vertices_book ON vertices (book, cluster);
+CREATE TABLE texts (key TEXT, seq INTEGER, lang TEXT, text TEXT, PRIMARY KEY (key, seq)) WITHOUT ROWID;
+CREATE TABLE components (key TEXT, seq INTEGER, type TEXT, number TEXT, PRIMARY KEY (key, seq)) WITHOUT ROWID;
+CREATE TABLE component_texts (key TEXT, seq INTEGER, lang_seq INTEGER, lang TEXT, text TEXT, PRIMARY KEY (key, seq, lang_seq)) WITHOUT ROWID;
+CREATE TABLE edges (source TEXT NOT NULL, target TEXT NOT NULL, type TEXT, UNIQUE (source, target));
+CREATE INDEX edges_target ON edges (target);
+CREATE TABLE search_docs (id INTEGER PRIMARY KEY, key TEXT, book TEXT, field TEXT, component INTEGER, lang TEXT, terms TEXT);
+CREATE TABLE search_postings (term TEXT, doc INTEGER, tf INTEGER, length INTEGER, PRIMARY KEY (term, doc)) WITHOUT ROWID;
+CREATE TABLE metrics (key TEXT PRIMARY KEY, pagerank REAL, betweenness REAL, depth INTEGER, premises INTEGER, fan_in INTEGER, fan_out INTEGER) WITHOUT ROWID;
+"""
+
+# Edges keep their rowid so premises and consequences come back in file order, as from nx.
+ANCESTORS_CTE = "WITH RECURSIVE anc(key) AS (SELECT ? UNION SELECT e.source FROM edges e JOIN anc ON e.target = anc.key)"
+DESCENDANTS_CTE = "WITH RECURSIVE des(key) AS (SELECT ? UNION SELECT e.target FROM edges e JOIN des ON e.source = des.key)"
+
+def book_metric_rows(source: Corpus, book_id: str) -> list:
+    # Over the graph the JSON backend builds for the book (the book and the books it cites),
+    # so both backends serve the same metrics.
+    graph, _, own_keys = source.read_book(book_id)
+    analytics = compute_analytics(graph, calculate_node_levels(graph))
+    return [{"key": key, **{name: analytics[name][i].item() for name in ANALYTICS_METRICS}} for i, key in enumerate(graph.nodes()) if key in own_keys]
+
+def write_sqlite_store(source: Corpus, db_file: str) -> str:
+    book_files, sources = {}, {}
+    for book_id, book in source.books.items():
+        book_files[book_id], sources[book["file"]] = read_graph_file(book["file"])
+    vertices = [v for data in book_files.values() for v in data.get("vertices", [])]
+    edges = [e for data in book_files.values() for e in data.get("edges", [])]
+    graph = create_graph_from_data(vertices, edges)
+    levels = calculate_node_levels(graph)
+    level_nodes = group_levels(levels)
+    vertex_book = {v["normalized_key"]: book_id for book_id, data in book_files.items() for v in data.get("vertices", []) if "normalized_key" in v}
+    source_hash = sources_hash(sources)
+    search_index = SearchIndex(build_node_store(graph), graph.nodes())
+
+    tmp_file = f"{db_file}.tmp"
+    if os.path.exists(tmp_file): os.remove(tmp_file)
+    db = Database(tmp_file)
+    db.executescript(SQLITE_SCHEMA)
+    corpus_langs = list(dict.fromkeys(lang for _, attrs in graph.nodes(data=True) for lang in attrs.get('texts', {})))
+    db["meta"].insert_all([{"name": "version", "value": str(SQLITE_STORE_VERSION)}, {"name": "source_hash", "value": source_hash},
+                           {"name": "langs", "value": json.dumps(corpus_langs)}, {"name": "search_doc_count", "value": str(search_index.doc_count)},
+                           {"name": "search_avg_length", "value": repr(search_index.avg_length)}, {"name": "search_langs", "value": json.dumps(search_index.langs)}])
+    book_rows, cluster_of = [], {}
+    for i, (book_id, book) in enumerate(source.books.items()):
+        keys = {k for k, b in vertex_book.items() if b == book_id}
+        clusters, overview = main_view_clusters(graph, levels, keys)
+        cluster_of.update((k, cid) for cid, members in clusters.items() for k in members)
+        book_rows.append({"id": book_id, "title": book["title"], "position": i, "main_elements": main_view_elements(graph, level_nodes, keys), "overview": overview})
+    db["books"].insert_all(book_rows)
+    db["vertices"].insert_all({"key": key, "book": vertex_book[key], "type": attrs.get("type", "DEFAULT"), "number": attrs.get("number"),
+                               "level": levels.get(key), "position": i, "cluster": cluster_of.get(key)} for i, (key, attrs) in enumerate(graph.nodes(data=True)))
+    db["texts"].insert_all({"key": key, "seq": i, "lang": lang, "text": text}
+                           for key, attrs in graph.nodes(data=True) for i, (lang, text) in enumerate(attrs.get("texts", {}).items()))
+    db["components"].insert_all({"key": key, "seq": i, "type": c.get("type"), "number": c.get("number")}
+                                for key, attrs in graph.nodes(data=True) for i, c in enumerate(attrs.get("components", [])))
+    db["component_texts"].insert_all({"key": key, "seq": i, "lang_seq": j, "lang": lang, "text": text}
+                                     for key, attrs in graph.nodes(data=True) for i, c in enumerate(attrs.get("components", []))
+                                     for j, (lang, text) in enumerate(c.get("texts", {}).items()))
+    seen = set()
+    edge_rows = []
+    for edge in edges:
+        u, v = edge.get("source"), edge.get("target")
+        if (u, v) in seen or not graph.has_edge(u, v): continue
+        seen.add((u, v))
+        edge_rows.append({"source": u, "target": v, "type": edge.get("type")})
+    db["edges"].insert_all(edge_rows)
+    db["search_docs"].insert_all({"id": i, "key": key, "book": vertex_book[key], "field": field, "component": component, "lang": lang, "terms": terms}
+                                 for i, ((key, field, component, lang), terms) in enumerate(zip(search_index.docs, search_index.terms)))
+    db["search_postings"].insert_all({"term": term, "doc": doc_id, "tf": tf, "length": length}
+                                     for term, postings in search_index.postings.items() for doc_id, tf, length in postings)
+    db["metrics"].insert_all(row for book_id in source.books for row in book_metric_rows(source, book_id))
+    db.analyze()
+    # Rollback journal rather than WAL, so read-only workers need no -shm file next to it.
+    db.disable_wal()
+    db.conn.close()
+    os.replace(tmp_file, db_file)
+    return source_hash
+
+class SqliteStore:
+    # One read-only connection per thread; queries return lists of dicts.
+    def __init__(self, db_file: str):
+        self.db_file = db_file
+        self._local = threading.local()
+
+    @property
+    def db(self) -> Database:
+        db = getattr(self._local, 'db', None)
+        if db is None: db = self._local.db = Database(apsw.Connection(self.db_file, flags=apsw.SQLITE_OPEN_READONLY))
+        return db
+
+    def reset(self) -> None:
+        # A forked worker opens its own connections instead of using those it inherited.
+        self._local = threading.local()
+
+    def q(self, sql: str, params=()) -> list:
+        return self.db.q(sql, list(params))
+
+    def q_in(self, sql: str, keys: list) -> list:
+        # `sql` contains one `{}` standing for the IN list, filled in batches.
+        rows = []
+        for i in range(0, len(keys), SQLITE_BATCH):
+            batch = keys[i:i + SQLITE_BATCH]
+            rows.extend(self.q(sql.format(",".join("?" * len(batch))), batch))
+        return rows
+
+class SqliteNodeStore:
+    # Read-only mapping key -> NodeData built from the store on demand; recently used nodes stay
+    # cached, and so do recently asked keys that are not in the store (as False).
+    def __init__(self, store: SqliteStore, cache_size: int = SQLITE_NODE_CACHE_SIZE):
+        self.store = store
+        self._cache = LRUCache(cache_size)
+
+    def cached(self, keys) -> bool:
+        return all(self._cache.get(k) is not None for k in keys)
+
+    @timed("nodes")
+    def load(self, keys) -> None:
+        missing = [k for k in dict.fromkeys(keys) if self._cache.get(k) is None]
+        if not missing: return
+        attrs = {r["key"]: {"type": r["type"], "number": r["number"], "texts": {}, "components": []}
+                 for r in self.store.q_in("SELECT key, type, number FROM vertices WHERE key IN ({})", missing)}
+        for key in missing:
+            if key not in attrs: self._cache.put(key, False)
+        found = list(attrs)
+        for r in self.store.q_in("SELECT key, lang, text FROM texts WHERE key IN ({}) ORDER BY key, seq", found):
+            attrs[r["key"]]["texts"][r["lang"]] = r["text"]
+        components = {}
+        for r in self.store.q_in("SELECT key, seq, type, number FROM components WHERE key IN ({}) ORDER BY key, seq", found):
+            component = {"type": r["type"], "texts": {}}
+            if r["number"] is not None: component["number"] = r["number"]
+            attrs[r["key"]]["components"].append(component)
+            components[(r["key"], r["seq"])] = component
+        for r in self.store.q_in("SELECT key, seq, lang, text FROM component_texts WHERE key IN ({}) ORDER BY key, seq, lang_seq", found):
+            components[(r["key"], r["seq"])]["texts"][r["lang"]] = r["text"]
+        for key, node_attrs in attrs.items(): self._cache.put(key, NodeData(key, node_attrs))
+
+    def __getitem__(self, key: str) -> NodeData:
+        node = self._cache.get(key)
+        if node is None:
+            self.load([key])
+            node = self._cache.get(key)
+        if not node: raise KeyError(key)
+        return node
+
+    def __contains__(self, key) -> bool:
+        node = self._cache.get(key)
+        if node is None:
+            self.load([key])
+            node = self._cache.get(key)
+        return bool(node)
+
+class SqliteGraphData:
+    # The GraphData interface answered by queries; the whole corpus is one graph here, so
+    # cross-book ancestry needs no scope loading.
+    def __init__(self, store: SqliteStore, nodes: SqliteNodeStore, book: dict, source_hash: str):
+        self.store, self.nodes = store, nodes
+        self.book_id, self.title = book["id"], book["title"]
+        self.source_hash, self.version = source_hash, data_version(source_hash)
+        # Counted when the book is loaded, in the render pool: handlers ask for it on the event loop.
+        self.node_count = store.q("SELECT count(*) AS n FROM vertices WHERE book = ?", [self.book_id])[0]["n"]
+
+    @property
+    def main_elements_json(self) -> str:
+        rows = self.store.q("SELECT main_elements FROM books WHERE id = ?", [self.book_id])
+        return rows[0]["main_elements"] if rows else "[]"
+
+    @property
+    def overview_json(self) -> str:
+        rows = self.store.q("SELECT overview FROM books WHERE id = ?", [self.book_id])
+        return rows[0]["overview"] if rows else "[]"
+
+    def lod(self) -> bool: return self.number_of_nodes() > MAIN_VIEW_LOD_THRESHOLD
+
+    def cluster_elements(self, cluster_id: str) -> Optional[list]:
+        rows = self.store.q("SELECT key, type FROM vertices WHERE book = ? AND cluster = ? ORDER BY position", [self.book_id, cluster_id])
+        if not rows: return None
+        members = [r["key"] for r in rows]
+        cluster_of = dict.fromkeys(members, cluster_id)
+        edges = set()
+        # Only edges within the book: the main view shows a book's own nodes.
+        for sql in ("SELECT e.source, e.target, v.key AS other, v.book, v.cluster FROM edges e JOIN vertices v ON v.key = e.source WHERE e.target IN ({})",
+                    "SELECT e.source, e.target, v.key AS other, v.book, v.cluster FROM edges e JOIN vertices v ON v.key = e.target WHERE e.source IN ({})"):
+            for r in self.store.q_in(sql, members):
+                if r["book"] != self.book_id: continue
+                cluster_of[r["other"]] = r["cluster"]
+                edges.add((r["source"], r["target"]))
+        return cluster_elements(members, {r["key"]: r["type"] for r in rows}, list(edges), cluster_of.get)
+
+    def __contains__(self, node_key) -> bool: return node_key in self.nodes
+    def number_of_nodes(self) -> int: return self.node_count
+    def nodes_cached(self, keys) -> bool: return self.nodes.cached(keys)
+    def load_nodes(self, keys) -> None: self.nodes.load(keys)
+    def book_nodes(self) -> list: return [r["key"] for r in self.store.q("SELECT key FROM vertices WHERE book = ? ORDER BY position", [self.book_id])]
+
+    def level(self, node_key: str) -> Optional[int]:
+        rows = self.store.q("SELECT level FROM vertices WHERE key = ?", [node_key])
+        return rows[0]["level"] if rows else None
+
+    def predecessors(self, node_key: str) -> list:
+        return [r["source"] for r in self.store.q("SELECT source FROM edges WHERE target = ? ORDER BY rowid", [node_key])]
+
+    def successors(self, node_key: str) -> list:
+        return [r["target"] for r in self.store.q("SELECT target FROM edges WHERE source = ? ORDER BY rowid", [node_key])]
+
+    @timed("subgraph")
+    def local_subgraph(self, node_key: str) -> LocalSubgraph:
+        nodes = [r["key"] for r in self.store.q(f"{ANCESTORS_CTE} SELECT v.key FROM vertices v JOIN anc ON v.key = anc.key ORDER BY v.position", [node_key])]
+        edges = [(r["source"], r["target"]) for r in self.store.q(
+            f"{ANCESTORS_CTE} SELECT e.source, e.target FROM edges e JOIN anc ON e.target = anc.key JOIN vertices v ON v.key = e.target ORDER BY v.position, e.rowid", [node_key])]
+        # Every renderer reads each node of the subgraph, so fetch them in a few batched queries.
+        self.nodes.load(nodes)
+        return LocalSubgraph(nodes, edges)
+
+    @timed("subgraph")
+    def impact_subgraph(self, node_key: str) -> LocalSubgraph:
+        nodes = [r["key"] for r in self.store.q(f"{DESCENDANTS_CTE} SELECT v.key FROM vertices v JOIN des ON v.key = des.key ORDER BY v.position", [node_key])]
+        edges = [(r["source"], r["target"]) for r in self.store.q(
+            f"{DESCENDANTS_CTE} SELECT e.source, e.target FROM edges e JOIN des ON e.source = des.key JOIN vertices v ON v.key = e.source ORDER BY v.position, e.rowid", [node_key])]
+        self.nodes.load(nodes)
+        return LocalSubgraph(nodes, edges)
+
+    def node_metrics(self, node_key: str) -> dict:
+        rows = self.store.q(f"SELECT {', '.join(ANALYTICS_METRICS)} FROM metrics WHERE key = ?", [node_key])
+        return {name: metric_value(rows[0][name]) for name in ANALYTICS_METRICS} if rows else {}
+
+    def book_metrics(self) -> dict:
+        rows = self.store.q(f"SELECT m.key, {', '.join('m.' + name for name in ANALYTICS_METRICS)} FROM metrics m JOIN vertices v ON v.key = m.key WHERE v.book = ? ORDER BY v.position", [self.book_id])
+        return {r["key"]: [metric_value(r[name]) for name in ANALYTICS_METRICS] for r in rows}
+
+    def premises_of(self, keys: list) -> dict:
+        premises = {}
+        for r in self.store.q_in("SELECT source, target FROM edges WHERE target IN ({}) ORDER BY rowid", keys): premises.setdefault(r["target"], []).append(r["source"])
+        return premises
+
+    @timed("subgraph")
+    def citation_path(self, source: str, target: str) -> Optional[list]:
+        return citation_path(self.source_hash, source, target, lambda key: {r["key"] for r in self.store.q(f"{DESCENDANTS_CTE} SELECT key FROM des", [key])} - {key},
+                             self.premises_of)
+
+class SqliteSearchIndex(SearchIndex):
+    # The same ranking over the search_docs and search_postings tables.
+    def __init__(self, store: SqliteStore, doc_count: int, avg_length: float, langs: tuple):
+        self.store, self.doc_count, self.avg_length, self.langs = store, doc_count, avg_length, langs
+
+    def postings_for(self, term: str, book: str = None) -> list:
+        if book is None: return [(r["doc"], r["tf"], r["length"]) for r in self.store.q("SELECT doc, tf, length FROM search_postings WHERE term = ?", [term])]
+        return [(r["doc"], r["tf"], r["length"]) for r in self.store.q(
+            "SELECT p.doc, p.tf, p.length FROM search_postings p JOIN search_docs d ON d.id = p.doc WHERE p.term = ? AND d.book = ?", [term, book])]
+
+    def docs_for(self, doc_ids: list) -> dict:
+        return {r["id"]: (r["key"], r["field"], r["component"], r["lang"]) for r in self.store.q_in("SELECT id, key, field, component, lang FROM search_docs WHERE id IN ({})", doc_ids)}
+
+    def terms_for(self, doc_ids: list) -> dict:
+        return {r["id"]: r["terms"] for r in self.store.q_in("SELECT id, terms FROM search_docs WHERE id IN ({})", doc_ids)}
+
+class SqliteCorpus(Corpus):
+    def __init__(self, db_file: str, max_books: int = CORPUS_MAX_BOOKS):
+        self.store = SqliteStore(db_file)
+        meta = {r["name"]: r["value"] for r in self.store.q("SELECT name, value FROM meta")}
+        if meta.get("version") != str(SQLITE_STORE_VERSION):
+            raise ValueError(f"Database '{db_file}' has format {meta.get('version')}, expected {SQLITE_STORE_VERSION}; rebuild it with `python app.py sqlite`")
+        self.source_hash = meta["source_hash"]
+        self.node_store = SqliteNodeStore(self.store)
+        self._book_of = LRUCache(SQLITE_NODE_CACHE_SIZE)
+        self.search_index = SqliteSearchIndex(self.store, int(meta["search_doc_count"]), float(meta["search_avg_length"]), tuple(json.loads(meta["search_langs"])))
+        super().__init__([{"id": r["id"], "title": r["title"], "file": db_file} for r in self.store.q("SELECT id, title FROM books ORDER BY position")], max_books)
+
+    def book_of(self, node_key: str, load: bool = True) -> Optional[str]:
+        # Recent answers are cached ("" for unknown keys); with load=False a miss raises NotLoaded
+        # rather than querying on the event loop.
+        book = self._book_of.get(node_key)
+        if book is None:
+            if not load: raise NotLoaded(node_key)
+            rows = self.store.q("SELECT book FROM vertices WHERE key = ?", [node_key])
+            book = rows[0]["book"] if rows else ""
+            self._book_of.put(node_key, book)
+        return book or None
+
+    @timed("search")
+    def search(self, query: str, lang: str = None, book_id: str = None, limit: int = 20) -> list:
+        hits = self.search_index.search(query, self.node_store, lang, limit, book_id)
+        return [dict(hit, book=self.book_of(hit["key"])) for hit in hits]
+
+    def citing_books(self, book_id: str, load: bool = True) -> tuple:
+        # The store holds the whole corpus as one graph, so every book already sees its citers.
+        return ()
+
+    def load_book(self, book_id: str, citing: tuple = ()) -> SqliteGraphData:
+        return SqliteGraphData(self.store, self.node_store, self.books.get(book_id) or {"id": book_id or "", "title": "Graph Visualization"}, self.source_hash)
+
+# ==============================================================================
+# HOT RELOAD
+# ==============================================================================
+# With ETHICS_WATCH=1 each worker watches its data files (the corpus directory, the single
+# data file or the SQLite store). On a change it builds a new corpus in the watcher thread,
+# warms the books the old one had loaded, then swaps it in with a single assignment and
+# drops the cached responses; requests in flight finish on the data they started with.
+WATCH_DATA = os.environ.get('ETHICS_WATCH', '').lower() in ('1', 'true', 'yes')
+_WATCH_STOP = threading.Event()
+_WATCHER: Optional[threading.Thread] = None
+
+def watched_files() -> Tuple[str, Callable]:
+    if DB_FILE and os.path.exists(DB_FILE): target = os.path.abspath(DB_FILE)
+    elif DATA_FILE: target = os.path.abspath(DATA_FILE)
+    else:
+        corpus_dir = os.path.abspath(CORPUS_DIR)
+        return corpus_dir, lambda change, path: os.path.dirname(path) == corpus_dir and path.endswith('.json')
+    # Watch the directory: data files are replaced by rename, which a watch on the file itself would miss.
+    return os.path.dirname(target), lambda change, path: path == target
+
+def reload_corpus() -> Corpus:
+    global _CORPUS
+    fresh = load_corpus()
+    if _CORPUS is not None: fresh.warm_from(_CORPUS)
+    _CORPUS = fresh
+    clear_response_caches()
+    return fresh
+
+def watch_data() -> None:
+    import watchfiles
+    watch_dir, watch_filter = watched_files()
+    for changes in watchfiles.watch(watch_dir, watch_filter=watch_filter, stop_event=_WATCH_STOP, recursive=False):
+        try:
+            fresh = reload_corpus()
+            print(f"Reloaded data after changes to {', '.join(sorted(os.path.basename(p) for _, p in changes))} ({len(fresh.loaded_books())} books warm)")
+        except Exception:
+            print(f"--- ERROR RELOADING DATA, still serving the previous version ---\n{traceback.format_exc()}")
+
+def start_data_watcher() -> None:
+    global _WATCHER
+    if not WATCH_DATA: return
+    _WATCH_STOP.clear()
+    _WATCHER = threading.Thread(target=watch_data, name="data-watcher", daemon=True)
+    _WATCHER.start()
+
+def stop_data_watcher() -> None:
+    _WATCH_STOP.set()
+    if _WATCHER is not None: _WATCHER.join(timeout=5)
+
+app.router.on_startup.append(start_data_watcher)
+app.router.on_shutdown.append(stop_data_watcher)
+
+# ==============================================================================
+# VALIDATION & CANONICAL FORM
+# ==============================================================================
+# `python app.py validate` checks graph files in one streaming pass over their vertices and
+# edges (with ijson installed; otherwise each file is parsed whole first):
+# vertices without or with duplicate keys, malformed text keys, edges with unknown
+# endpoints (resolved against every file given, so cross-book edges are fine), duplicate
+# edges and citation cycles. With --canonical DIR it also writes each file in canonical
+# form: vertices and edges in natural key order, duplicate edges folded into a
+# `multiplicity`, text keys normalized, compact JSON, and `"canonical": true` so the
+# loader can skip its defensive normalization. Text languages keep their order, since
+# the first one is a node's default language. The sha256 of every file written is kept
+# in DIR/CANONICAL_MANIFEST (`sha256sum -c` format); the loader only trusts a canonical
+# file whose content matches it, so a hand-edited one is checked like any other.
+CANONICAL_MANIFEST = "canonical.sha256"
+TEXT_KEY_RE = re.compile(r"^[a-z]+_text$")
+
+def natural_key(key: str) -> tuple:
+    return tuple(int(part) if part.isdigit() else part for part in re.split(r"(\d+)", key))
+
+def canonical_texts(texts: dict, where: str, report: list) -> dict:
+    out = {}
+    for lang, text in (texts.items() if isinstance(texts, dict) else ()):
+        fixed = lang.strip("'\" ")
+        if not TEXT_KEY_RE.match(fixed) or fixed in out:
+            report.append(("error", f"{where}: malformed text key {lang!r}"))
+            continue
+        if fixed != lang: report.append(("warning", f"{where}: text key {lang!r} normalized to {fixed!r}"))
+        out[fixed] = text
+    return out
+
+def graph_file_items(path: str):
+    # ("vertices" or "edges", item) in file order, then ("document", the other top-level keys).
+    if ijson is None:
+        with open(path, 'rb') as f: data = json.loads(f.read())
+        for kind in ("vertices", "edges"): yield from ((kind, item) for item in data.pop(kind, []))
+        yield "document", data
+        return
+    document, builder, depth = {}, None, 0
+    with open(path, 'rb') as f:
+        for prefix, event, value in ijson.parse(f, use_float=True):
+            if builder is None:
+                # Only the top-level keys and the items of the two arrays are built into objects.
+                if prefix in ("", "vertices", "edges") or ("." in prefix and prefix not in ("vertices.item", "edges.item")): continue
+                builder, target = ijson.ObjectBuilder(), prefix
+            builder.event(event, value)
+            depth += event in ("start_map", "start_array")
+            depth -= event in ("end_map", "end_array")
+            if depth == 0:
+                if target.endswith(".item"): yield target[:-len(".item")], builder.value
+                else: document[target] = builder.value
+                builder = None
+    yield "document", document
+
+def canonical_vertex(vertex: dict, i: int, vertices: dict, path: str, report: list) -> None:
+    key = vertex.get("normalized_key")
+    if not key or key in vertices:
+        report.append(("error", f"{path}: vertex #{i} " + (f"duplicates key {key}" if key else "has no normalized_key")))
+        return
+    components = []
+    for j, component in enumerate(vertex.get("components") or []):
+        extra = {k: v for k, v in component.items() if k not in ("type", "texts")}
+        components.append({"type": component.get("type"), **extra, "texts": canonical_texts(component.get("texts", {}), f"{key} component #{j}", report)})
+    extra = {k: v for k, v in vertex.items() if k not in ("normalized_key", "type", "number", "texts", "components")}
+    vertices[key] = {"normalized_key": key, "type": vertex.get("type", "DEFAULT"), "number": vertex.get("number"), **extra,
+                     "texts": canonical_texts(vertex.get("texts", {}), key, report), "components": components}
+
+def canonical_edge(edge: dict, i: int, edges: dict, repeated: Counter, path: str, report: list) -> None:
+    u, v = edge.get("source"), edge.get("target")
+    if not u or not v:
+        report.append(("error", f"{path}: edge #{i} has no source or target"))
+    elif (u, v) in edges:
+        edges[(u, v)]["multiplicity"] = edges[(u, v)].get("multiplicity", 1) + edge.get("multiplicity", 1)
+        repeated[(u, v)] += 1
+    else:
+        edges[(u, v)] = {"source": u, "target": v, **{k: val for k, val in edge.items() if k not in ("source", "target")}}
+
+def canonical_graph_data(items, path: str, report: list) -> Tuple[dict, dict, dict]:
+    document, vertices, edges, repeated, count = {}, {}, {}, Counter(), Counter()
+    for kind, item in items:
+        if kind == "document": document = item
+        elif kind == "vertices": canonical_vertex(item, count["vertices"], vertices, path, report)
+        else: canonical_edge(item, count["edges"], edges, repeated, path, report)
+        count[kind] += 1
+    for (u, v), n in repeated.items(): report.append(("warning", f"{path}: edge {u} -> {v} listed {n + 1} times, folded"))
+    return document, vertices, edges
+
+def validate_graph_files(paths: list) -> Tuple[dict, list]:
+    report, parsed = [], {}
+    for path in paths:
+        parsed[path] = canonical_graph_data(graph_file_items(path), path, report)
+    known = {key for _, vertices, _ in parsed.values() for key in vertices}
+    citations = nx.DiGraph()
+    for path, (_, _, edges) in parsed.items():
+        for (u, v), edge in list(edges.items()):
+            unknown = [k for k in (u, v) if k not in known]
+            if unknown:
+                report.append(("error", f"{path}: edge {u} -> {v} has unknown endpoint {', '.join(unknown)}"))
+                del edges[(u, v)]
+                continue
+            citations.add_edge(u, v)
+    for cycle in nx.strongly_connected_components(citations):
+        if len(cycle) > 1 or citations.has_edge(*(next(iter(cycle)),) * 2):
+            report.append(("warning", f"citation cycle: {', '.join(sorted(cycle, key=natural_key))}"))
+    return parsed, report
+
+def canonical_document(data: dict, vertices: dict, edges: dict):
+    # The canonical file as chunks of text, so it is written without being held whole.
+    document = {k: v for k, v in data.items() if k not in ("vertices", "edges", "canonical")}
+    document.update(canonical=True, vertices=[vertices[k] for k in sorted(vertices, key=natural_key)],
+                    edges=[edges[k] for k in sorted(edges, key=lambda e: (natural_key(e[0]), natural_key(e[1])))])
+    return json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).iterencode(document)
+
+def validate_command(paths: list, canonical_dir: Optional[str]) -> int:
+    parsed, report = validate_graph_files(paths)
+    for level, message in report: print(f"{level.upper()}: {message}")
+    errors = sum(level == "error" for level, _ in report)
+    print(f"{len(paths)} files, {sum(len(v) for _, v, _ in parsed.values())} vertices, {sum(len(e) for _, _, e in parsed.values())} edges: "
+          f"{errors} errors, {len(report) - errors} warnings")
+    if canonical_dir:
+        os.makedirs(canonical_dir, exist_ok=True)
+        hashes = canonical_hashes(canonical_dir)
+        for path, (data, vertices, edges) in parsed.items():
+            out_file = os.path.join(canonical_dir, os.path.basename(path))
+            with open(f"{out_file}.tmp", 'w', encoding='utf-8') as f: f.writelines(canonical_document(data, vertices, edges))
+            os.replace(f"{out_file}.tmp", out_file)
+            hashes[os.path.basename(out_file)] = file_hash(out_file)
+            print(f"Wrote '{out_file}'")
+        manifest = os.path.join(canonical_dir, CANONICAL_MANIFEST)
+        with open(f"{manifest}.tmp", 'w', encoding='utf-8') as f: f.writelines(f"{digest}  {name}\n" for name, digest in sorted(hashes.items()))
+        os.replace(f"{manifest}.tmp", manifest)
+    return 1 if errors else 0
+
+# ==============================================================================
+# STATIC EXPORT
+# ==============================================================================
+# `python app.py export DIR` pre-renders every response a visitor can reach into DIR, for a
+# static host or CDN: each book's main view and, for every node and language, its local
+# and impact modals, their visual and textual tabs and language switches (and proof tree
+# stubs with PROOF_TREE_MAX_DEPTH). Responses go through the routes with STATIC_URLS set,
+# so views land at `<path>/<params>/index.html`. JSON a page embeds is written under a
+# content-hashed name and can be cached forever; texts (one file per book and language)
+# and clusters keep stable names, and assets/ is copied under its hashed names. Search and
+# citation paths need the server. The manifest records a digest of each node's ancestry and impact; with --incremental,
+# nodes whose digest did not change keep their files. Another app.py or other settings
+# export everything again. Files of the previous export that were not written again are removed.
+STATIC_MANIFEST = "static-manifest.json"
+STATIC_MANIFEST_VERSION = 2
+STATIC_HASH_CHARS = 12
+STATIC_NODE_VIEWS = ("/local_view", "/local_view/visual", "/local_view/textual", "/update_modal_language",
+                     "/impact", "/impact/visual", "/impact/textual", "/impact/update_modal_language")
+
+def static_file(out_dir: str, url: str) -> str:
+    return os.path.join(out_dir, *url.strip('/').split('/'), *(("index.html",) if url.endswith('/') else ()))
+
+def subgraph_digest(digest, data: 'GraphData', subgraph: LocalSubgraph) -> None:
+    for key in subgraph.nodes():
+        node = data.nodes[key]
+        digest.update(json.dumps([key, node.type, node.number, node.texts, node.components], sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    digest.update(json.dumps(subgraph.edges()).encode('utf-8'))
+
+class StaticExporter:
+    def __init__(self, out_dir: str):
+        from starlette.testclient import TestClient
+        self.out_dir, self.client = out_dir, TestClient(app)
+        self.files = []
+
+    def write(self, url: str, body: bytes) -> None:
+        path = static_file(self.out_dir, url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f: f.write(body)
+        self.files.append(url)
+
+    def fetch(self, path: str, **params) -> bytes:
+        url = f"{path}?{urlencode(params)}" if params else path
+        response = self.client.get(url, headers={"accept-encoding": "identity"})
+        if response.status_code != 200: raise RuntimeError(f"{url}: HTTP {response.status_code}")
+        return response.content
+
+    def assets(self) -> None:
+        for url, path in ASSET_FILES.items():
+            with open(path, 'rb') as f: self.write(url, f.read())
+
+    def page(self, path: str, **params) -> None:
+        self.write(view_url(path, **params), self.fetch(path, **params))
+
+    def json(self, path: str, payload: dict = None, hashed: bool = True, **params) -> None:
+        # Static files are addressed by content, not by graph version, so the version is dropped:
+        # a node's files then only change with its own ancestry.
+        if payload is None: payload = json.loads(self.fetch(path, **{k: v for k, v in params.items() if v is not None}))
+        payload.pop("version", None)
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        url = static_api_url(path, **params)
+        if hashed:
+            STATIC_ASSETS[url] = f"{url[:-len('.json')]}.{hashlib.sha256(body).hexdigest()[:STATIC_HASH_CHARS]}.json"
+            url = STATIC_ASSETS[url]
+        self.write(url, body)
+
+    def node(self, node_key: str, langs: tuple) -> None:
+        self.json(f"/api/subgraph/{node_key}")
+        self.json(f"/api/impact/{node_key}")
+        self.page(f"/local_view/{node_key}")
+        for lang in langs:
+            for view in STATIC_NODE_VIEWS: self.page(f"{view}/{node_key}", lang=lang)
+            if PROOF_TREE_MAX_DEPTH:
+                for view in ("/local_view/proof_tree", "/impact/tree"): self.page(f"{view}/{node_key}", lang=lang, depth=PROOF_TREE_MAX_DEPTH)
+
+    def book(self, data: 'GraphData', first: bool, langs: tuple, text_keys: dict) -> None:
+        self.json("/api/graph", book=data.book_id)
+        self.json("/api/analytics", book=data.book_id)
+        if data.lod():
+            for cluster in json.loads(data.overview_json):
+                if "source" not in cluster["data"]:
+                    self.json(f"/api/cluster/{cluster['data']['id']}", {"cluster": cluster["data"]["id"], "elements": data.cluster_elements(cluster["data"]["id"])}, False, book=data.book_id)
+        for scope, keys in text_keys.items():
+            scope_data = corpus().book(data.book_id, corpus().citing_books(data.book_id)) if scope == "impact" else data
+            for lang in langs:
+                self.json("/api/texts", texts_payload(scope_data, [(k, lang) for k in keys], set(keys)), False, lang=lang, book=data.book_id, scope=scope)
+        self.page(f"/book/{data.book_id}")
+        if first: self.page("/")
+
+def export_static(out_dir: str, incremental: bool = False) -> dict:
+    global STATIC_URLS
+    manifest_file = os.path.join(out_dir, STATIC_MANIFEST)
+    previous = {}
+    if os.path.exists(manifest_file):
+        with open(manifest_file, encoding='utf-8') as f: previous = json.load(f)
+    # Pages link the assets by hash, so other assets export everything again.
+    manifest = {"version": STATIC_MANIFEST_VERSION, "code": CODE_VERSION, "assets": sorted(ASSET_FILES),
+                "settings": [PROOF_TREE_MAX_DEPTH, MAIN_VIEW_LOD_THRESHOLD, LOD_CLUSTER_MAX, LOD_CLUSTER_EDGES, LOD_CLIENT_NODES], "books": {}, "nodes": {}}
+    reusable = incremental and all(previous.get(k) == manifest[k] for k in ("version", "code", "assets", "settings"))
+    books = corpus()
+    stats = {"rendered": 0, "unchanged": 0, "files": 0, "removed": 0}
+    STATIC_URLS = True
+    STATIC_ASSETS.clear()
+    clear_response_caches()
     try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f: data = json.load(f)
-        if any("'english_text'" in v.get("texts", {}) for v in data.get("vertices", [])):
-            data = fix_json_data(data)
-            with open(DATA_FILE, 'w', encoding='utf-8') as f: json.dump(data, f, ensure_ascii=False, indent=2)
-            print("Fixed and saved JSON data.")
-        T_GRAPH = create_graph_from_data(data.get("vertices", []), data.get("edges", []))
-        NODE_LEVELS = calculate_node_levels(T_GRAPH)
-        print(f"Successfully loaded: {T_GRAPH.number_of_nodes()} nodes, {T_GRAPH.number_of_edges()} edges")
-    except Exception as e: print(f"ERROR loading data: {e}")
+        exporter = StaticExporter(out_dir)
+        exporter.assets()
+        # Every node is exported in every language of the corpus, since views link across nodes in the current language.
+        langs = tuple(dict.fromkeys(lang for book_id in books.books for key in books.book(book_id).book_nodes() for lang in books.book(book_id).nodes[key].langs)) or ("french_text",)
+        for i, book_id in enumerate(books.books):
+            data = books.book(book_id)
+            text_keys = {None: {}, "impact": {}}
+            for key in data.book_nodes():
+                impact_data = books.for_impact(key)
+                local, impact = data.local_subgraph(key), impact_data.impact_subgraph(key)
+                text_keys[None].update(dict.fromkeys(local.nodes()))
+                text_keys["impact"].update(dict.fromkeys(impact.nodes()))
+                digest = hashlib.sha256()
+                subgraph_digest(digest, data, local)
+                subgraph_digest(digest, impact_data, impact)
+                entry = previous.get("nodes", {}).get(key) if reusable else None
+                if entry and entry["digest"] == digest.hexdigest() and all(os.path.exists(static_file(out_dir, url)) for url in entry["files"]):
+                    manifest["nodes"][key] = entry
+                    stats["unchanged"] += 1
+                    continue
+                exporter.files = []
+                exporter.node(key, langs)
+                manifest["nodes"][key] = {"digest": digest.hexdigest(), "files": exporter.files}
+                stats["rendered"] += 1
+            exporter.files = []
+            exporter.book(data, i == 0, langs, {scope: list(keys) for scope, keys in text_keys.items()})
+            manifest["books"][book_id] = {"files": exporter.files}
+    finally:
+        STATIC_URLS = False
+        STATIC_ASSETS.clear()
+        clear_response_caches()
+    written = {url for entry in (*manifest["books"].values(), *manifest["nodes"].values()) for url in entry["files"]} | set(manifest["assets"])
+    stale = {url for entry in (*previous.get("books", {}).values(), *previous.get("nodes", {}).values()) for url in entry["files"]} | set(previous.get("assets", []))
+    for url in stale - written:
+        if os.path.exists(static_file(out_dir, url)):
+            os.remove(static_file(out_dir, url))
+            stats["removed"] += 1
+    with open(manifest_file, 'w', encoding='utf-8') as f: json.dump(manifest, f, indent=1)
+    stats["files"] = len(written)
+    return stats
+
+# ==============================================================================
+# PREFORK SERVER
+# ==============================================================================
+# `python app.py serve` runs ETHICS_WORKERS workers (default: one per core) that share one
+# copy of the data. The parent loads every book, with the extended graphs impact views use
+# (raising CORPUS_MAX_BOOKS to hold them all), and has compressed the assets; it then
+# moves all it allocated to the garbage collector's permanent generation and forks the
+# workers. Pages stay shared copy-on-write, since collections in a worker no longer write
+# to the shared objects; reference counts still copy the pages of objects a worker
+# touches. The parent binds the socket, restarts workers that die and stops them on
+# SIGTERM or SIGINT. A reload (ETHICS_WATCH) happens in each worker and unshares the books
+# it replaces. `uvicorn app:app --workers N` still works, but each of its workers starts a
+# new interpreter and loads its own copy.
+SERVE_WORKERS = int(os.environ.get('ETHICS_WORKERS', 0)) or os.cpu_count() or 1
+SERVE_BACKLOG = 2048
+
+def preload() -> Corpus:
+    books = corpus()
+    slots = [(book_id, citing) for book_id in books.books for citing in dict.fromkeys(((), books.citing_books(book_id)))]
+    # Whatever is not loaded now would be loaded, unshared, by every worker: the budget grows to fit.
+    books.max_books = max(books.max_books, len(slots))
+    for book_id, citing in slots: books.book(book_id, citing)
+    gc.collect()
+    gc.freeze()
+    return books
+
+def serve_workers(host: str, port: int, workers: int) -> int:
+    import signal
+    import socket
+    import uvicorn
+    # Checked once here rather than in every worker.
+    check_vendored()
+    app.router.on_startup.remove(check_vendored)
+    books = preload()
+    print(f"Preloaded {len(books.loaded_books())} books, froze {gc.get_freeze_count()} objects")
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(SERVE_BACKLOG)
+    children, stopping = set(), []
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid:
+            children.add(pid)
+            return
+        code = 1
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            if isinstance(books, SqliteCorpus): books.store.reset()
+            uvicorn.Server(uvicorn.Config(app, log_level="warning")).run(sockets=[sock])
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+
+    def stop(signum, frame) -> None:
+        stopping.append(signum)
+        for pid in children: os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers): spawn()
+    print(f"Serving on http://{host}:{port} with {workers} workers (parent {os.getpid()})")
+    while children:
+        try: pid, status = os.wait()
+        except ChildProcessError: break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, restarting it")
+            time.sleep(1)
+            spawn()
+    sock.close()
+    return 0
 
 # ==============================================================================
 # RUN SERVER
 # ==============================================================================
-# NEW, CORRECTED CODE AT THE END OF app.py
+# No command runs the server; see `python app.py --help` for the offline commands.
 if __name__ == "__main__":
-    serve()
+    import argparse
+    parser = argparse.ArgumentParser(description="Graph visualization of Spinoza's Ethics. Runs the server when no command is given.")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("snapshot", help="compile every book of the corpus into its snapshot")
+    sqlite_parser = commands.add_parser("sqlite", help="compile the corpus into a SQLite store")
+    sqlite_parser.add_argument("db_file", nargs="?", default=DB_FILE or "corpus.db")
+    validate_parser = commands.add_parser("validate", help="check graph files, optionally writing them in canonical form")
+    validate_parser.add_argument("files", nargs="*", help="graph files (default: every book of the corpus)")
+    validate_parser.add_argument("--canonical", metavar="DIR", help="write a canonical copy of each file into DIR")
+    export_parser = commands.add_parser("export", help="pre-render every page and JSON file into a directory for static hosting")
+    export_parser.add_argument("out_dir", nargs="?", default="site")
+    export_parser.add_argument("--incremental", action="store_true", help="only render the nodes whose ancestry or impact changed since the last export")
+    commands.add_parser("vendor", help="download the pinned client libraries into assets/vendor")
+    serve_parser = commands.add_parser("serve", help="load the data once and serve it from several forked workers")
+    serve_parser.add_argument("--host", default="0.0.0.0")
+    serve_parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', 5001)))
+    serve_parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="worker processes (default: ETHICS_WORKERS, or one per core)")
+    args = parser.parse_args()
+    # Go through the importable `app` module so pickles do not reference `__main__`.
+    if args.command == "snapshot":
+        import app as app_module
+        books = app_module.corpus()
+        for book_id in books.books:
+            snapshot = books.build_book(book_id)
+            app_module.write_snapshot(snapshot, books.snapshot_file(book_id))
+            print(f"Wrote '{books.snapshot_file(book_id)}' ({snapshot.graph.number_of_nodes()} nodes, version {snapshot.version})")
+    elif args.command == "sqlite":
+        import app as app_module
+        source_hash = app_module.write_sqlite_store(app_module.load_json_corpus(), args.db_file)
+        print(f"Wrote '{args.db_file}' (version {app_module.data_version(source_hash)}); serve it with ETHICS_DB={args.db_file}")
+    elif args.command == "validate":
+        sys.exit(validate_command(args.files or [book["file"] for book in load_json_corpus().books.values()], args.canonical))
+    elif args.command == "export":
+        import app as app_module
+        stats = app_module.export_static(args.out_dir, args.incremental)
+        print(f"Exported {stats['files']} files to '{args.out_dir}' ({stats['rendered']} nodes rendered, {stats['unchanged']} unchanged, {stats['removed']} stale files removed)")
+    elif args.command == "vendor":
+        sys.exit(vendor_command())
+    elif args.command == "serve":
+        import app as app_module
+        sys.exit(app_module.serve_workers(args.host, args.port, args.workers))
+    else:
+        serve()
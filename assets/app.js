@@ -0,0 +1,358 @@
+// app.js - Client side of the graph views. Pages and fragments carry markup only: each
+// component is found by its class when htmx loads it (the page, or a swapped fragment)
+// and reads its URLs and parameters from data-* attributes.
+(function() {
+    // Fragment ids are derived from (node, lang, view) so responses are cacheable; when the same
+    // fragment is opened twice the new copy's ids get a suffix to keep them unique.
+    function uniquifyIds(root) {
+        const clashes = [root, ...root.querySelectorAll('[id]')].filter(function(el) { return el.id && document.querySelectorAll('[id="' + el.id + '"]').length > 1; });
+        if (!clashes.length) return;
+        window.fragmentInstance = (window.fragmentInstance || 0) + 1;
+        clashes.forEach(function(el) { el.id = el.id + '-' + window.fragmentInstance; });
+    }
+
+    function nodeColor(ele) {
+        const t = ele.data('type').toLowerCase();
+        if (t === 'definition') return '#007bff'; if (t === 'axiome' || t === 'axiom') return '#dc3545';
+        if (t === 'proposition') return '#28a745'; if (t === 'theorem') return '#ffc107';
+        if (t === 'appendice') return '#17a2b8'; if (t === 'corollaire') return '#e83e8c';
+        if (t === 'scolie') return '#fd7e14'; return '#6c757d';
+    }
+
+    function openView(url) { htmx.ajax('GET', url, { target: document.body, swap: 'beforeend' }); }
+
+    function getJSON(url) { return fetch(url).then(function(r) { return r.json(); }); }
+
+    function usePopper() {
+        if (typeof cytoscapePopper !== 'undefined' && !cytoscape.prototype.popper) cytoscape.use(cytoscapePopper);
+    }
+
+    // A tooltip for a component, removed once the component leaves the page.
+    function componentTooltip(container) {
+        const tooltip = document.createElement('div');
+        tooltip.className = 'tooltip';
+        document.body.appendChild(tooltip);
+        const check = setInterval(function() {
+            if (!document.body.contains(container)) { tooltip.remove(); clearInterval(check); }
+        }, 1000);
+        return tooltip;
+    }
+
+    // Client-side cache of node texts shared by every modal on the page, filled in batches
+    // from /api/texts. Requests are chunked to stay under API_TEXTS_MAX_KEYS.
+    const nodeTextCache = new Map(), nodeTextFiles = new Map();
+    function cachedNodeText(key, lang, withDemonstration) {
+        const entry = nodeTextCache.get(key + '|' + lang);
+        return entry && (!withDemonstration || 'demonstration' in entry) ? entry : undefined;
+    }
+    function storeNodeTexts(payload) {
+        Object.entries(payload.texts).forEach(function([key, byLang]) {
+            Object.entries(byLang).forEach(function([l, entry]) {
+                nodeTextCache.set(key + '|' + l, Object.assign({}, nodeTextCache.get(key + '|' + l), entry));
+            });
+        });
+    }
+    function loadNodeTexts(textsUrl, keys, lang, demonstrationKeys) {
+        // A static export has one file of every text per book and language instead of queries.
+        if (!textsUrl.includes('?')) {
+            if (!nodeTextFiles.has(textsUrl)) nodeTextFiles.set(textsUrl, getJSON(textsUrl).then(storeNodeTexts));
+            return nodeTextFiles.get(textsUrl);
+        }
+        const missing = keys.filter(function(k) { return !cachedNodeText(k, lang, demonstrationKeys.includes(k)); });
+        const requests = [];
+        for (let i = 0; i < missing.length; i += 200) {
+            const chunk = missing.slice(i, i + 200);
+            const demos = demonstrationKeys.filter(function(k) { return chunk.includes(k); });
+            const url = textsUrl + '&keys=' + encodeURIComponent(chunk.join(',')) + (demos.length ? '&demonstrations=' + encodeURIComponent(demos.join(',')) : '');
+            requests.push(getJSON(url).then(storeNodeTexts));
+        }
+        return Promise.all(requests);
+    }
+
+    // The main view: the book's graph at its precomputed positions (data-graph-url), or for
+    // large books an overview of clusters expanded on demand.
+    function initMainView(container) {
+        const analyticsUrl = container.dataset.analyticsUrl, nodeUrl = container.dataset.nodeUrl;
+        getJSON(container.dataset.graphUrl).then(function(payload) {
+            if (typeof cytoscape === 'undefined') return;
+            const elements = payload.elements;
+            const tooltipDiv = document.createElement('div');
+            tooltipDiv.className = 'tooltip';
+            document.body.appendChild(tooltipDiv);
+            let popperRef;
+            usePopper();
+            const cy = cytoscape({
+                container: container, elements: elements, layout: { name: 'preset', padding: 50 },
+                style: [
+                    { selector: 'node', style: { 'background-color': nodeColor, 'width': '12px', 'height': '12px' } },
+                    { selector: 'edge', style: { 'width': 1.5, 'line-color': '#ccc', 'target-arrow-color': '#ccc', 'target-arrow-shape': 'triangle', 'curve-style': 'bezier' } },
+                    { selector: 'node[?cluster]', style: {
+                        'shape': 'round-rectangle', 'width': function(ele) { return 30 + 6 * Math.sqrt(ele.data('count')); },
+                        'height': function(ele) { return 20 + 3 * Math.sqrt(ele.data('count')); },
+                        'label': 'data(label)', 'font-size': '10px', 'text-valign': 'center', 'color': '#fff', 'text-outline-width': 1, 'text-outline-color': '#555'
+                    } },
+                    { selector: 'edge[weight]', style: { 'width': function(ele) { return Math.min(1 + Math.log2(ele.data('weight')), 8); } } }
+                ],
+                minZoom: payload.lod ? 0.01 : 0.2, maxZoom: 3
+            });
+            cy.on('mouseover', 'node', function(evt) {
+                popperRef = evt.target.popper({
+                    content: function() {
+                        tooltipDiv.innerHTML = evt.target.data('label');
+                        tooltipDiv.style.display = 'block';
+                        return tooltipDiv;
+                    }
+                });
+            });
+            cy.on('mouseout', 'node', function() {
+                if (popperRef) popperRef.destroy();
+                tooltipDiv.style.display = 'none';
+            });
+            cy.on('tap', 'node', function(evt) {
+                if (evt.target.data('cluster')) return expandCluster(evt.target.id());
+                openView(nodeUrl.replace('{node}', evt.target.id()));
+            });
+            // Level of detail: clusters expand on tap or when zoomed into, members collapse back on
+            // right click, and the least recently expanded clusters collapse past the node budget.
+            const expanded = new Map(), pending = new Set(), overview = {}, clusterEdges = [];
+            function rebuildEdges() {
+                const edges = new Map();
+                function add(source, target, weight) {
+                    const id = source + '->' + target, edge = edges.get(id);
+                    if (edge) edge.data.weight += weight; else edges.set(id, { data: { id: id, source: source, target: target, weight: weight } });
+                }
+                clusterEdges.forEach(function(e) { if (!expanded.has(e.source) && !expanded.has(e.target)) add(e.source, e.target, e.weight); });
+                const seen = new Set();
+                expanded.forEach(function(cluster) { cluster.edges.forEach(function(e) {
+                    if (seen.has(e.id)) return;
+                    seen.add(e.id);
+                    const source = expanded.has(e.source_cluster) ? e.source : e.source_cluster, target = expanded.has(e.target_cluster) ? e.target : e.target_cluster;
+                    if (source !== target) add(source, target, 1);
+                }); });
+                cy.batch(function() {
+                    cy.edges().remove();
+                    // Edges between members stay plain; those standing for several citations get a width.
+                    cy.add(Array.from(edges.values()).map(function(e) { if (e.data.weight === 1 && !overview[e.data.source] && !overview[e.data.target]) delete e.data.weight; return e; }));
+                });
+            }
+            function collapseCluster(id) {
+                const cluster = expanded.get(id);
+                if (!cluster) return;
+                expanded.delete(id);
+                cy.batch(function() { cy.remove(cy.collection(cluster.members.map(function(k) { return cy.getElementById(k); }))); cy.add(overview[id]); });
+                rebuildEdges();
+            }
+            function expandCluster(id) {
+                if (!payload.lod || expanded.has(id) || pending.has(id)) return;
+                pending.add(id);
+                getJSON(payload.lod.cluster_url.replace('{cluster}', encodeURIComponent(id))).then(function(cluster) {
+                    pending.delete(id);
+                    const node = cy.getElementById(id);
+                    if (!node.length) return;
+                    const center = node.position(), members = cluster.elements.filter(function(e) { return !('source' in e.data); });
+                    const columns = Math.ceil(Math.sqrt(members.length)), offset = (columns - 1) / 2;
+                    cy.batch(function() {
+                        node.remove();
+                        cy.add(members.map(function(e, i) {
+                            e.data.parentCluster = id;
+                            return { data: e.data, position: { x: center.x + 40 * (i % columns - offset), y: center.y + 40 * (Math.floor(i / columns) - offset) } };
+                        }));
+                    });
+                    expanded.set(id, { members: members.map(function(e) { return e.data.id; }), edges: cluster.elements.filter(function(e) { return 'source' in e.data; }).map(function(e) { return e.data; }) });
+                    let total = 0;
+                    expanded.forEach(function(c) { total += c.members.length; });
+                    for (const [other, c] of expanded) {
+                        if (total <= payload.lod.budget || other === id) break;
+                        total -= c.members.length;
+                        expanded.delete(other);
+                        cy.batch(function() { cy.remove(cy.collection(c.members.map(function(k) { return cy.getElementById(k); }))); cy.add(overview[other]); });
+                    }
+                    rebuildEdges();
+                    if (analyticsUrl && document.getElementById('metric-size')) applyMetrics();
+                }, function() { pending.delete(id); });
+            }
+            if (payload.lod) {
+                elements.forEach(function(e) {
+                    if ('source' in e.data) clusterEdges.push(e.data); else overview[e.data.id] = { data: e.data, position: e.position };
+                });
+                cy.on('cxttap', 'node[parentCluster]', function(evt) { collapseCluster(evt.target.data('parentCluster')); });
+                let zoomTimer;
+                cy.on('zoom pan', function() {
+                    clearTimeout(zoomTimer);
+                    zoomTimer = setTimeout(function() {
+                        if (cy.zoom() < 0.6) return;
+                        const extent = cy.extent(), x = (extent.x1 + extent.x2) / 2, y = (extent.y1 + extent.y2) / 2;
+                        let nearest = null, best = Infinity;
+                        cy.nodes('[?cluster]').forEach(function(n) {
+                            const p = n.position(), d = (p.x - x) * (p.x - x) + (p.y - y) * (p.y - y);
+                            if (p.x >= extent.x1 && p.x <= extent.x2 && p.y >= extent.y1 && p.y <= extent.y2 && d < best) { nearest = n; best = d; }
+                        });
+                        if (nearest) expandCluster(nearest.id());
+                    }, 250);
+                });
+            }
+            // Size and color by a metric of /api/analytics, mapped to its percentile in the book.
+            let metricRanks = null;
+            function loadMetricRanks() {
+                metricRanks = metricRanks || getJSON(analyticsUrl).then(function(payload) {
+                    const ranks = {}, keys = Object.keys(payload.nodes);
+                    payload.metrics.forEach(function(name, i) {
+                        const sorted = keys.slice().sort(function(a, b) { return payload.nodes[a][i] - payload.nodes[b][i]; });
+                        ranks[name] = {};
+                        sorted.forEach(function(k, j) {
+                            const previous = sorted[j - 1];
+                            ranks[name][k] = j && payload.nodes[previous][i] === payload.nodes[k][i] ? ranks[name][previous] : (sorted.length > 1 ? j / (sorted.length - 1) : 1);
+                        });
+                    });
+                    return ranks;
+                });
+                return metricRanks;
+            }
+            function applyMetrics() {
+                const sizeBy = document.getElementById('metric-size').value, colorBy = document.getElementById('metric-color').value;
+                (sizeBy || colorBy ? loadMetricRanks() : Promise.resolve(null)).then(function(ranks) { cy.batch(function() {
+                    cy.nodes('[!cluster]').forEach(function(n) {
+                        if (sizeBy) { const size = 8 + 32 * (ranks[sizeBy][n.id()] || 0); n.style({ 'width': size, 'height': size }); } else n.removeStyle('width height');
+                        if (colorBy) n.style('background-color', 'hsl(' + (55 - 55 * (ranks[colorBy][n.id()] || 0)) + ', 90%, ' + (70 - 35 * (ranks[colorBy][n.id()] || 0)) + '%)'); else n.removeStyle('background-color');
+                    });
+                }); });
+            }
+            if (analyticsUrl && document.getElementById('metric-size')) {
+                ['metric-size', 'metric-color'].forEach(function(id) { document.getElementById(id).addEventListener('change', applyMetrics); });
+                applyMetrics();
+            }
+            window.addEventListener('resize', function() { cy.resize(); cy.fit(null, 50); });
+        });
+    }
+
+    // A modal: placed below the ones already open, draggable by its header and resizable.
+    function initModal(modal) {
+        if (typeof interact === 'undefined') { setTimeout(function() { initModal(modal); }, 100); return; }
+        const modalContent = modal.querySelector('.modal-content');
+        const header = modal.querySelector('.modal-header');
+        const openModals = document.querySelectorAll('.modal[style*="display: block"]').length;
+        const offset = (openModals > 1 ? openModals - 1 : 0) * 30;
+        modalContent.style.top = (50 + offset) + 'px';
+        modalContent.style.left = (50 + offset) + 'px';
+        modal.style.display = 'block';
+        interact(modalContent).draggable({
+            allowFrom: header,
+            listeners: {
+                move: function(event) {
+                    const target = event.target;
+                    const x = (parseFloat(target.getAttribute('data-x')) || 0) + event.dx;
+                    const y = (parseFloat(target.getAttribute('data-y')) || 0) + event.dy;
+                    target.style.transform = 'translate(' + x + 'px, ' + y + 'px)';
+                    target.setAttribute('data-x', x);
+                    target.setAttribute('data-y', y);
+                }
+            }
+        });
+        interact(modalContent).resizable({
+            edges: { left: true, right: true, bottom: true, top: false },
+            listeners: {
+                move: function(event) {
+                    let target = event.target;
+                    let x = (parseFloat(target.getAttribute('data-x')) || 0);
+                    let y = (parseFloat(target.getAttribute('data-y')) || 0);
+                    target.style.width = event.rect.width + 'px';
+                    target.style.height = event.rect.height + 'px';
+                    x += event.deltaRect.left;
+                    y += event.deltaRect.top;
+                    target.style.transform = 'translate(' + x + 'px, ' + y + 'px)';
+                    target.setAttribute('data-x', x);
+                    target.setAttribute('data-y', y);
+                    const cyContainer = event.target.querySelector('.local-cy');
+                    if (cyContainer && cyContainer._cy) {
+                        cyContainer._cy.resize();
+                    }
+                }
+            }
+        });
+    }
+
+    // A local graph (ancestry, impact or citation path). Structure only: tooltip and
+    // demonstration texts are fetched in batches the first time a node is hovered.
+    function initLocalGraph(container) {
+        const nodeKey = container.dataset.node, lang = container.dataset.lang, textsUrl = container.dataset.textsUrl, nodeUrl = container.dataset.nodeUrl;
+        getJSON(container.dataset.elementsUrl).then(function(payload) { requestAnimationFrame(function() {
+            if (container._cy || typeof cytoscape === 'undefined') return;
+            usePopper();
+            const cy = cytoscape({
+                container: container,
+                elements: payload.elements,
+                layout: { name: 'breadthfirst', directed: true, padding: 30, grid: true, roots: [nodeKey] },
+                style: [
+                    { selector: 'node', style: {
+                        'label': 'data("label")', 'text-opacity': 1, 'font-size': '10px', 'text-valign': 'center', 'text-halign': 'center', 'color': '#333',
+                        'text-outline-width': 2, 'text-outline-color': '#fff',
+                        'background-color': nodeColor,
+                        'width': '40px', 'height': '40px',
+                        'border-width': function(ele) { return ele.data('is_center') ? 3 : 2; },
+                        'border-color': function(ele) { return ele.data('is_center') ? '#000' : '#333'; }
+                    } },
+                    { selector: 'edge', style: { 'width': 1.5, 'line-color': '#ccc', 'target-arrow-color': '#ccc', 'target-arrow-shape': 'triangle', 'curve-style': 'bezier' } }
+                ],
+                minZoom: 0.2, maxZoom: 3
+            });
+            container._cy = cy;
+            const tooltipDiv = componentTooltip(container);
+            let popperRef;
+            let hovered = null;
+            function tooltipText(node, entry) {
+                if (!entry) return 'Loading…';
+                return node.data('is_center') && entry.demonstration ? '<strong>Demonstration:</strong><br>' + entry.demonstration : entry.text;
+            }
+            cy.on('mouseover', 'node', function(evt) {
+                const node = evt.target;
+                hovered = node;
+                popperRef = node.popper({ content: function() { tooltipDiv.innerHTML = tooltipText(node, cachedNodeText(node.id(), lang, node.data('is_center'))); tooltipDiv.style.display = 'block'; return tooltipDiv; } });
+                if (cachedNodeText(node.id(), lang, node.data('is_center'))) return;
+                // One batched request for every node of this subgraph not cached yet.
+                loadNodeTexts(textsUrl, cy.nodes().map(function(n) { return n.id(); }), lang, [nodeKey]).then(function() {
+                    if (hovered === node) tooltipDiv.innerHTML = tooltipText(node, cachedNodeText(node.id(), lang, node.data('is_center')));
+                });
+            });
+            cy.on('mouseout', 'node', function() { hovered = null; if (popperRef) popperRef.destroy(); tooltipDiv.style.display = 'none'; });
+            cy.on('tap', 'node', function(evt) { openView(nodeUrl.replace('{node}', evt.target.id())); });
+        }); });
+    }
+
+    // A textual proof tree: hovering a node shows its text (back-references borrow the
+    // original's), hovering the main box its demonstration; a back-reference scrolls to its original.
+    function initProofTree(container) {
+        const tooltip = componentTooltip(container);
+        function showTip(content) { tooltip.innerHTML = content; tooltip.style.display = 'block'; }
+        function hideTip() { tooltip.style.display = 'none'; }
+        function moveTip(e) { tooltip.style.left = (e.pageX + 10) + 'px'; tooltip.style.top = (e.pageY - 30) + 'px'; }
+        container.addEventListener('mouseover', function(e) {
+            const proofNode = e.target.closest('.proof-node');
+            const mainBox = e.target.closest('.main-node-box');
+            if (proofNode) {
+                const ref = proofNode.getAttribute('data-ref');
+                const source = ref ? container.querySelector('.proof-node[data-proof-key="' + ref + '"]') : proofNode;
+                if (source) showTip(source.getAttribute('data-text'));
+            } else if (mainBox) {
+                const demo = mainBox.getAttribute('data-demonstration');
+                if (demo && demo !== 'No Demonstration') { showTip('<strong>Demonstration:</strong><br>' + demo); }
+            }
+        });
+        container.addEventListener('click', function(e) {
+            const refNode = e.target.closest('.proof-ref');
+            if (!refNode) return;
+            const source = container.querySelector('.proof-node[data-proof-key="' + refNode.getAttribute('data-ref') + '"]');
+            if (source) { source.scrollIntoView({ behavior: 'smooth', block: 'center' }); source.animate([{ outline: '2px solid #333' }, { outline: 'none' }], 1200); }
+        });
+        container.addEventListener('mouseout', hideTip);
+        container.addEventListener('mousemove', moveTip);
+    }
+
+    const components = [['.modal', initModal], ['.main-view', initMainView], ['.local-cy', initLocalGraph], ['.textual-view', initProofTree]];
+    htmx.onLoad(function(root) {
+        if (root !== document.body) uniquifyIds(root);
+        components.forEach(function([selector, init]) {
+            if (root.matches(selector)) init(root);
+            root.querySelectorAll(selector).forEach(init);
+        });
+    });
+})();
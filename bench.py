@@ -0,0 +1,200 @@
+# bench.py - Micro-benchmarks for the core graph functions and every route.
+#
+#   python bench.py                          # Book I plus synthetic graphs of 10^2..10^5 nodes
+#   python bench.py --sizes 100,1000 -o new.json --compare old.json
+#
+# Routes are driven in-process through Starlette's test client with the response cache
+# cleared before each call, so they measure rendering rather than cache hits (the `warm`
+# entries measure the cached path). Each entry records the median and best wall time,
+# the peak memory allocated during one call (tracemalloc, measured in a separate call so
+# it does not skew the timings) and the response size. Results are written as JSON;
+# --compare reports entries whose best time or allocation peak grew past --threshold
+# and exits non-zero if there are any. The 10^5 graph alone takes several minutes.
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from starlette.testclient import TestClient
+
+import app
+
+TYPES = (("DEFINITION", "Def"), ("AXIOME", "Ax"), ("PROPOSITION", "Prop"))
+WORDS = {
+    "french_text": "dieu substance attribut mode essence existence cause effet nature infini chose idée corps esprit puissance nécessité liberté éternité".split(),
+    "english_text": "god substance attribute mode essence existence cause effect nature infinite thing idea body mind power necessity freedom eternity".split(),
+    "latin_text": "deus substantia attributum modus essentia existentia causa effectus natura infinitum res idea corpus mens potentia necessitas libertas aeternitas".split(),
+}
+
+def words(rng: random.Random, lang: str, n: int) -> str:
+    return " ".join(rng.choice(WORDS[lang]) for _ in range(n)).capitalize() + "."
+
+def synthetic_book(n: int, seed: int = 0, book: str = "S") -> dict:
+    # Ethics-shaped: a few definitions and axioms up front, then propositions that each
+    # cite one to four earlier items, mostly recent propositions and some first principles.
+    rng = random.Random(seed)
+    counts = {prefix: 0 for _, prefix in TYPES}
+    vertices, edges = [], []
+    for i in range(n):
+        node_type, prefix = TYPES[0] if i < max(2, n // 20) else TYPES[1] if i < max(3, n // 12) else TYPES[2]
+        counts[prefix] += 1
+        key = f"{book}_{prefix}_{counts[prefix]}"
+        vertex = {"type": node_type, "normalized_key": key, "number": str(counts[prefix]), "texts": {lang: words(rng, lang, 10) for lang in WORDS}, "components": []}
+        if node_type == "PROPOSITION":
+            vertex["components"].append({"type": "DEMONSTRATION", "texts": {lang: words(rng, lang, 20) for lang in WORDS}})
+            for target in {vertices[min(i - 1, int(i * rng.random() ** 0.3))]["normalized_key"] for _ in range(rng.randint(1, 4))}:
+                edges.append({"source": target, "target": key, "type": "citation"})
+        vertices.append(vertex)
+    return {"metadata": {"synthetic": True, "nodes": n, "seed": seed}, "vertices": vertices, "edges": edges}
+
+def use_corpus(corpus_dir: str) -> app.GraphData:
+    app.CORPUS_DIR, app.DATA_FILE, app.DB_FILE = corpus_dir, None, None
+    return app.reload_corpus().book()
+
+def measure(fn, repeat: int, budget: float, before=None) -> dict:
+    times, result = [], None
+    start = time.perf_counter()
+    while len(times) < repeat and (len(times) < 1 or time.perf_counter() - start < budget):
+        if before: before()
+        t = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t)
+    if before: before()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    entry = {"median_ms": round(statistics.median(times) * 1000, 3), "min_ms": round(min(times) * 1000, 3), "runs": len(times), "alloc_peak_kib": round(peak / 1024, 1)}
+    if isinstance(result, (bytes, str)): entry["size_bytes"] = len(result)
+    elif hasattr(result, "content"): entry.update(size_bytes=len(result.content), status=result.status_code)
+    return entry
+
+def pick_nodes(data: app.GraphData) -> dict:
+    # The deepest node (largest ancestor set) and one at the median level.
+    by_level = sorted(data.levels, key=lambda k: (data.levels[k], k))
+    return {"deep": by_level[-1], "mid": by_level[len(by_level) // 2]}
+
+def pick_root(data: app.GraphData, deep: str) -> str:
+    # A first principle of the deepest node (so a path between them exists) with a large impact set.
+    roots = [k for k in data.local_subgraph(deep).nodes() if data.levels[k] == 0][:20]
+    return max(roots, key=lambda k: (len(data.impact_subgraph(k)), k))
+
+def bench_dataset(name: str, corpus_dir: str, args) -> dict:
+    results = {}
+    def run(label, fn, before=None):
+        results[label] = measure(fn, args.repeat, args.budget, before)
+        print(f"  {name:>8} {label:<32} {results[label]['median_ms']:>10.3f} ms {results[label]['alloc_peak_kib']:>10.1f} KiB {results[label].get('size_bytes', '')}")
+
+    t = time.perf_counter()
+    data = use_corpus(corpus_dir)
+    results["load"] = {"median_ms": round((time.perf_counter() - t) * 1000, 3), "runs": 1, "nodes": data.number_of_nodes()}
+    print(f"  {name:>8} {'load':<32} {results['load']['median_ms']:>10.3f} ms ({data.number_of_nodes()} nodes)")
+    graph, nodes = data.graph, pick_nodes(data)
+    root = pick_root(data, nodes["deep"])
+    lang = "french_text"
+
+    run("calculate_node_levels", lambda: app.calculate_node_levels(graph))
+    run("AncestorIndex", lambda: app.AncestorIndex(graph))
+    run("SearchIndex", lambda: app.SearchIndex(data.nodes, graph.nodes()))
+    run("serialize_graph_for_cytoscape", lambda: app.serialize_graph_for_cytoscape(graph, data.level_nodes))
+    run("main_view_clusters", lambda: app.main_view_clusters(graph, data.levels, data.own_keys))
+    for which, key in nodes.items():
+        subgraph = data.local_subgraph(key)
+        run(f"local_subgraph[{which}]", lambda: data.local_subgraph(key))
+        run(f"render_proof_tree[{which}]", lambda: app.to_xml(app.render_proof_tree(data, subgraph, key, lang, None)))
+        run(f"render_local_textual[{which}]", lambda: app.to_xml(app.render_local_textual(data, subgraph, key, lang, None)))
+    run("impact_subgraph[root]", lambda: data.impact_subgraph(root))
+    run("citation_path[root->deep]", lambda: app.shortest_citation_path(root, nodes["deep"], lambda k: set(data.descendant_index.ancestors(k)), lambda keys: {k: list(graph.pred[k]) for k in keys}))
+    run("compute_analytics", lambda: app.compute_analytics(graph, data.levels))
+    run("search", lambda: data.search("substance causa god", None, 20))
+
+    client = TestClient(app.app)
+    def cold():
+        app.clear_response_caches()
+        app.PATH_CACHE.clear()
+    routes = {"/": "/", "/api/graph": "/api/graph", "/api/analytics": "/api/analytics", "/search": "/search?q=substance+causa", "/api/search": "/api/search?q=substance+causa"}
+    for which, key in nodes.items():
+        routes.update({
+            f"/local_view[{which}]": f"/local_view/{key}?lang={lang}",
+            f"/local_view/visual[{which}]": f"/local_view/visual/{key}?lang={lang}",
+            f"/local_view/textual[{which}]": f"/local_view/textual/{key}?lang={lang}",
+            f"/local_view/proof_tree[{which}]": f"/local_view/proof_tree/{key}?lang={lang}&depth=3",
+            f"/update_modal_language[{which}]": f"/update_modal_language/{key}?lang=latin_text",
+            f"/api/subgraph[{which}]": f"/api/subgraph/{key}",
+            f"/api/node[{which}]": f"/api/node/{key}",
+        })
+    routes.update({
+        "/impact[root]": f"/impact/{root}?lang={lang}",
+        "/impact/textual[root]": f"/impact/textual/{root}?lang={lang}&depth=3",
+        "/api/impact[root]": f"/api/impact/{root}",
+        "/path[root->deep]": f"/path/{root}/{nodes['deep']}?lang={lang}",
+        "/api/path[root->deep]": f"/api/path/{root}/{nodes['deep']}",
+    })
+    if data.lod(): routes["/api/cluster[last]"] = f"/api/cluster/{list(data.clusters)[-1]}"
+    keys = ",".join(list(graph.nodes())[:50])
+    routes["/api/texts[50]"] = f"/api/texts?keys={keys}&lang={lang}&demonstrations={keys}"
+    for label, url in routes.items():
+        run(label, lambda: client.get(url), cold)
+    for label in ("/local_view/textual[deep]", "/api/graph"):
+        client.get(routes[label])
+        run(f"warm {label}", lambda: client.get(routes[label]))
+    return results
+
+def git_commit() -> str:
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return None
+
+def compare(results: dict, baseline: dict, threshold: float) -> int:
+    regressions = 0
+    for dataset, entries in results["datasets"].items():
+        for label, entry in entries.items():
+            old = baseline.get("datasets", {}).get(dataset, {}).get(label)
+            if not old: continue
+            # Best times are steadier than medians on a shared machine; tiny absolute changes are noise.
+            for metric, floor in (("min_ms", 0.5), ("alloc_peak_kib", 16)):
+                if not old.get(metric) or metric not in entry or abs(entry[metric] - old[metric]) < floor: continue
+                ratio = entry[metric] / old[metric]
+                if ratio > threshold:
+                    regressions += 1
+                    print(f"REGRESSION {dataset} {label} {metric}: {old[metric]} -> {entry[metric]} (x{ratio:.2f})")
+                elif ratio < 1 / threshold:
+                    print(f"improved   {dataset} {label} {metric}: {old[metric]} -> {entry[metric]} (x{ratio:.2f})")
+    print(f"{regressions} regressions against {baseline.get('commit') or 'baseline'} (threshold x{threshold})")
+    return 1 if regressions else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the core graph functions and routes on the corpus and synthetic graphs.")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="synthetic graph sizes, comma-separated (empty for none)")
+    parser.add_argument("--no-book", action="store_true", help="skip the real corpus")
+    parser.add_argument("--repeat", type=int, default=20, help="maximum runs per entry")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds per entry after the first run")
+    parser.add_argument("-o", "--output", default=f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio beyond which a change counts as a regression")
+    args = parser.parse_args()
+
+    results = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+               "platform": platform.platform(), "datasets": {}}
+    corpus_dir = app.CORPUS_DIR
+    if not args.no_book: results["datasets"]["book"] = bench_dataset("book", corpus_dir, args)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",") if s):
+            book_dir = os.path.join(tmp, str(size))
+            os.makedirs(book_dir)
+            with open(os.path.join(book_dir, "S.json"), "w", encoding="utf-8") as f: json.dump(synthetic_book(size), f, ensure_ascii=False)
+            results["datasets"][f"synthetic-{size}"] = bench_dataset(str(size), book_dir, args)
+    with open(args.output, "w", encoding="utf-8") as f: json.dump(results, f, indent=1)
+    print(f"Wrote '{args.output}'")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f: return compare(results, json.load(f), args.threshold)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# loadtest.py - Closed-loop load test against a locally started server.
+#
+#   python loadtest.py                                  # 1, 4, 16 and 64 users, 10 s each
+#   python loadtest.py --concurrency 8,32 --duration 30 --workers 4 -o results.json
+#   python loadtest.py --workers 1,2,4,8 --synthetic 10000 --mode uvicorn
+#   python loadtest.py --url http://127.0.0.1:5001      # an already running server
+#
+# The server is started with `app.py serve` (or `uvicorn --workers` with --mode uvicorn),
+# once per worker count. After each run the workers' memory is read from /proc (Linux):
+# RSS, PSS (shared pages divided among the processes mapping them) and private memory,
+# so the summary shows both throughput and memory scaling with the number of workers.
+#
+# Each virtual user replays a browsing session: the main view (page and graph payload,
+# and one cluster when the view is clustered),
+# then a chain of modals, each opened on a premise of the previous node or on a random
+# node, with the tooltip texts fetch, a tab switch to the textual view and back, a
+# language switch and the proof tree. Users start the next request as soon as the last
+# one completes (plus --think), so throughput is the server's at that concurrency.
+# Everything runs offline; only the server's own URLs are requested.
+import argparse
+import asyncio
+import html
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+LANGS = ("french_text", "english_text", "latin_text")
+HEADERS = {"accept-encoding": "br, gzip", "hx-request": "true"}
+
+def route_of(url: str) -> str:
+    path = url.split("?", 1)[0]
+    path = re.sub(r"/api/cluster/[^/]+$", "/api/cluster/{cluster}", path)
+    return re.sub(r"/(local_view(?:/visual|/textual|/proof_tree)?|update_modal_language|api/subgraph|api/node)/[^/]+$", r"/\1/{node}", path)
+
+class Recorder:
+    def __init__(self):
+        self.latencies, self.errors = {}, {}
+
+    async def get(self, client: httpx.AsyncClient, url: str, headers: dict = None) -> httpx.Response:
+        route = route_of(url)
+        start = time.perf_counter()
+        try:
+            response = await client.get(url, headers=headers or HEADERS)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        elapsed = time.perf_counter() - start
+        if ok: self.latencies.setdefault(route, []).append(elapsed)
+        else: self.errors[route] = self.errors.get(route, 0) + 1
+        return response
+
+async def session(client: httpx.AsyncClient, recorder: Recorder, graph: dict, rng: random.Random, chain: int, think: float):
+    async def get(url, headers=None):
+        response = await recorder.get(client, url, headers)
+        if think: await asyncio.sleep(rng.expovariate(1 / think))
+        return response
+
+    await get("/", {"accept-encoding": "br, gzip"})
+    await get(graph["url"])
+    if graph["clusters"]: await get(rng.choice(graph["clusters"]))
+    node, lang = rng.choice(graph["nodes"]), rng.choice(LANGS)
+    for _ in range(chain):
+        await get(f"/local_view/{node}?lang={lang}")
+        premises = graph["premises"].get(node, [])
+        if premises: await get(f"/api/texts?keys={','.join(premises[:50])}&lang={lang}&demonstrations={node}&book={graph['book']}")
+        await get(f"/local_view/textual/{node}?lang={lang}")
+        await get(f"/local_view/visual/{node}?lang={lang}")
+        lang = rng.choice([l for l in LANGS if l != lang])
+        await get(f"/update_modal_language/{node}?lang={lang}")
+        await get(f"/local_view/proof_tree/{node}?lang={lang}")
+        node = rng.choice(premises) if premises and rng.random() < 0.7 else rng.choice(graph["nodes"])
+
+async def run_level(base_url: str, graph: dict, users: int, duration: float, chain: int, think: float, seed: int) -> dict:
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def user(i):
+            rng = random.Random(seed * 1000 + i)
+            while time.perf_counter() < deadline: await session(client, recorder, graph, rng, chain, think)
+        start, cpu = time.perf_counter(), time.process_time()
+        await asyncio.gather(*(user(i) for i in range(users)))
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+    routes = {}
+    for route in sorted(set(recorder.latencies) | set(recorder.errors)):
+        samples = sorted(recorder.latencies.get(route, []))
+        entry = {"requests": len(samples), "errors": recorder.errors.get(route, 0), "rps": round(len(samples) / elapsed, 1)}
+        if len(samples) >= 2:
+            q = statistics.quantiles(samples, n=100, method="inclusive")
+            entry.update(p50_ms=round(q[49] * 1000, 2), p95_ms=round(q[94] * 1000, 2), p99_ms=round(q[98] * 1000, 2), max_ms=round(samples[-1] * 1000, 2))
+        routes[route] = entry
+    total = sum(len(v) for v in recorder.latencies.values())
+    # Near 100%, the driver rather than the server limits throughput: use --workers and fewer users, or several drivers.
+    return {"users": users, "seconds": round(elapsed, 2), "requests": total, "errors": sum(recorder.errors.values()), "rps": round(total / elapsed, 1),
+            "driver_cpu_percent": round(100 * cpu / elapsed), "routes": routes}
+
+async def load_graph(base_url: str) -> dict:
+    # The main view's payload gives the node keys and the premises used to chain modals; a
+    # level-of-detail view gives clusters, each fetched for its members.
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        page = (await client.get("/")).text
+        url = html.unescape(re.search(r'data-graph-url="([^"]*)"', page).group(1))
+        payload = (await client.get(url)).json()
+        clusters = []
+        if "lod" in payload:
+            clusters = [payload["lod"]["cluster_url"].replace("{cluster}", e["data"]["id"]) for e in payload["elements"] if "source" not in e["data"]]
+            payload["elements"] = [e for cluster in clusters for e in (await client.get(cluster)).json()["elements"]]
+            payload["elements"] = list({e["data"]["id"]: e for e in payload["elements"]}.values())
+    nodes = [e["data"]["id"] for e in payload["elements"] if "source" not in e["data"]]
+    premises = {}
+    for e in payload["elements"]:
+        if "source" in e["data"]: premises.setdefault(e["data"]["target"], []).append(e["data"]["source"])
+    return {"url": url, "book": payload.get("book", ""), "nodes": nodes, "premises": premises, "clusters": clusters}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port: int, workers: int, mode: str, corpus_dir: str = None) -> subprocess.Popen:
+    if mode == "prefork": command = [sys.executable, "app.py", "serve", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)]
+    else: command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    env = dict(os.environ, ETHICS_CORPUS_DIR=corpus_dir) if corpus_dir else None
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    for _ in range(3000):
+        if server.poll() is not None: raise RuntimeError(f"server exited with {server.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200: return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start within 300 s")
+
+def process_memory(pid: int) -> dict:
+    # Resident, proportional (shared pages divided among their users) and private memory, in MiB.
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"): fields[name] = int(value.split()[0])
+    return {"rss_mib": round(fields["Rss"] / 1024, 1), "pss_mib": round(fields["Pss"] / 1024, 1),
+            "private_mib": round((fields["Private_Clean"] + fields["Private_Dirty"]) / 1024, 1)}
+
+def server_memory(pid: int) -> dict:
+    # The serving processes are the server's children, or the server itself with a single uvicorn worker.
+    # Linux only; the total PSS counts the parent too and is the memory the whole server uses.
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", encoding="ascii") as f: children = [int(c) for c in f.read().split()]
+        workers = [process_memory(c) for c in children] or [process_memory(pid)]
+        total = sum(w["pss_mib"] for w in workers) + (process_memory(pid)["pss_mib"] if children else 0)
+    except OSError:
+        return None
+    return {"workers": workers, "total_pss_mib": round(total, 1)}
+
+def print_level(level: dict) -> None:
+    print(f"\n{level['users']} users: {level['requests']} requests in {level['seconds']} s, {level['rps']} req/s, {level['errors']} errors (driver CPU {level['driver_cpu_percent']}%)")
+    print(f"  {'route':<32} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for route, entry in level["routes"].items():
+        print(f"  {route:<32} {entry['rps']:>8} {entry.get('p50_ms', '-'):>9} {entry.get('p95_ms', '-'):>9} {entry.get('p99_ms', '-'):>9} {entry['errors']:>7}")
+
+def print_scaling(runs: list) -> None:
+    print(f"\n  {'workers':>7} {'mode':>8} {'rss/worker':>11} {'pss/worker':>11} {'private/worker':>15} {'total pss':>10}   req/s by users")
+    for run in runs:
+        memory, rps = run["memory"], "  ".join(f"{level['users']}:{level['rps']}" for level in run["levels"])
+        if memory:
+            per_worker = {k: round(sum(w[k] for w in memory["workers"]) / len(memory["workers"]), 1) for k in ("rss_mib", "pss_mib", "private_mib")}
+            print(f"  {run['workers']:>7} {run['mode']:>8} {per_worker['rss_mib']:>7} MiB {per_worker['pss_mib']:>7} MiB {per_worker['private_mib']:>11} MiB {memory['total_pss_mib']:>6} MiB   {rps}")
+        else:
+            print(f"  {run['workers']:>7} {run['mode']:>8} {'-':>11} {'-':>11} {'-':>15} {'-':>10}   {rps}")
+
+def run_server(args, workers: int, corpus_dir: str) -> dict:
+    server, base_url = None, args.url
+    if not base_url:
+        port = free_port()
+        server, base_url = start_server(port, workers, args.mode, corpus_dir), f"http://127.0.0.1:{port}"
+    try:
+        graph = asyncio.run(load_graph(base_url))
+        print(f"{base_url}: {len(graph['nodes'])} nodes, {workers if server else '?'} workers ({args.mode if server else 'external'})")
+        if args.warmup: asyncio.run(run_level(base_url, graph, 1, args.warmup, args.chain, 0, args.seed))
+        levels = []
+        for users in (int(c) for c in args.concurrency.split(",") if c):
+            levels.append(asyncio.run(run_level(base_url, graph, users, args.duration, args.chain, args.think, args.seed)))
+            print_level(levels[-1])
+        # Measured after the load, with every worker's caches filled.
+        memory = server_memory(server.pid) if server else None
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+    return {"url": base_url, "workers": workers, "mode": args.mode, "memory": memory, "levels": levels}
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load test the app with simulated browsing sessions at increasing concurrency.")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="virtual users per level, comma-separated")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per level")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of single-user traffic before measuring")
+    parser.add_argument("--chain", type=int, default=5, help="modals opened per session")
+    parser.add_argument("--think", type=float, default=0, help="mean think time between requests, seconds")
+    parser.add_argument("--workers", default="1", help="worker counts for the local server, comma-separated; each gets a run")
+    parser.add_argument("--mode", choices=("prefork", "uvicorn"), default="prefork",
+                        help="start the server with `app.py serve` (data loaded once, shared) or `uvicorn --workers` (loaded per worker)")
+    parser.add_argument("--synthetic", type=int, metavar="NODES", help="serve a synthetic book of this many nodes instead of the corpus")
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        if args.synthetic:
+            from bench import synthetic_book
+            with open(os.path.join(corpus_dir, "S.json"), "w", encoding="utf-8") as f: json.dump(synthetic_book(args.synthetic), f, ensure_ascii=False)
+        runs = [run_server(args, workers, corpus_dir if args.synthetic else None) for workers in ([None] if args.url else (int(w) for w in args.workers.split(",") if w))]
+    print_scaling(runs)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"duration": args.duration, "chain": args.chain, "think": args.think, "synthetic": args.synthetic, "runs": runs}, f, indent=1)
+        print(f"Wrote '{args.output}'")
+    return 1 if any(level["errors"] for run in runs for level in run["levels"]) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
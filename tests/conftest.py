@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+
+import pytest
+from starlette.testclient import TestClient
+
+import app
+import bench
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "corpus")
+
+def serve(corpus_dir: str = CORPUS_DIR, db_file: str = None) -> TestClient:
+    # Point the app at a corpus (or a SQLite store) and start from empty caches.
+    app.CORPUS_DIR, app.DATA_FILE, app.DB_FILE = corpus_dir, None, db_file
+    app._CORPUS = None
+    app.clear_response_caches()
+    app.PATH_CACHE.clear()
+    return TestClient(app.app)
+
+def build_sqlite(corpus_dir: str, db_file: str) -> str:
+    app.CORPUS_DIR, app.DATA_FILE, app.DB_FILE = corpus_dir, None, None
+    app.write_sqlite_store(app.load_json_corpus(), db_file)
+    return db_file
+
+@pytest.fixture(autouse=True)
+def restore_corpus():
+    saved = app.CORPUS_DIR, app.DATA_FILE, app.DB_FILE
+    yield
+    app.CORPUS_DIR, app.DATA_FILE, app.DB_FILE = saved
+    app._CORPUS = None
+    app.clear_response_caches()
+    app.PATH_CACHE.clear()
+
+@pytest.fixture
+def client() -> TestClient:
+    return serve()
+
+@pytest.fixture
+def book_dir(tmp_path) -> str:
+    # A copy of the corpus, free to be edited or compiled into snapshots.
+    corpus_dir = tmp_path / "corpus"
+    shutil.copytree(CORPUS_DIR, corpus_dir)
+    return str(corpus_dir)
+
+@pytest.fixture
+def two_books(tmp_path) -> str:
+    # Book I plus a synthetic book II whose propositions also cite Book I.
+    corpus_dir = tmp_path / "two_books"
+    corpus_dir.mkdir()
+    shutil.copy(os.path.join(CORPUS_DIR, "I.json"), corpus_dir / "I.json")
+    book = bench.synthetic_book(60, seed=1, book="II")
+    targets = [v["normalized_key"] for v in book["vertices"] if v["type"] == "PROPOSITION"]
+    book["edges"] += [{"source": f"I_Prop_{1 + i * 3}", "target": target, "type": "citation"} for i, target in enumerate(targets[::5])]
+    (corpus_dir / "II.json").write_text(json.dumps(book, ensure_ascii=False), encoding="utf-8")
+    (corpus_dir / "index.json").write_text(json.dumps({"books": [{"id": "I", "title": "Livre I"}, {"id": "II", "title": "Livre II"}]}), encoding="utf-8")
+    return str(corpus_dir)
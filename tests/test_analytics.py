@@ -0,0 +1,35 @@
+import networkx as nx
+import pytest
+
+import app
+import bench
+from conftest import build_sqlite, serve
+
+def assert_matches_networkx(graph: nx.DiGraph) -> None:
+    analytics = app.compute_analytics(graph, app.calculate_node_levels(graph))
+    keys = list(graph.nodes())
+    # Rank flows from each node to its premises: networkx's PageRank on the reversed graph, in
+    # its pure Python form since nx.pagerank needs scipy.
+    pagerank = nx.algorithms.link_analysis.pagerank_alg._pagerank_python(graph.reverse(), tol=1e-12)
+    assert analytics["pagerank"] == pytest.approx([pagerank[k] for k in keys], rel=1e-6)
+    betweenness = nx.betweenness_centrality(graph)
+    assert analytics["betweenness"] == pytest.approx([betweenness[k] for k in keys], abs=1e-12)
+    assert list(analytics["premises"]) == [len(nx.ancestors(graph, k)) for k in keys]
+    assert list(analytics["fan_in"]) == [graph.in_degree(k) for k in keys]
+    assert list(analytics["fan_out"]) == [graph.out_degree(k) for k in keys]
+    longest = {}
+    for k in nx.topological_sort(graph): longest[k] = max((longest[u] + 1 for u in graph.pred[k]), default=0)
+    assert list(analytics["depth"]) == [longest[k] for k in keys]
+
+def test_analytics_match_networkx_on_the_corpus():
+    assert_matches_networkx(app.corpus().book().graph)
+
+def test_analytics_match_networkx_on_a_synthetic_book():
+    data = bench.synthetic_book(400, seed=3)
+    assert_matches_networkx(app.create_graph_from_data(data["vertices"], data["edges"]))
+
+def test_backends_serve_the_same_metrics(two_books, tmp_path):
+    urls = ["/api/analytics?book=I", "/api/analytics?book=II", "/api/node/I_Prop_1", "/api/node/I_Prop_36", "/api/node/II_Prop_5"]
+    metrics = lambda client: [client.get(url).json().get("nodes") or client.get(url).json()["metrics"] for url in urls]
+    expected = metrics(serve(two_books))
+    assert metrics(serve(db_file=build_sqlite(two_books, str(tmp_path / "corpus.db")))) == expected
@@ -0,0 +1,60 @@
+import json
+import re
+
+import networkx as nx
+
+import app
+
+def test_pinned_urls_are_immutable(client):
+    graph = client.get("/api/graph")
+    version = graph.json()["version"]
+    assert graph.headers["cache-control"] == app.API_CACHE_CONTROL
+    pinned = client.get(f"/api/graph?v={version}")
+    assert pinned.headers["cache-control"] == app.API_IMMUTABLE_CACHE_CONTROL
+    assert f"v={version}" in client.get("/").text
+
+def test_version_covers_data_and_code(client, monkeypatch):
+    data = app.corpus().book()
+    version = data.version
+    assert version and version != data.source_hash[:16]
+    monkeypatch.setattr(app, "CODE_VERSION", "other code")
+    assert data.version != version
+    assert app.data_version(data.source_hash) == data.version
+
+def test_node_payload(client):
+    node = client.get("/api/node/I_Prop_36?lang=latin_text").json()
+    assert node["key"] == "I_Prop_36" and node["premises"] == ["I_Prop_16", "I_Prop_34"]
+    assert set(node["metrics"]) == set(app.ANALYTICS_METRICS)
+    texts = client.get("/api/texts?keys=I_Prop_36,I_Def_3@english_text&demonstrations=I_Prop_36&lang=latin_text").json()
+    assert json.dumps(texts, ensure_ascii=False).count("Q.E.D.") >= 1
+
+def test_texts_do_not_evict_pages(client):
+    client.get("/local_view/I_Prop_36")
+    cached = len(app.RESPONSE_CACHE)
+    for i in range(1, 30): client.get(f"/api/texts?keys=I_Prop_{i},I_Prop_{i + 1}")
+    assert len(app.RESPONSE_CACHE) == cached
+    assert len(app.TEXTS_CACHE) == 29
+
+def test_impact_and_paths_follow_the_citations(client):
+    graph = app.corpus().book().graph
+    impact = client.get("/api/impact/I_Prop_1").json()["elements"]
+    assert {e["data"]["id"] for e in impact if "source" not in e["data"]} == nx.descendants(graph, "I_Prop_1") | {"I_Prop_1"}
+    for source in ("I_Def_1", "I_Def_3", "I_Def_6", "I_Prop_1", "I_Prop_16"):
+        path = client.get(f"/api/path/{source}/I_Prop_36").json()["path"]
+        assert path[0] == source and path[-1] == "I_Prop_36"
+        assert all(graph.has_edge(u, v) for u, v in zip(path, path[1:]))
+        assert len(path) == nx.shortest_path_length(graph, source, "I_Prop_36") + 1
+    # Either node may be given first; the path always runs from the premise to the conclusion.
+    assert client.get("/api/path/I_Prop_36/I_Def_1").json()["path"] == client.get("/api/path/I_Def_1/I_Prop_36").json()["path"]
+    assert client.get("/api/path/I_Ax_1/I_Prop_36").status_code == 404
+
+def test_local_views_load_tooltip_texts_on_demand(client):
+    visual = client.get("/local_view/visual/I_Prop_36?lang=latin_text").text
+    elements = client.get("/api/subgraph/I_Prop_36").json()["elements"]
+    nodes = app.corpus().book().nodes
+    assert not any(nodes[e["data"]["id"]].get_text("latin_text")[:40] in visual for e in elements if "source" not in e["data"])
+    assert not any("text" in e["data"] for e in elements)
+    texts_url = re.search(r'data-texts-url="([^"]+)"', visual).group(1).replace("&amp;", "&")
+    texts = client.get(f"{texts_url}&keys=I_Def_6,I_Prop_16&demonstrations=I_Prop_16").json()["texts"]
+    assert texts["I_Def_6"]["latin_text"] == {"text": nodes["I_Def_6"].get_text("latin_text")}
+    assert texts["I_Prop_16"]["latin_text"]["demonstration"] == nodes["I_Prop_16"].get_demonstration("latin_text")
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+import threading
+
+import app
+from conftest import build_sqlite, serve
+
+URLS = ["/", "/book/I", "/api/graph", "/api/analytics", "/api/node/I_Def_1", "/api/node/I_Prop_33?lang=latin_text", "/api/subgraph/I_Prop_36",
+        "/api/texts?keys=I_Prop_1,I_Def_3@latin_text&demonstrations=I_Prop_1", "/api/texts?keys=I_Prop_36&book=I&scope=impact",
+        "/local_view/I_Prop_36", "/local_view/visual/I_Prop_36?lang=latin_text", "/local_view/textual/I_Prop_33?depth=2",
+        "/local_view/proof_tree/I_Prop_28", "/update_modal_language/I_Prop_36?lang=english_text", "/local_view/Nope", "/api/node/Nope",
+        "/impact/I_Def_3", "/impact/textual/I_Def_1?depth=2", "/api/impact/I_Prop_36", "/path/I_Def_1/I_Prop_36",
+        "/path/textual/I_Def_1/I_Prop_36", "/api/path/I_Def_3/I_Prop_36", "/api/path/I_Def_2/I_Def_3", "/search?q=substance", "/api/search?q=Deum"]
+
+def responses(client, urls) -> dict:
+    return {url: (r.status_code, r.text) for url in urls for r in [client.get(url)]}
+
+def test_snapshot_serves_what_the_json_builds(book_dir):
+    expected = responses(serve(book_dir), URLS)
+    subprocess.run([sys.executable, os.path.abspath(app.__file__), "snapshot"], check=True, capture_output=True, env={**os.environ, "ETHICS_CORPUS_DIR": book_dir})
+    assert os.path.exists(os.path.join(book_dir, "I.snapshot"))
+    assert responses(serve(book_dir), URLS) == expected
+
+def test_sqlite_serves_what_the_json_builds(book_dir, tmp_path):
+    expected = responses(serve(book_dir), URLS)
+    assert responses(serve(db_file=build_sqlite(book_dir, str(tmp_path / "corpus.db"))), URLS) == expected
+
+def test_sqlite_is_only_queried_in_the_render_pool(book_dir, tmp_path, monkeypatch):
+    client = serve(db_file=build_sqlite(book_dir, str(tmp_path / "corpus.db")))
+    app.corpus()
+    threads, query = set(), app.SqliteStore.q
+    monkeypatch.setattr(app.SqliteStore, "q", lambda self, sql, params=(): threads.add(threading.current_thread().name) or query(self, sql, params))
+    for _ in range(2): responses(client, URLS)
+    assert threads and all(name.startswith("render") for name in threads)
@@ -0,0 +1,20 @@
+import json
+import subprocess
+import sys
+
+import bench
+
+def test_bench_records_and_compares_results(tmp_path, capsys):
+    out = tmp_path / "bench.json"
+    subprocess.run([sys.executable, bench.__file__, "--sizes", "50", "--no-book", "--repeat", "1", "--budget", "0", "-o", str(out)],
+                   check=True, capture_output=True, cwd=tmp_path)
+    results = json.loads(out.read_text())
+    entries = results["datasets"]["synthetic-50"]
+    assert {"load", "calculate_node_levels", "AncestorIndex", "warm /api/graph"} <= set(entries)
+    assert bench.compare(results, results, 1.25) == 0
+    # Against a baseline twice as fast, every entry slow enough to be above the noise floor regresses.
+    slow = {label for label, entry in entries.items() if entry.get("min_ms", 0) > 1}
+    faster = {"datasets": {"synthetic-50": {label: dict(entry, min_ms=entry["min_ms"] / 2) for label, entry in entries.items() if label in slow}}}
+    capsys.readouterr()
+    assert bench.compare(results, faster, 1.25) == 1
+    assert capsys.readouterr().out.count("REGRESSION") == len(slow) > 0
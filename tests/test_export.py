@@ -0,0 +1,46 @@
+import json
+import os
+import re
+
+import networkx as nx
+
+import app
+import bench
+from conftest import serve
+
+def linked_files(out_dir: str, page: str) -> list:
+    with open(app.static_file(out_dir, page), encoding="utf-8") as f: html = f.read()
+    return re.findall(r'"(/(?:api|assets)/[^"?]+)"', html)
+
+def test_export_writes_every_view_and_reuses_unchanged_nodes(tmp_path):
+    corpus_dir, out_dir = tmp_path / "corpus", str(tmp_path / "site")
+    corpus_dir.mkdir()
+    book = bench.synthetic_book(20, seed=6)
+    (corpus_dir / "S.json").write_text(json.dumps(book, ensure_ascii=False), encoding="utf-8")
+    serve(str(corpus_dir))
+    stats = app.export_static(out_dir)
+    assert stats == {"rendered": 20, "unchanged": 0, "files": stats["files"], "removed": 0}
+    with open(os.path.join(out_dir, app.STATIC_MANIFEST), encoding="utf-8") as f: manifest = json.load(f)
+    assert len(manifest["nodes"]) == 20
+    written = {url for entry in (*manifest["books"].values(), *manifest["nodes"].values()) for url in entry["files"]} | set(manifest["assets"])
+    assert all(os.path.exists(app.static_file(out_dir, url)) for url in written)
+    # Pages link the hashed JSON and assets they need, never the live API.
+    links = linked_files(out_dir, "/")
+    assert any(url.startswith("/api/graph/") for url in links) and all(url in written for url in links)
+    assert any(url.startswith("/local_view/textual/S_Prop_10/") for url in manifest["nodes"]["S_Prop_10"]["files"])
+
+    assert app.export_static(out_dir, incremental=True)["unchanged"] == 20
+    # An edited node is exported again with every node whose ancestry or impact holds it, and so
+    # are the premises of a removed one, whose files are deleted.
+    graph = app.create_graph_from_data(book["vertices"], book["edges"])
+    edited, removed = book["vertices"][12]["normalized_key"], book["vertices"].pop()["normalized_key"]
+    book["vertices"][12]["texts"]["latin_text"] = "Nova propositio."
+    book["edges"] = [e for e in book["edges"] if removed not in (e["source"], e["target"])]
+    (corpus_dir / "S.json").write_text(json.dumps(book, ensure_ascii=False), encoding="utf-8")
+    serve(str(corpus_dir))
+    stats = app.export_static(out_dir, incremental=True)
+    changed = nx.ancestors(graph, edited) | nx.descendants(graph, edited) | {edited} | nx.ancestors(graph, removed)
+    assert stats["rendered"] == len(changed - {removed}) and stats["unchanged"] == 19 - stats["rendered"]
+    # Along with the hashed JSON the changed nodes no longer use.
+    assert stats["removed"] > len(manifest["nodes"][removed]["files"])
+    assert not any(os.path.exists(app.static_file(out_dir, url)) for url in manifest["nodes"][removed]["files"])
@@ -0,0 +1,70 @@
+import pickle
+
+import networkx as nx
+import pytest
+
+import app
+import bench
+
+def synthetic_graph(n: int, seed: int, cycles: int = 0) -> nx.DiGraph:
+    data = bench.synthetic_book(n, seed=seed)
+    graph = app.create_graph_from_data(data["vertices"], data["edges"])
+    # Citations back to earlier propositions close cycles through the later ones.
+    props = [v["normalized_key"] for v in data["vertices"] if v["type"] == "PROPOSITION"]
+    for i in range(cycles): graph.add_edge(props[-1 - 7 * i], props[len(props) // 2 + 3 * i])
+    return graph
+
+@pytest.mark.parametrize("dense_limit", [10 ** 6, 0])
+@pytest.mark.parametrize("cycles", [0, 3])
+def test_ancestor_index_matches_networkx(dense_limit, cycles):
+    graph = synthetic_graph(300, seed=4, cycles=cycles)
+    index = app.AncestorIndex(graph, dense_limit)
+    assert index.dense == bool(dense_limit)
+    for key in graph:
+        ancestors = nx.ancestors(graph, key)
+        assert set(index.ancestors(key)) == ancestors
+        subgraph = index.subgraph(key)
+        assert set(subgraph.nodes()) == ancestors | {key}
+        assert sorted(subgraph.edges()) == sorted(graph.subgraph(ancestors | {key}).edges())
+    assert index.ancestors("Nope") == [] and len(index.subgraph("Nope")) == 0
+
+def peeled_levels(graph: nx.DiGraph) -> dict:
+    # The original computation: strip the roots off a copy of the graph, one level at a time.
+    g_copy, levels, current_level = graph.copy(), {}, 0
+    while g_copy.nodes():
+        roots = [n for n, d in g_copy.in_degree() if d == 0]
+        for node in roots: levels[node] = current_level
+        g_copy.remove_nodes_from(roots)
+        current_level += 1
+    return levels
+
+def test_levels_match_root_peeling():
+    for graph in (app.corpus().book().graph, synthetic_graph(500, seed=5)):
+        assert app.calculate_node_levels(graph) == peeled_levels(graph)
+
+def test_cycle_members_share_a_level():
+    graph = synthetic_graph(300, seed=4, cycles=3)
+    levels = app.calculate_node_levels(graph)
+    assert set(levels) == set(graph)
+    for scc in nx.strongly_connected_components(graph):
+        assert len({levels[k] for k in scc}) == 1
+    assert all(levels[u] < levels[v] for u, v in graph.edges() if not nx.has_path(graph, v, u))
+
+def test_node_store_answers_like_the_node_attributes():
+    # resolve_text and resolve_demonstration are the original NodeData lookups, kept verbatim.
+    graph = app.corpus().book().graph
+    odd = {"normalized_key": "X_1", "type": "AXIOME", "texts": {"french_text": "", "'english_text'": "e"},
+           "components": [{"type": "SCHOLIUM", "texts": {"latin_text": "s"}}, {"type": "DEMONSTRATION", "texts": {"latin_text": "d"}}]}
+    graph = nx.DiGraph(graph)
+    graph.add_node("X_1", **odd)
+    nodes = app.build_node_store(graph)
+    for key, attrs in graph.nodes(data=True):
+        node = nodes[key]
+        for lang in ("french_text", "english_text", "latin_text", "german_text", None):
+            assert node.get_text(lang) == app.resolve_text(attrs.get("texts", {}), lang)
+            assert node.get_demonstration(lang) == app.resolve_demonstration(attrs.get("components", []), lang)
+    assert nodes["X_1"].color_class == "node-axiom" and nodes["X_1"].get_text("english_text") == "e" and nodes["X_1"].get_demonstration("french_text") == "d"
+    assert not hasattr(nodes["X_1"], "__dict__")
+    with pytest.raises(AttributeError): nodes["X_1"].type = "DEFINITION"
+    restored = pickle.loads(pickle.dumps(nodes["I_Prop_36"]))
+    assert [getattr(restored, slot) for slot in app.NodeData.__slots__] == [getattr(nodes["I_Prop_36"], slot) for slot in app.NodeData.__slots__]
@@ -0,0 +1,18 @@
+import json
+import subprocess
+import sys
+
+import loadtest
+
+def test_loadtest_reports_percentiles_per_route(tmp_path):
+    out = tmp_path / "load.json"
+    subprocess.run([sys.executable, loadtest.__file__, "--concurrency", "2", "--duration", "1", "--warmup", "0", "-o", str(out)],
+                   check=True, capture_output=True, cwd=tmp_path, timeout=120)
+    run = json.loads(out.read_text())["runs"][0]
+    assert run["workers"] == 1 and run["memory"]["workers"]
+    level = run["levels"][0]
+    assert level["users"] == 2 and level["requests"] > 0 and level["errors"] == 0
+    assert {"/", "/api/graph", "/local_view/{node}"} <= set(level["routes"])
+    for route in level["routes"].values():
+        assert route["p50_ms"] <= route["p95_ms"] <= route["p99_ms"] <= route["max_ms"]
+    assert sum(route["requests"] for route in level["routes"].values()) == level["requests"]
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+import app
+import bench
+from conftest import build_sqlite, serve
+
+@pytest.fixture
+def large_book(tmp_path, monkeypatch) -> str:
+    # A 600-node book with the level of detail switched on at 100 nodes, in clusters of 50.
+    monkeypatch.setattr(app, "MAIN_VIEW_LOD_THRESHOLD", 100)
+    monkeypatch.setattr(app, "LOD_CLUSTER_MAX", 50)
+    corpus_dir = tmp_path / "large"
+    corpus_dir.mkdir()
+    (corpus_dir / "S.json").write_text(json.dumps(bench.synthetic_book(600, seed=2), ensure_ascii=False), encoding="utf-8")
+    return str(corpus_dir)
+
+def test_clusters_partition_the_book_by_band_and_type(large_book):
+    serve(large_book)
+    data = app.corpus().book()
+    members = [k for cluster in data.clusters.values() for k in cluster]
+    assert sorted(members) == sorted(data.own_keys)
+    band_levels = {}
+    for cluster_id, keys in data.clusters.items():
+        assert 0 < len(keys) <= app.LOD_CLUSTER_MAX
+        assert len({data.nodes[k].type for k in keys}) == 1
+        band_levels.setdefault(int(cluster_id.split("-")[1]), set()).update(data.levels[k] for k in keys)
+    bands = [band_levels[band] for band in sorted(band_levels)]
+    assert all(max(low) < min(high) for low, high in zip(bands, bands[1:]))
+
+def test_large_books_start_from_the_cluster_overview(large_book):
+    client = serve(large_book)
+    graph = client.get("/api/graph").json()
+    assert graph["lod"]["budget"] == app.LOD_CLIENT_NODES
+    clusters = {e["data"]["id"]: e["data"]["count"] for e in graph["elements"] if e["data"].get("cluster")}
+    assert sum(clusters.values()) == 600
+    assert all(e["data"]["source"] in clusters and e["data"]["target"] in clusters for e in graph["elements"] if "source" in e["data"])
+    cluster_id = next(iter(clusters))
+    cluster = client.get(graph["lod"]["cluster_url"].replace("{cluster}", cluster_id)).json()
+    nodes = [e["data"]["id"] for e in cluster["elements"] if "source" not in e["data"]]
+    assert len(nodes) == clusters[cluster_id]
+    edges = [e["data"] for e in cluster["elements"] if "source" in e["data"]]
+    assert edges and all(cluster_id in (e["source_cluster"], e["target_cluster"]) for e in edges)
+    assert client.get("/api/cluster/cluster-99-nope-0").status_code == 404
+
+def test_backends_serve_the_same_clusters(large_book, tmp_path):
+    urls = ["/api/graph", "/api/cluster/cluster-0-definition-0", "/api/cluster/cluster-3-proposition-0", "/api/cluster/cluster-99-nope-0"]
+    expected = {url: (r.status_code, r.json()) for url in urls for r in [serve(large_book).get(url)]}
+    assert [status for status, _ in expected.values()] == [200, 200, 200, 404]
+    client = serve(db_file=build_sqlite(large_book, str(tmp_path / "large.db")))
+    assert {url: (r.status_code, r.json()) for url in urls for r in [client.get(url)]} == expected
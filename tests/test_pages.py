@@ -0,0 +1,95 @@
+import pytest
+
+import app
+
+def test_main_page_is_an_html_document(client):
+    r = client.get("/", headers={"accept-encoding": "identity"})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/html")
+    body = r.text.lstrip()
+    assert body.lower().startswith("<!doctype html>")
+    assert "<body>" in body and 'class="main-view"' in body and "<h1>" in body
+    assert "main((" not in body and "h1((" not in body
+
+def test_main_page_is_compressed_and_revalidated(client):
+    identity = client.get("/", headers={"accept-encoding": "identity"})
+    for coding in ("gzip", "br"):
+        # The test client decodes the body, so it must come back as the identity one.
+        r = client.get("/", headers={"accept-encoding": coding})
+        assert r.headers["content-encoding"] == coding
+        assert r.content == identity.content
+        assert client.get("/", headers={"accept-encoding": coding, "if-none-match": r.headers["etag"]}).status_code == 304
+    assert client.get("/", headers={"accept-encoding": "identity", "if-none-match": '"stale"'}).status_code == 200
+
+def test_fragments_are_cached_per_graph_version(client):
+    url = "/local_view/textual/I_Prop_36?lang=latin_text"
+    first = client.get(url)
+    assert first.status_code == 200 and 'id="textual-container-I_Prop_36-latin_text"' in first.text
+    assert len(app.RESPONSE_CACHE) > 0
+    assert client.get(url).content == first.content
+    app.RESPONSE_CACHE.clear()
+    assert client.get(url).content == first.content
+
+def test_unknown_node(client):
+    assert "not found" in client.get("/local_view/Nope").text.lower()
+    assert client.get("/api/node/Nope").status_code == 404
+
+def test_profile_token_is_read_from_the_header_only(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(app, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(app, "PROFILE_DIR", str(tmp_path))
+    assert "x-profile-file" not in client.get("/local_view/I_Prop_36?profile=secret").headers
+    assert "x-profile-file" not in client.get("/local_view/I_Prop_36", headers={"x-profile": "wrong"}).headers
+    saved = client.get("/local_view/I_Prop_36", headers={"x-profile": "secret"})
+    assert saved.status_code == 200 and (tmp_path / saved.headers["x-profile-file"]).exists()
+    inline = client.get("/local_view/I_Prop_35", headers={"x-profile": "secret", "x-profile-mode": "inline"})
+    assert inline.text.startswith("GET /local_view/I_Prop_35;") and "<div" not in inline.text
+
+def test_assets_match_before_the_static_catch_all(client):
+    r = client.get(app.asset_url("app.js"))
+    assert r.status_code == 200 and r.headers["cache-control"] == app.ASSET_CACHE_CONTROL
+    assert client.get("/assets/app.000000000000.js").status_code == 404
+
+def test_vendored_libraries_are_checked_against_their_pins(tmp_path, monkeypatch):
+    (tmp_path / "vendor").mkdir()
+    (tmp_path / "vendor" / "htmx.min.js").write_bytes(b"htmx")
+    url = app.VENDOR_LIBS["htmx.min.js"][0]
+    monkeypatch.setitem(app.VENDOR_LIBS, "htmx.min.js", (url, app.integrity(b"htmx")))
+    assert "vendor/htmx.min.js" in app.scan_assets(str(tmp_path))[0]
+    monkeypatch.setitem(app.VENDOR_LIBS, "htmx.min.js", (url, app.integrity(b"other")))
+    urls, _ = app.scan_assets(str(tmp_path))
+    assert "vendor/htmx.min.js" not in urls
+    monkeypatch.setattr(app, "ASSET_URLS", urls)
+    assert app.asset_url("vendor/htmx.min.js") == url
+    assert app.vendor_integrity("htmx.min.js") == {"integrity": app.integrity(b"other"), "crossorigin": "anonymous"}
+
+def test_vendor_refuses_downloads_that_do_not_match_their_pins(tmp_path, monkeypatch):
+    import io
+    import urllib.request
+    monkeypatch.setattr(app, "ASSETS_DIR", str(tmp_path))
+    monkeypatch.setattr(app, "VENDOR_LIBS", {"a.js": ("https://cdn.test/a.js", app.integrity(b"a")), "b.js": ("https://cdn.test/b.js", app.integrity(b"b"))})
+    monkeypatch.setattr(urllib.request, "urlopen", lambda url, timeout: io.BytesIO(b"a"))
+    assert app.vendor_command() == 1
+    assert (tmp_path / "vendor" / "a.js").read_bytes() == b"a"
+    assert not (tmp_path / "vendor" / "b.js").exists()
+
+def test_requests_are_timed_by_phase_and_route(client, monkeypatch):
+    monkeypatch.setattr(app, "METRICS", app.Metrics())
+    first = client.get("/local_view/textual/I_Prop_36").headers["server-timing"]
+    assert {"load", "render", "total"} <= {timing.split(";")[0] for timing in first.split(", ")}
+    assert "render" not in client.get("/local_view/textual/I_Prop_36").headers["server-timing"]
+    client.get("/local_view/textual/I_Prop_35")
+    metrics = client.get("/metrics").text
+    assert 'ethics_requests_total{route="/local_view/textual/{node_key}",method="GET",status="200"} 3' in metrics
+    assert 'ethics_request_duration_seconds_count{route="/local_view/textual/{node_key}"} 3' in metrics
+    assert 'ethics_request_phase_seconds_total{route="/local_view/textual/{node_key}",phase="render"}' in metrics
+
+def test_assets_are_served_when_the_render_pool_is_full(client, monkeypatch):
+    monkeypatch.setattr(app.RENDER_POOL, "limit", 0)
+    assert client.get("/local_view/textual/I_Prop_36").status_code == 503
+    assert client.get(app.asset_url("app.css")).status_code == 200
+
+def test_missing_vendored_libraries_are_reported(monkeypatch, capsys):
+    monkeypatch.setattr(app, "ASSET_URLS", {k: v for k, v in app.ASSET_URLS.items() if k != "vendor/htmx.min.js"})
+    app.check_vendored()
+    assert "htmx.min.js" in capsys.readouterr().out
+    monkeypatch.setattr(app, "VENDORED_ONLY", True)
+    with pytest.raises(RuntimeError, match="htmx.min.js"): app.check_vendored()
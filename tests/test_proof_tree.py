@@ -0,0 +1,28 @@
+import re
+
+import networkx as nx
+
+import app
+
+def tree_nodes(html: str) -> tuple:
+    return re.findall(r'data-proof-key="([^"]+)"', html), re.findall(r'data-ref="([^"]+)"', html)
+
+def test_proof_tree_draws_each_premise_once(client):
+    graph = app.corpus().book().graph
+    for url, key, edges in (("/local_view/proof_tree/I_Prop_36", "I_Prop_36", graph.subgraph(nx.ancestors(graph, "I_Prop_36") | {"I_Prop_36"}).edges()),
+                            ("/impact/tree/I_Prop_1", "I_Prop_1", graph.subgraph(nx.descendants(graph, "I_Prop_1") | {"I_Prop_1"}).edges())):
+        drawn, refs = tree_nodes(client.get(url, params={"lang": "latin_text"}).text)
+        assert sorted(drawn) == sorted(set(drawn)) and set(drawn) == {k for edge in edges for k in edge}
+        # Every citation is one child: the premise's subtree the first time, a back-reference after.
+        assert len(drawn) - 1 + len(refs) == len(edges)
+        assert drawn[-1] == key and set(refs) <= set(drawn)
+
+def test_depth_limited_trees_leave_expandable_stubs(client):
+    tree = client.get("/local_view/proof_tree/I_Prop_36", params={"lang": "latin_text", "depth": 2}).text
+    drawn, _ = tree_nodes(tree)
+    stubs = re.findall(r'hx-get="/local_view/proof_tree/([^"?]+)\?lang=latin_text&amp;depth=2"', tree)
+    assert stubs and set(stubs) <= set(drawn)
+    levels = {key: len(nx.shortest_path(app.corpus().book().graph.reverse(), "I_Prop_36", key)) - 1 for key in drawn}
+    assert max(levels.values()) == 2 and all(levels[key] == 2 for key in stubs)
+    expanded, _ = tree_nodes(client.get(f"/local_view/proof_tree/{stubs[0]}", params={"lang": "latin_text", "depth": 2}).text)
+    assert expanded[-1] == stubs[0] and len(expanded) > 1
@@ -0,0 +1,27 @@
+import os
+import shutil
+
+import pytest
+
+import app
+from conftest import serve
+
+def test_reload_keeps_the_old_corpus_when_a_book_fails(book_dir):
+    client = serve(book_dir)
+    graph = client.get("/api/graph").json()
+    served = app._CORPUS
+    with open(os.path.join(book_dir, "I.json"), "w", encoding="utf-8") as f: f.write('{"vertices": [')
+    with pytest.raises(ValueError): app.reload_corpus()
+    assert app._CORPUS is served
+    assert client.get("/api/graph").json() == graph
+
+def test_failed_loads_are_not_cached(book_dir):
+    book_file = os.path.join(book_dir, "I.json")
+    shutil.copy(book_file, f"{book_file}.bak")
+    with open(book_file, "w", encoding="utf-8") as f: f.write("not json")
+    client = serve(book_dir)
+    assert client.get("/api/node/I_Prop_36").status_code == 404
+    assert app.corpus().loaded_books() == []
+    os.replace(f"{book_file}.bak", book_file)
+    assert client.get("/api/node/I_Prop_36").status_code == 200
+    assert app.corpus().loaded_books() == ["I"]
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import app
+
+def occupy(pool: app.RenderPool) -> tuple:
+    # Runs a job that holds a render thread until the returned event is set.
+    release, started = threading.Event(), threading.Event()
+    def job():
+        started.set()
+        release.wait(10)
+    thread = threading.Thread(target=asyncio.run, args=(pool.run(job),))
+    thread.start()
+    started.wait(10)
+    return release, thread
+
+def test_a_full_pool_answers_503_but_still_serves_cached_pages(client, monkeypatch):
+    monkeypatch.setattr(app, "RENDER_POOL", app.RenderPool(1, 0))
+    cached = client.get("/local_view/textual/I_Prop_36")
+    release, thread = occupy(app.RENDER_POOL)
+    try:
+        busy = client.get("/local_view/textual/I_Prop_35")
+        assert busy.status_code == 503 and busy.headers["retry-after"] == str(app.RENDER_RETRY_AFTER)
+        assert client.get("/local_view/textual/I_Prop_36").content == cached.content
+        assert client.get(app.asset_url("app.js")).status_code == 200
+        assert app.RENDER_POOL.rejected == 1
+    finally:
+        release.set()
+        thread.join()
+    assert app.RENDER_POOL.pending == 0
+    assert client.get("/local_view/textual/I_Prop_35").status_code == 200
+
+def test_cancelled_requests_count_until_their_job_finishes():
+    pool, release, started = app.RenderPool(1, 0), threading.Event(), threading.Event()
+    def job():
+        started.set()
+        release.wait(10)
+
+    async def cancel():
+        task = asyncio.ensure_future(pool.run(job))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+        task.cancel()
+        await asyncio.sleep(0)
+        assert pool.pending == 1
+        release.set()
+        while pool.pending: await asyncio.sleep(0.01)
+    asyncio.run(cancel())
+
+def test_concurrent_misses_share_one_render():
+    pool, release, calls = app.RenderPool(4, 0), threading.Event(), []
+    def render(name):
+        calls.append(name)
+        release.wait(10)
+        return name
+
+    async def misses():
+        requests = [asyncio.ensure_future(pool.run(render, "first", key="same")) for _ in range(3)]
+        other = asyncio.ensure_future(pool.run(render, "other", key="other"))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*requests, other)
+    assert asyncio.run(misses()) == ["first", "first", "first", "other"]
+    assert sorted(calls) == ["first", "other"] and pool.pending == 0 and pool.inflight == {}
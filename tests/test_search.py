@@ -0,0 +1,49 @@
+import app
+from conftest import serve
+
+def latin(word: str) -> str:
+    return app.stem(app.fold(word), "latin_text")
+
+def test_latin_stems():
+    assert {latin(w) for w in ("Deus", "Dei", "Deo", "Deum")} == {"deus"}
+    assert {latin(w) for w in ("mentis", "mente", "mentem")} == {"ment"}
+    assert latin("causae") == latin("causa") == latin("causam")
+    assert latin("Jus") == latin("ius")
+    assert all(len(latin(w)) >= app.LATIN_MIN_STEM for w in ("deum", "rem", "suum", "idea", "mentis", "nisi"))
+
+def test_latin_stopwords_are_not_indexed():
+    assert latin("de") == latin("et") == latin("sive") == ""
+    data = app.corpus().book()
+    assert not any(term.endswith(":") for term in data.search_index.postings)
+    assert data.search("de", "latin_text", 20) == []
+
+def search(client, query: str, lang: str = "latin_text") -> list:
+    return client.get("/api/search", params={"q": query, "lang": lang}).json()["hits"]
+
+def test_search_ranks_by_matched_words_then_score(client):
+    hits = search(client, "causam sui")
+    assert hits[0]["key"] == "I_Def_1"
+    assert [h["matched"] for h in hits] == sorted((h["matched"] for h in hits), reverse=True)
+    for matched in {h["matched"] for h in hits}:
+        scores = [h["score"] for h in hits if h["matched"] == matched]
+        assert scores == sorted(scores, reverse=True)
+
+def test_search_highlights_the_matching_words(client):
+    hits = search(client, "Deum")
+    assert hits and all(h["lang"] == "latin_text" for h in hits)
+    for hit in hits:
+        words = [hit["snippet"][a:b] for a, b in hit["highlights"]]
+        assert words and all(latin(w) == "deus" for w in words)
+    hit = search(client, "substantia")[0]
+    assert {hit["snippet"][a:b].lower() for a, b in hit["highlights"]} <= {"substantia", "substantiæ", "substantiam", "substantiarum", "substantias", "substantiis"}
+
+def test_corpus_search_does_not_load_books(two_books):
+    client = serve(two_books)
+    books = app.corpus()
+    hits = search(client, "Deum") + search(client, "substantia") + search(client, "nature", "french_text")
+    assert books.loaded_books() == [] and {hit["key"].split("_")[0] for hit in hits} == {"I", "II"}
+    assert {hit["book"] for hit in client.get("/api/search", params={"q": "Deum", "book": "II"}).json()["hits"]} == {"II"}
+    # Once a book is in memory, its own index answers, with the same hits.
+    client.get("/api/node/I_Prop_36")
+    assert books.loaded_books() == ["I"] and "I" not in books._search
+    assert search(client, "Deum") + search(client, "substantia") + search(client, "nature", "french_text") == hits
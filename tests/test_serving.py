@@ -0,0 +1,52 @@
+import gc
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import app
+from conftest import serve
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_preload_loads_every_book_whatever_the_budget(two_books, monkeypatch):
+    serve(two_books)
+    books = app.corpus()
+    monkeypatch.setattr(books, "max_books", 1)
+    try:
+        app.preload()
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+    for book_id in books.books:
+        assert books.book(book_id, load=False).book_id == book_id
+        assert books.for_impact(f"{book_id}_Prop_5", load=False).book_id == book_id
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def test_forked_workers_serve_the_preloaded_books(two_books):
+    port = free_port()
+    env = dict(os.environ, ETHICS_CORPUS_DIR=two_books, CORPUS_MAX_BOOKS="1", PYTHONUNBUFFERED="1")
+    server = subprocess.Popen([sys.executable, "app.py", "serve", "--host", "127.0.0.1", "--port", str(port), "--workers", "2"],
+                              cwd=APP_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        deadline, node = time.monotonic() + 60, None
+        while node is None and time.monotonic() < deadline and server.poll() is None:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/node/II_Prop_5", timeout=5) as response: node = json.load(response)
+            except OSError:
+                time.sleep(0.2)
+        assert node is not None and node["key"] == "II_Prop_5"
+    finally:
+        server.send_signal(signal.SIGTERM)
+        output = server.communicate(timeout=30)[0]
+    # Both books and Book I's impact graph were loaded once, in the parent; the worker loaded nothing.
+    assert "Preloaded 3 books" in output
+    assert output.count("Successfully loaded book") == 3
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import app
+
+BOOK = {"title": "Test", "vertices": [
+    {"normalized_key": "T_Def_1", "type": "DEFINITION", "texts": {"french_text": "a", "'english_text'": "b"}},
+    {"normalized_key": "T_Prop_10", "type": "PROPOSITION", "texts": {"french_text": "c", "bad key": "d"}, "components": [{"type": "DEMONSTRATION", "texts": {"french_text": "e"}}]},
+    {"normalized_key": "T_Prop_2", "type": "PROPOSITION", "texts": {"french_text": "f"}},
+    {"normalized_key": "T_Prop_2", "type": "PROPOSITION", "texts": {}}],
+    "edges": [{"source": "T_Def_1", "target": "T_Prop_2"}, {"source": "T_Def_1", "target": "T_Prop_2"}, {"source": "T_Prop_2", "target": "T_Prop_10"},
+              {"source": "T_Prop_10", "target": "T_Prop_2"}, {"source": "T_Ax_9", "target": "T_Prop_2"}]}
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_validate_reports_and_canonicalizes(tmp_path, monkeypatch, streaming):
+    if not streaming: monkeypatch.setattr(app, "ijson", None)
+    elif app.ijson is None: pytest.skip("ijson is not installed")
+    path = tmp_path / "T.json"
+    path.write_text(json.dumps(BOOK), encoding="utf-8")
+    assert app.validate_command([str(path)], str(tmp_path / "out")) == 1
+    _, report = app.validate_graph_files([str(path)])
+    messages = [message for _, message in report]
+    assert f"{path}: vertex #3 duplicates key T_Prop_2" in messages
+    assert f"{path}: edge T_Def_1 -> T_Prop_2 listed 2 times, folded" in messages
+    assert f"{path}: edge T_Ax_9 -> T_Prop_2 has unknown endpoint T_Ax_9" in messages
+    assert "citation cycle: T_Prop_2, T_Prop_10" in messages
+    assert any("malformed text key 'bad key'" in message for message in messages)
+    canonical = json.loads((tmp_path / "out" / "T.json").read_text(encoding="utf-8"))
+    assert canonical["title"] == "Test" and canonical["canonical"] is True
+    assert [v["normalized_key"] for v in canonical["vertices"]] == ["T_Def_1", "T_Prop_2", "T_Prop_10"]
+    assert canonical["vertices"][0]["texts"] == {"french_text": "a", "english_text": "b"}
+    assert canonical["edges"][0] == {"source": "T_Def_1", "target": "T_Prop_2", "multiplicity": 2}
+    assert len(canonical["edges"]) == 3
+
+def test_only_validated_canonical_files_are_trusted(tmp_path):
+    path = tmp_path / "T.json"
+    path.write_text(json.dumps(BOOK), encoding="utf-8")
+    app.validate_command([str(path)], str(tmp_path / "out"))
+    canonical = tmp_path / "out" / "T.json"
+    assert app.read_graph_file(str(canonical))[0]["canonical"] is True
+    # A hand edit: an edge to an unknown node and an unnormalized text key.
+    data = json.loads(canonical.read_text(encoding="utf-8"))
+    data["edges"].append({"source": "T_Ax_9", "target": "T_Prop_2"})
+    data["vertices"][0]["texts"]["'english_text'"] = data["vertices"][0]["texts"].pop("english_text")
+    canonical.write_text(json.dumps(data), encoding="utf-8")
+    edited, _ = app.read_graph_file(str(canonical))
+    assert "canonical" not in edited and edited["vertices"][0]["texts"] == {"french_text": "a", "english_text": "b"}
+    graph = app.create_graph_from_data(data["vertices"], data["edges"], trusted=True)
+    assert "T_Ax_9" not in graph and graph.number_of_edges() == 3